@@ -0,0 +1,153 @@
+"""
+Admission control for the scoring endpoints.
+At most `max_in_flight` requests score at once; the next `max_queue` wait
+in FIFO order, each until its deadline. Anything beyond that is shed at
+once with a Retry-After hint instead of piling up in the threadpool, and a
+request whose deadline passes while it waits is dropped before inference,
+so latency stays bounded by the deadline under a traffic spike.
+
+The controller lives on the event loop (acquire/release are only called
+from async handlers), so it needs no lock.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from api.metrics import LatencyHistogram
+
+class Overloaded(Exception):
+    """Raised instead of admitting a request: reason is "queue_full" or "deadline" """
+    
+    def __init__(self, reason, retry_after_s):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, deadline-aware wait queue"""
+    
+    # Weight of the newest request in the service-time average behind Retry-After
+    EWMA_ALPHA = 0.1
+    
+    def __init__(self, max_in_flight, max_queue=100):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters = deque()
+        
+        # Stats
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "deadline": 0}
+        self.queue_time = LatencyHistogram()
+        self.max_queue_time_s = 0.0
+        self.service_time_s = None
+    
+    @property
+    def queued(self):
+        return len(self._waiters)
+    
+    def retry_after_s(self):
+        """Whole seconds until the current backlog has likely drained (at least 1)"""
+        if self.service_time_s is None:
+            return 1
+        backlog = self.in_flight + self.queued
+        return max(1, math.ceil(backlog * self.service_time_s / self.max_in_flight))
+    
+    async def acquire(self, deadline):
+        """Wait for a slot until `deadline` (time.perf_counter() seconds); raise Overloaded if there is none"""
+        queued_at = time.perf_counter()
+        if queued_at >= deadline:
+            self._shed("deadline")
+        
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self._admit(queued_at)
+            return
+        
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+        
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), deadline - queued_at)
+        except asyncio.TimeoutError:
+            # release() may have handed over the slot just as the deadline passed
+            if not future.done():
+                future.cancel()
+            else:
+                self._release_slot()
+            self._shed("deadline")
+        except asyncio.CancelledError:
+            # The client went away while queued
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            else:
+                future.cancel()
+            raise
+        finally:
+            try:
+                self._waiters.remove(future)
+            except ValueError:
+                pass
+        
+        self._admit(queued_at)
+    
+    def release(self, service_time_s=None):
+        """Free a slot (handing it to the oldest waiter) and fold in the request's service time"""
+        if service_time_s is not None:
+            if self.service_time_s is None:
+                self.service_time_s = service_time_s
+            else:
+                self.service_time_s += self.EWMA_ALPHA * (service_time_s - self.service_time_s)
+        self._release_slot()
+    
+    @asynccontextmanager
+    async def slot(self, deadline):
+        """Hold a scoring slot for the body of the block"""
+        await self.acquire(deadline)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+    
+    def _release_slot(self):
+        # The slot passes straight to a waiter, so a newcomer can't jump the queue
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+    
+    def _admit(self, queued_at):
+        waited_s = time.perf_counter() - queued_at
+        self.admitted += 1
+        self.queue_time.observe_ns(int(waited_s * 1e9))
+        self.max_queue_time_s = max(self.max_queue_time_s, waited_s)
+    
+    def _shed(self, reason):
+        self.shed[reason] += 1
+        raise Overloaded(reason, self.retry_after_s())
+    
+    def stats(self):
+        counts, sum_ns = self.queue_time.totals()
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "mean_queue_time_ms": sum_ns / self.admitted / 1e6 if self.admitted else 0.0,
+            "p99_queue_time_ms": (LatencyHistogram.quantile(counts, 0.99) or 0.0) * 1e3,
+            "max_queue_time_ms": self.max_queue_time_s * 1e3,
+            "mean_service_time_ms": self.service_time_s * 1e3 if self.service_time_s is not None else None,
+        }
@@ -1,18 +1,49 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import pandas as pd
+import time
+_MODULE_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
 import numpy as np
-import mlflow
-import mlflow.sklearn
-import joblib
 import os
-from typing import Optional
+import hmac
+import itertools
+import threading
+import warnings
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from operator import attrgetter
+from typing import Any, Dict, List, Optional
+
+# mlflow, joblib and sklearn are imported where they are used, so a start
+# from the resolved-model cache never pays for them (mlflow alone is ~1s)
+from api.admission import AdmissionController, Overloaded
+from api.arrow_io import ARROW_STREAM_MEDIA_TYPE, ArrowSchemaError, read_features, write_scores
+from api.audit import AuditLog
+from api.batching import MicroBatcher
+from api.cache import PredictionCache
+from api.drift_monitor import DriftMonitor
+from api.experiments import ROUTING_MODES, ShadowScorer, TrafficSplit, VersionStats, parse_candidates
+from api.metrics import (
+    ErrorCounter, LatencyHistogram, RequestTimingMiddleware,
+    render_counters, render_errors, render_gauge, render_histograms,
+)
+from api.model_cache import ResolvedModelCache
+from api.reloader import RegistryWatcher
+from src.drift import load_reference
+from src.forest_compiler import CompiledForest, compile_forest, verify_compiled
 
 app = FastAPI(
     title="Heart Disease Prediction API",
     description="MLflow-integrated API for heart disease prediction"
 )
 
+# Stamps each request's arrival time, so handlers can time parsing + validation
+app.add_middleware(RequestTimingMiddleware)
+
 # Define input data model
 class PatientData(BaseModel):
     age: int
@@ -35,40 +66,348 @@ class PredictionResponse(BaseModel):
     risk_level: str
     model_version: str
 
-# Global variables for model and scaler
-MODEL = None
-SCALER = None
-MODEL_VERSION = "unknown"
+class BatchPredictionRequest(BaseModel):
+    """
+    A batch of patients, either row-wise or columnar.
+    
+    - patients: list of PatientData-shaped objects
+    - columns: mapping of feature name -> list of values (all the same length)
+    """
+    patients: Optional[List[Dict[str, Any]]] = None
+    columns: Optional[Dict[str, List[Any]]] = None
+
+class BatchPredictionResult(BaseModel):
+    index: int
+    prediction: Optional[int] = None
+    confidence: Optional[float] = None
+    risk_level: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    results: List[BatchPredictionResult]
+    n_scored: int
+    n_failed: int
+    model_version: str
+
+class ReloadRequest(BaseModel):
+    """Registry version to load; "latest" (the default) picks the newest one"""
+    version: Optional[str] = "latest"
+
+class ExperimentRequest(BaseModel):
+    """
+    Registry versions to evaluate next to the served model.
+    
+    - candidates: registry version -> share of traffic it serves
+    - shadow: registry version that scores every request in the background
+    - routing: "hash" (stable per routing key) or "weight" (random)
+    """
+    candidates: Dict[str, float] = {}
+    shadow: Optional[str] = None
+    routing: str = "hash"
+
+# Feature order used in training (matches the heart.csv columns)
+FEATURE_NAMES = [
+    "age", "sex", "cp", "trestbps", "chol", "fbs", "restecg",
+    "thalach", "exang", "oldpeak", "slope", "ca", "thal",
+]
+
+N_FEATURES = len(FEATURE_NAMES)
+
+# Reads the 13 PatientData fields in FEATURE_NAMES order in one call
+_FEATURE_GETTER = attrgetter(*FEATURE_NAMES)
+
+@contextmanager
+def _ignore_feature_name_warning():
+    """
+    The model and scaler were fitted on DataFrames; the NumPy hot path drops the
+    column names on purpose, so silence sklearn's per-call feature-name warning
+    around calls into sklearn (and only there).
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        yield
+
+# Upper bound on rows accepted by /predict/batch and /predict/arrow in a single call
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+# Upper bound on /predict/arrow body bytes, checked before decoding (default:
+# room for MAX_BATCH_SIZE rows of 13 uncompressed 64-bit columns, plus 1 MiB
+# for schemas, validity bitmaps and per-batch framing)
+MAX_ARROW_BODY_BYTES = int(os.getenv("MAX_ARROW_BODY_BYTES", str(MAX_BATCH_SIZE * 13 * 8 + (1 << 20))))
+
+# Inference engine:
+# - "compiled": flat-array forest, verified against sklearn (default)
+# - "folded": scaler-folded export from src/export_model.py, takes raw features
+# - "compact": compiled forest binary from src/export_model.py, memory-mapped
+#   instead of unpickling sklearn (processes serving it share its pages)
+# - "sklearn": the unpickled sklearn model
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "compiled").lower()
+
+# Where the scaler-folded export lives (see src/export_model.py)
+FOLDED_MODEL_NAME = "heart-disease-model-folded"
+FOLDED_ARTIFACT_PATH = "scaler_folded_model"
+FOLDED_FILENAME = "model_folded.npz"
+
+# Where the compact binary lives: an artifact of each training run (see src/export_model.py)
+COMPACT_ARTIFACT_PATH = "compact_model"
+COMPACT_FILENAME = "model.forest"
+
+# Optional micro-batching of concurrent /predict calls
+PREDICT_BATCHING = os.getenv("PREDICT_BATCHING", "0").lower() in ("1", "true", "yes")
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_US = int(os.getenv("BATCH_MAX_WAIT_US", "1000"))
+
+# Admission control for scoring: requests in flight at once (0 disables it),
+# how many more may queue, and how long a request may wait before it is
+# dropped (clients can ask for less with an X-Request-Deadline-Ms header).
+# With micro-batching the cap also bounds the batch, so it defaults higher.
+MAX_IN_FLIGHT = int(os.getenv(
+    "MAX_IN_FLIGHT", str(BATCH_MAX_SIZE if PREDICT_BATCHING else 2 * (os.cpu_count() or 1))
+))
+ADMISSION_QUEUE_DEPTH = int(os.getenv("ADMISSION_QUEUE_DEPTH", "100"))
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "2000"))
+
+# LRU cache of /predict results keyed on (model version, features); 0 disables it
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+
+# Registered model polled by the hot-reload watcher (the folded one in "folded" mode)
+REGISTERED_MODEL_NAME = "heart-disease-model"
+
+# Seconds between registry polls for a new model version; 0 disables hot reload
+MODEL_RELOAD_INTERVAL_S = float(os.getenv("MODEL_RELOAD_INTERVAL_S", "0"))
+
+# Feature-drift monitoring against the training distributions saved by
+# src/preprocess.py: seconds between PSI/KS computations (0 disables it),
+# how many intervals the scores cover, and the fewest rows scored per feature
+DRIFT_INTERVAL_S = float(os.getenv("DRIFT_INTERVAL_S", "60"))
+DRIFT_WINDOW = int(os.getenv("DRIFT_WINDOW", "60"))
+DRIFT_MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "100"))
+DRIFT_REFERENCE_PATH = os.getenv("DRIFT_REFERENCE_PATH", "models/drift_reference.json")
+
+# Prediction audit log: directory for the rotated files (unset disables it),
+# file format (jsonl or arrow), predictions buffered before dropping, the
+# size and age at which a file is rotated, and which predictions to drop
+# when the buffer is full (oldest or newest)
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR")
+AUDIT_LOG_FORMAT = os.getenv("AUDIT_LOG_FORMAT", "jsonl")
+AUDIT_BUFFER_ROWS = int(os.getenv("AUDIT_BUFFER_ROWS", "100000"))
+AUDIT_ROTATE_MB = float(os.getenv("AUDIT_ROTATE_MB", "100"))
+AUDIT_ROTATE_S = float(os.getenv("AUDIT_ROTATE_S", "3600"))
+AUDIT_DROP_POLICY = os.getenv("AUDIT_DROP_POLICY", "oldest")
+
+# A/B and shadow evaluation: candidate registry versions that serve a share
+# of traffic, as "version:weight" pairs (e.g. "7:0.1"); how requests are
+# split ("hash" keeps each X-Routing-Key, or payload, on one version;
+# "weight" draws at random); a registry version scored in the background on
+# every request; and how many rows may wait for it before being dropped
+AB_CANDIDATES = os.getenv("AB_CANDIDATES", "")
+AB_ROUTING = os.getenv("AB_ROUTING", "hash")
+SHADOW_VERSION = os.getenv("SHADOW_VERSION")
+SHADOW_QUEUE_ROWS = int(os.getenv("SHADOW_QUEUE_ROWS", "10000"))
+
+# Shared secret for the /admin endpoints (X-Admin-Token header); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Fast cold start: serve the last resolved model from a local cache (checked
+# against its sha256) and look for newer registry versions in the background
+FAST_START = os.getenv("FAST_START", "0").lower() in ("1", "true", "yes")
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "models/.resolved")
+
+# Seconds spent in each startup phase, reported on /health
+STARTUP_PHASES = {}
+
+# Request-path latency per endpoint and stage, exported on /metrics
+STAGES = ("validation", "features", "scaling", "inference", "response")
+PREDICT_STAGES = {stage: LatencyHistogram() for stage in STAGES}
+BATCH_STAGES = {stage: LatencyHistogram() for stage in STAGES}
+ARROW_STAGES = {stage: LatencyHistogram() for stage in STAGES}
+
+# Model load durations ("startup" or "reload") and errors by exception type
+MODEL_LOAD_LATENCY = {"startup": LatencyHistogram(), "reload": LatencyHistogram()}
+ERRORS = ErrorCounter()
 
-def load_model_from_mlflow():
+# Ids for ModelSnapshot.snapshot_id
+_SNAPSHOT_IDS = itertools.count(1)
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """
+    Everything the request path needs from a loaded model.
+    It is swapped as a single reference, so an in-flight request that
+    grabbed a snapshot never sees one model with another's scaler or version.
+    """
+    model: Any
+    scaler: Any
+    engine: Any
+    version: str
+    source: str
+    registry_version: Optional[int] = None
+    loaded_at: float = field(default_factory=time.time)
+    # True for a StandardScaler, which scale() applies in place
+    standard_scaler: bool = False
+    # True when the model is a compact binary (a CompiledForest on scaled features)
+    compact: bool = False
+    # Unique per built snapshot; keys the prediction cache, since local models share a version
+    snapshot_id: int = field(default_factory=lambda: next(_SNAPSHOT_IDS))
+    
+    @property
+    def engine_name(self):
+        """Which inference path the snapshot scores with"""
+        if self.engine is None:
+            return "sklearn"
+        if self.engine is self.model:
+            return "compact" if self.compact else "folded"
+        return "compiled"
+    
+    def scale(self, features):
+        """
+        Apply the scaler to a raw float64 feature matrix.
+        StandardScaler is applied in place with the same arithmetic as
+        `transform`, skipping its per-call input validation.
+        """
+        scaler = self.scaler
+        if scaler is None:
+            return features
+        
+        if self.standard_scaler:
+            if scaler.with_mean:
+                features -= scaler.mean_
+            if scaler.with_std:
+                features /= scaler.scale_
+            return features
+        
+        with _ignore_feature_name_warning():
+            return scaler.transform(features)
+    
+    def score(self, features, stages=None):
+        """
+        Score a (n_rows, 13) raw float64 feature matrix in one pass.
+        Scales once, calls predict_proba once and derives the labels from it.
+        The matrix is scaled in place. `stages` (e.g. PREDICT_STAGES) receives
+        the scaling and inference latencies.
+        
+        Returns (predictions, confidences) as NumPy arrays.
+        """
+        started = time.perf_counter_ns()
+        input_data = self.scale(features)
+        if stages is not None:
+            started = stages["scaling"].observe_since(started)
+        
+        # Compiled engines take NumPy directly; only sklearn models need the warning silenced
+        scorer = self.engine if self.engine is not None else self.model
+        
+        with _ignore_feature_name_warning() if self.engine is None else nullcontext():
+            if hasattr(scorer, "predict_proba"):
+                probabilities = scorer.predict_proba(input_data)
+                best = probabilities.argmax(axis=1)
+                predictions = np.asarray(scorer.classes_).take(best)
+                confidences = probabilities[np.arange(len(best)), best]
+            else:
+                predictions = np.asarray(scorer.predict(input_data))
+                confidences = np.full(len(predictions), 0.5)
+        
+        if stages is not None:
+            stages["inference"].observe_since(started)
+        return predictions, confidences
+
+# The snapshot being served, and the one before it (for /admin/rollback)
+SNAPSHOT = None
+PREVIOUS_SNAPSHOT = None
+
+# Serializes reloads and rollbacks; the request path never takes it
+_RELOAD_LOCK = threading.Lock()
+
+# MicroBatcher when PREDICT_BATCHING is enabled, otherwise None
+BATCHER = None
+
+# RegistryWatcher when MODEL_RELOAD_INTERVAL_S > 0, otherwise None
+WATCHER = None
+
+# DriftMonitor when DRIFT_INTERVAL_S > 0 and a reference was found, otherwise None
+DRIFT_MONITOR = None
+
+# TrafficSplit across A/B candidates and the ShadowScorer, when an experiment is running, otherwise None
+TRAFFIC_SPLIT = None
+SHADOW = None
+
+# Requests, predictions and latency per model version served
+VERSION_STATS = VersionStats()
+
+# In a worker forked by api/prefork.py: its handle on the supervisor, which
+# loaded the model before forking and owns reloads; otherwise None
+PREFORK_WORKER = None
+
+PREDICTION_CACHE = PredictionCache(PREDICTION_CACHE_SIZE) if PREDICTION_CACHE_SIZE > 0 else None
+
+ADMISSION = AdmissionController(MAX_IN_FLIGHT, ADMISSION_QUEUE_DEPTH) if MAX_IN_FLIGHT > 0 else None
+
+AUDIT_LOG = AuditLog(
+    AUDIT_LOG_DIR, FEATURE_NAMES, file_format=AUDIT_LOG_FORMAT, max_rows=AUDIT_BUFFER_ROWS,
+    rotate_bytes=int(AUDIT_ROTATE_MB * 1024 * 1024), rotate_s=AUDIT_ROTATE_S, drop_policy=AUDIT_DROP_POLICY
+) if AUDIT_LOG_DIR else None
+
+@contextmanager
+def _phase(phases, name):
+    """Add the wall time of the block to phases[name] (no-op when phases is None)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if phases is not None:
+            phases[name] = round(phases.get(name, 0.0) + time.perf_counter() - started, 4)
+
+def _latest_registry_version(model_name):
+    """Highest registered version number of a model (one cheap registry query), or None"""
+    from mlflow.tracking import MlflowClient
+    
+    client = MlflowClient()
+    versions = client.search_model_versions(
+        f"name='{model_name}'",
+        max_results=1,
+        order_by=["version_number DESC"]
+    )
+    return int(versions[0].version) if versions else None
+
+def load_model_from_mlflow(registry_version="latest"):
     """
     Load the latest model from MLflow.
     Tries multiple sources:
     1. MLflow Model Registry (production)
     2. MLflow runs directory (latest run)
     3. Local pickle file (fallback)
+    
+    A specific registry_version only tries the registry.
+    Returns (model, version, source, registry_version), or None.
     """
-    global MODEL, MODEL_VERSION
+    import mlflow
+    import mlflow.sklearn
     
     try:
         # Method 1: Load from MLflow Model Registry
         print("Attempting to load model from MLflow Model Registry...")
-        model_uri = "models:/heart-disease-model/latest"
-        MODEL = mlflow.sklearn.load_model(model_uri)
-        MODEL_VERSION = "registry-latest"
+        # Resolve "latest" into its own variable: the fallbacks below depend on what was asked for
+        version_number = registry_version
+        if version_number == "latest":
+            version_number = _latest_registry_version(REGISTERED_MODEL_NAME)
+            if version_number is None:
+                raise LookupError(f"No versions registered for '{REGISTERED_MODEL_NAME}'")
+        model_uri = f"models:/{REGISTERED_MODEL_NAME}/{version_number}"
+        model = mlflow.sklearn.load_model(model_uri)
         print(f"✓ Loaded model from registry: {model_uri}")
-        return True
+        return model, f"registry-v{version_number}", model_uri, int(version_number)
     except Exception as e:
         print(f"Model Registry not available: {e}")
+        if registry_version not in ("latest", None):
+            return None
     
     try:
         # Method 2: Load from latest MLflow run
         print("Attempting to load model from latest MLflow run...")
         mlflow.set_experiment("Heart Disease Prediction")
         
-        # Get the latest run
+        # Get the latest top-level run (hyperparameter search candidates are nested runs without a model)
         runs = mlflow.search_runs(
             experiment_names=["Heart Disease Prediction"],
+            filter_string="tags.mlflow.parentRunId IS NULL",
             order_by=["start_time DESC"],
             max_results=1
         )
@@ -76,10 +415,9 @@ def load_model_from_mlflow():
         if len(runs) > 0:
             run_id = runs.iloc[0]["run_id"]
             model_uri = f"runs:/{run_id}/random_forest_model"
-            MODEL = mlflow.sklearn.load_model(model_uri)
-            MODEL_VERSION = f"run-{run_id[:8]}"
+            model = mlflow.sklearn.load_model(model_uri)
             print(f"✓ Loaded model from run: {run_id}")
-            return True
+            return model, f"run-{run_id[:8]}", model_uri, None
     except Exception as e:
         print(f"MLflow runs not available: {e}")
     
@@ -87,64 +425,701 @@ def load_model_from_mlflow():
         # Method 3: Load from local pickle file (fallback)
         print("Attempting to load model from local file...")
         if os.path.exists("models/model.pkl"):
-            MODEL = joblib.load("models/model.pkl")
-            MODEL_VERSION = "local-pickle"
+            import joblib
+            
+            model = joblib.load("models/model.pkl")
             print("✓ Loaded model from local pickle file")
-            return True
+            return model, "local-pickle", "models/model.pkl", None
     except Exception as e:
         print(f"Local model file not available: {e}")
     
     print("✗ Could not load model from any source")
-    return False
+    return None
+
+def _find_file(directory, filename):
+    """Locate a file anywhere under a downloaded artifact directory"""
+    for root, _, files in os.walk(directory):
+        if filename in files:
+            return os.path.join(root, filename)
+    raise FileNotFoundError(f"{filename} not found under {directory}")
+
+def _load_folded_artifact(model_uri):
+    import mlflow.artifacts
+    
+    local_dir = mlflow.artifacts.download_artifacts(artifact_uri=model_uri)
+    return CompiledForest.load(_find_file(local_dir, FOLDED_FILENAME))
+
+def load_folded_model(registry_version="latest"):
+    """
+    Load the scaler-folded model exported by src/export_model.py.
+    It takes raw patient features, so no scaler is loaded or applied.
+    Tries multiple sources:
+    1. MLflow Model Registry (heart-disease-model-folded)
+    2. MLflow runs directory (latest run)
+    3. Local .npz file (fallback)
+    
+    A specific registry_version only tries the registry.
+    Returns (folded, version, source, registry_version), or None.
+    """
+    import mlflow
+    
+    try:
+        print("Attempting to load folded model from MLflow Model Registry...")
+        # Resolve "latest" into its own variable: the fallbacks below depend on what was asked for
+        version_number = registry_version
+        if version_number == "latest":
+            version_number = _latest_registry_version(FOLDED_MODEL_NAME)
+            if version_number is None:
+                raise LookupError(f"No versions registered for '{FOLDED_MODEL_NAME}'")
+        model_uri = f"models:/{FOLDED_MODEL_NAME}/{version_number}"
+        folded = _load_folded_artifact(model_uri)
+        print(f"✓ Loaded folded model from registry: {model_uri}")
+        return folded, f"folded-registry-v{version_number}", model_uri, int(version_number)
+    except Exception as e:
+        print(f"Folded model not in registry: {e}")
+        if registry_version not in ("latest", None):
+            return None
+    
+    try:
+        print("Attempting to load folded model from latest MLflow run...")
+        runs = mlflow.search_runs(
+            experiment_names=["Heart Disease Prediction"],
+            filter_string="tags.mlflow.parentRunId IS NULL",
+            order_by=["start_time DESC"],
+            max_results=1
+        )
+        
+        if len(runs) > 0:
+            run_id = runs.iloc[0]["run_id"]
+            model_uri = f"runs:/{run_id}/{FOLDED_ARTIFACT_PATH}"
+            folded = _load_folded_artifact(model_uri)
+            print(f"✓ Loaded folded model from run: {run_id}")
+            return folded, f"folded-run-{run_id[:8]}", model_uri, None
+    except Exception as e:
+        print(f"Folded model not in MLflow runs: {e}")
+    
+    try:
+        print("Attempting to load folded model from local file...")
+        local_path = os.path.join("models", FOLDED_FILENAME)
+        if os.path.exists(local_path):
+            folded = CompiledForest.load(local_path)
+            print("✓ Loaded folded model from local file")
+            return folded, "folded-local", local_path, None
+    except Exception as e:
+        print(f"Local folded model not available: {e}")
+    
+    print("✗ Could not load the folded model from any source")
+    return None
+
+def _load_compact_artifact(run_id):
+    import mlflow.artifacts
+    
+    local_dir = mlflow.artifacts.download_artifacts(artifact_uri=f"runs:/{run_id}/{COMPACT_ARTIFACT_PATH}")
+    return CompiledForest.load_binary(_find_file(local_dir, COMPACT_FILENAME))
+
+def load_compact_model(registry_version="latest"):
+    """
+    Load the compact binary of the model (memory-mapped, no sklearn unpickling).
+    It is logged next to the sklearn model by each training run, so the
+    registry and latest-run lookups go through that run.
+    Tries multiple sources:
+    1. MLflow Model Registry (the run behind the heart-disease-model version)
+    2. MLflow runs directory (latest run)
+    3. Local models/model.forest file (fallback)
+    
+    A specific registry_version only tries the registry.
+    Returns (forest, version, source, registry_version), or None.
+    """
+    import mlflow
+    from mlflow.tracking import MlflowClient
+    
+    try:
+        print("Attempting to load compact model via the MLflow Model Registry...")
+        # Resolve "latest" into its own variable: the fallbacks below depend on what was asked for
+        version_number = registry_version
+        if version_number == "latest":
+            version_number = _latest_registry_version(REGISTERED_MODEL_NAME)
+            if version_number is None:
+                raise LookupError(f"No versions registered for '{REGISTERED_MODEL_NAME}'")
+        model_version = MlflowClient().get_model_version(REGISTERED_MODEL_NAME, str(version_number))
+        forest = _load_compact_artifact(model_version.run_id)
+        print(f"✓ Loaded compact model of models:/{REGISTERED_MODEL_NAME}/{version_number}")
+        return (forest, f"compact-registry-v{version_number}",
+                f"runs:/{model_version.run_id}/{COMPACT_ARTIFACT_PATH}", int(version_number))
+    except Exception as e:
+        print(f"Compact model not available via the registry: {e}")
+        if registry_version not in ("latest", None):
+            return None
+    
+    try:
+        print("Attempting to load compact model from latest MLflow run...")
+        runs = mlflow.search_runs(
+            experiment_names=["Heart Disease Prediction"],
+            filter_string="tags.mlflow.parentRunId IS NULL",
+            order_by=["start_time DESC"],
+            max_results=1
+        )
+        
+        if len(runs) > 0:
+            run_id = runs.iloc[0]["run_id"]
+            forest = _load_compact_artifact(run_id)
+            print(f"✓ Loaded compact model from run: {run_id}")
+            return forest, f"compact-run-{run_id[:8]}", f"runs:/{run_id}/{COMPACT_ARTIFACT_PATH}", None
+    except Exception as e:
+        print(f"Compact model not in MLflow runs: {e}")
+    
+    try:
+        print("Attempting to load compact model from local file...")
+        local_path = os.path.join("models", COMPACT_FILENAME)
+        if os.path.exists(local_path):
+            forest = CompiledForest.load_binary(local_path)
+            print("✓ Loaded compact model from local file")
+            return forest, "compact-local", local_path, None
+    except Exception as e:
+        print(f"Local compact model not available: {e}")
+    
+    print("✗ Could not load the compact model from any source")
+    return None
 
 def load_scaler_from_file():
-    """Load the StandardScaler used during preprocessing"""
-    global SCALER
+    """Load the StandardScaler used during preprocessing; returns it, or None"""
     
     try:
         if os.path.exists("models/scaler.pkl"):
-            SCALER = joblib.load("models/scaler.pkl")
+            import joblib
+            scaler = joblib.load("models/scaler.pkl")
             print("✓ Loaded scaler from file")
-            return True
+            return scaler
     except Exception as e:
         print(f"Could not load scaler: {e}")
     
     print("⚠ Scaler not available, predictions will not be scaled")
-    return False
+    return None
+
+def build_inference_engine(model):
+    """
+    Compile a loaded forest into flat arrays for fast inference.
+    The compiled forest is only used if it reproduces sklearn's
+    predict_proba exactly; otherwise returns None and sklearn is used.
+    """
+    if model is None or MODEL_ENGINE == "sklearn":
+        return None
+    
+    try:
+        compiled = compile_forest(model)
+    except (TypeError, ValueError) as e:
+        print(f"⚠ Compiled engine not available ({e}), using sklearn")
+        return None
+    
+    if not verify_compiled(model, compiled):
+        print("⚠ Compiled engine does not match sklearn outputs, using sklearn")
+        return None
+    
+    print(f"✓ Compiled forest engine ready ({compiled.n_trees} trees, {compiled.n_nodes} nodes)")
+    return compiled
+
+def _is_standard_scaler(scaler):
+    if scaler is None:
+        return False
+    from sklearn.preprocessing import StandardScaler
+    return isinstance(scaler, StandardScaler)
+
+def build_snapshot(model, scaler, version, source="manual", registry_version=None, folded=False,
+                   compact=False, phases=None):
+    """Compile (unless folded or compact), warm up and package a model as a ModelSnapshot"""
+    if folded:
+        # Scaler-folded model: it is its own engine and takes raw features
+        snapshot = ModelSnapshot(model, None, model, version, source, registry_version)
+    elif compact:
+        # Already compiled: it is its own engine, on scaled features
+        snapshot = ModelSnapshot(
+            model, scaler, model, version, source, registry_version,
+            standard_scaler=_is_standard_scaler(scaler), compact=True
+        )
+    else:
+        with _phase(phases, "compile"):
+            engine = build_inference_engine(model)
+        snapshot = ModelSnapshot(
+            model, scaler, engine, version, source, registry_version,
+            standard_scaler=_is_standard_scaler(scaler)
+        )
+    
+    # Warm-up call so the first real request doesn't pay for lazy initialization
+    with _phase(phases, "warmup"):
+        snapshot.score(np.zeros((1, N_FEATURES)))
+    return snapshot
+
+def _store_resolved_model(model, kind, version, source, registry_version):
+    """Remember what was resolved so the next cold start can skip resolution"""
+    try:
+        ResolvedModelCache(MODEL_CACHE_DIR).store(model, kind, version, source, registry_version)
+        print(f"✓ Cached resolved model in {MODEL_CACHE_DIR}")
+    except Exception as e:
+        print(f"⚠ Could not cache the resolved model: {e}")
+
+def load_cached_model(phases=None):
+    """
+    Build a snapshot from the resolved-model cache, without importing mlflow.
+    Returns a ModelSnapshot, or None on a cache miss.
+    """
+    folded = MODEL_ENGINE == "folded"
+    compact = MODEL_ENGINE == "compact"
+    with _phase(phases, "model_cache"):
+        try:
+            cached = ResolvedModelCache(MODEL_CACHE_DIR).load(MODEL_ENGINE if folded or compact else "sklearn")
+        except Exception as e:
+            print(f"⚠ Could not read the resolved-model cache: {e}")
+            cached = None
+    if cached is None:
+        return None
+    
+    model, manifest = cached
+    print(f"✓ Loaded {manifest['version']} from the resolved-model cache (resolved from {manifest['source']})")
+    scaler = None
+    if not folded:
+        with _phase(phases, "load_scaler"):
+            scaler = load_scaler_from_file()
+    return build_snapshot(
+        model, scaler, manifest["version"], manifest["source"], manifest.get("registry_version"),
+        folded=folded, compact=compact, phases=phases
+    )
+
+def load_current_model(registry_version="latest", phases=None):
+    """
+    Resolve, load and warm the model to serve, without touching the live snapshot.
+    Returns a ModelSnapshot, or None if no model could be loaded.
+    """
+    if MODEL_ENGINE == "folded":
+        with _phase(phases, "resolve_model"):
+            loaded = load_folded_model(registry_version)
+        if loaded is not None:
+            print("✓ Serving the scaler-folded model (no per-request scaling)")
+            folded, version, source, loaded_registry_version = loaded
+            if FAST_START:
+                _store_resolved_model(folded, "folded", version, source, loaded_registry_version)
+            return build_snapshot(folded, None, version, source, loaded_registry_version, folded=True, phases=phases)
+        if registry_version != "latest":
+            return None
+    
+    if MODEL_ENGINE == "compact":
+        with _phase(phases, "resolve_model"):
+            loaded = load_compact_model(registry_version)
+        if loaded is not None:
+            print("✓ Serving the memory-mapped compact model")
+            forest, version, source, loaded_registry_version = loaded
+            if FAST_START:
+                _store_resolved_model(forest, "compact", version, source, loaded_registry_version)
+            with _phase(phases, "load_scaler"):
+                scaler = load_scaler_from_file()
+            return build_snapshot(forest, scaler, version, source, loaded_registry_version, compact=True, phases=phases)
+        if registry_version != "latest":
+            return None
+    
+    with _phase(phases, "resolve_model"):
+        loaded = load_model_from_mlflow(registry_version)
+    if loaded is None:
+        return None
+    
+    model, version, source, loaded_registry_version = loaded
+    if FAST_START:
+        _store_resolved_model(model, "sklearn", version, source, loaded_registry_version)
+    with _phase(phases, "load_scaler"):
+        scaler = load_scaler_from_file()
+    return build_snapshot(model, scaler, version, source, loaded_registry_version, phases=phases)
+
+def install_snapshot(snapshot):
+    """Atomically make `snapshot` the served model, keeping the old one for rollback"""
+    global SNAPSHOT, PREVIOUS_SNAPSHOT
+    PREVIOUS_SNAPSHOT, SNAPSHOT = SNAPSHOT, snapshot
+    return PREVIOUS_SNAPSHOT
+
+def install_model(model, scaler=None, version="manual", source="manual", folded=False):
+    """Build and serve a snapshot from in-memory objects (scripts, benchmarks, tests)"""
+    snapshot = build_snapshot(model, scaler, version, source, folded=folded)
+    install_snapshot(snapshot)
+    return snapshot
+
+def reload_model(registry_version="latest"):
+    """
+    Load a model version off the request path and swap it in as one snapshot.
+    Returns the new snapshot, or None if loading failed (the old one keeps serving).
+    """
+    with _RELOAD_LOCK:
+        started = time.perf_counter_ns()
+        snapshot = load_current_model(registry_version)
+        MODEL_LOAD_LATENCY["reload"].observe_since(started)
+        if snapshot is None:
+            return None
+        install_snapshot(snapshot)
+        print(f"✓ Now serving model {snapshot.version} (previous: "
+              f"{PREVIOUS_SNAPSHOT.version if PREVIOUS_SNAPSHOT else None})")
+        return snapshot
+
+def rollback_model():
+    """Swap back to the previously served snapshot; returns it, or None if there is none"""
+    with _RELOAD_LOCK:
+        if PREVIOUS_SNAPSHOT is None:
+            return None
+        install_snapshot(PREVIOUS_SNAPSHOT)
+        print(f"✓ Rolled back to model {SNAPSHOT.version}")
+        return SNAPSHOT
+
+def _watched_model_name():
+    return FOLDED_MODEL_NAME if MODEL_ENGINE == "folded" else REGISTERED_MODEL_NAME
+
+def _served_registry_version():
+    snapshot = SNAPSHOT
+    return snapshot.registry_version if snapshot is not None else None
+
+def _refresh_from_registry():
+    """After a start from the cache: swap in a newer registry version if there is one"""
+    try:
+        latest = _latest_registry_version(_watched_model_name())
+        served = _served_registry_version()
+        if latest is not None and (served is None or latest > served):
+            print(f"Registry has version {latest}, newer than the cached model; reloading...")
+            reload_model(latest)
+    except Exception as e:
+        print(f"⚠ Registry check after fast start failed: {e}")
+
+def load_startup_snapshot():
+    """
+    Load and install the model to start serving with: from the resolved-model
+    cache when FAST_START is on, else by full resolution.
+    Returns True if it came from the cache.
+    """
+    started = time.perf_counter_ns()
+    snapshot = load_cached_model(STARTUP_PHASES) if FAST_START else None
+    from_cache = snapshot is not None
+    if snapshot is None:
+        snapshot = load_current_model(phases=STARTUP_PHASES)
+    MODEL_LOAD_LATENCY["startup"].observe_since(started)
+    
+    if snapshot is not None:
+        install_snapshot(snapshot)
+    else:
+        print("⚠ WARNING: Model not loaded. Predictions may fail.")
+    
+    if AB_CANDIDATES or SHADOW_VERSION:
+        with _phase(STARTUP_PHASES, "experiment"):
+            try:
+                load_experiment(parse_candidates(AB_CANDIDATES), SHADOW_VERSION, AB_ROUTING)
+            except ValueError as e:
+                print(f"⚠ Invalid experiment settings: {e}")
+    
+    with _phase(STARTUP_PHASES, "drift_reference"):
+        load_drift_monitor()
+    return from_cache
+
+def install_experiment(candidates=(), shadow=None, routing="hash"):
+    """
+    Split traffic between the served model and (snapshot, weight) candidates,
+    and shadow-score requests with `shadow` (a snapshot). Called with no
+    arguments it ends the experiment. The new shadow thread is started
+    separately; the old one is stopped.
+    """
+    global TRAFFIC_SPLIT, SHADOW
+    split = TrafficSplit(candidates, routing) if candidates else None
+    previous = SHADOW
+    TRAFFIC_SPLIT = split
+    SHADOW = ShadowScorer(shadow, max_rows=SHADOW_QUEUE_ROWS) if shadow is not None else None
+    if previous is not None:
+        previous.stop()
+    return TRAFFIC_SPLIT, SHADOW
+
+def load_experiment(candidates, shadow_version=None, routing="hash"):
+    """
+    Load the candidate [(registry version, weight)] and shadow versions next
+    to the served model and install them. Returns False, leaving any running
+    experiment alone, if a version could not be loaded.
+    """
+    if routing not in ROUTING_MODES:
+        raise ValueError(f"Unknown routing '{routing}' (use one of {ROUTING_MODES})")
+    loaded = []
+    for registry_version, weight in candidates:
+        snapshot = load_current_model(registry_version)
+        if snapshot is None:
+            print(f"⚠ Could not load candidate version {registry_version}; experiment not started")
+            return False
+        loaded.append((snapshot, weight))
+    
+    shadow = None
+    if shadow_version:
+        shadow = load_current_model(shadow_version)
+        if shadow is None:
+            print(f"⚠ Could not load shadow version {shadow_version}; experiment not started")
+            return False
+    
+    install_experiment(loaded, shadow, routing)
+    print(f"✓ Experiment: candidates {[(s.version, w) for s, w in loaded]}, "
+          f"shadow {shadow.version if shadow is not None else None}")
+    return True
+
+def load_drift_monitor():
+    """Set up DRIFT_MONITOR from the reference at DRIFT_REFERENCE_PATH (its thread is started separately)"""
+    global DRIFT_MONITOR
+    if DRIFT_INTERVAL_S <= 0:
+        return None
+    
+    reference = load_reference(DRIFT_REFERENCE_PATH)
+    if reference is None:
+        print(f"⚠ No drift reference at {DRIFT_REFERENCE_PATH}; drift monitoring is off")
+        return None
+    try:
+        DRIFT_MONITOR = DriftMonitor(
+            reference, FEATURE_NAMES, interval_s=DRIFT_INTERVAL_S, window=DRIFT_WINDOW, min_samples=DRIFT_MIN_SAMPLES
+        )
+    except (KeyError, ValueError) as e:
+        print(f"⚠ Invalid drift reference at {DRIFT_REFERENCE_PATH}: {e}")
+        return None
+    return DRIFT_MONITOR
 
 @app.on_event("startup")
 async def startup_event():
     """Load model and scaler when API starts"""
+    global WATCHER
+    if PREFORK_WORKER is not None:
+        # The model was loaded before this worker was forked, and reloads go through the supervisor
+        if PREDICT_BATCHING:
+            await start_batcher()
+        if DRIFT_MONITOR is not None:
+            DRIFT_MONITOR.start()
+        if AUDIT_LOG is not None:
+            AUDIT_LOG.start()
+        if SHADOW is not None:
+            SHADOW.start()
+        return
+    
     print("\n" + "="*60)
     print("Starting Heart Disease Prediction API")
     print("="*60)
     
-    load_model_from_mlflow()
-    load_scaler_from_file()
+    from_cache = load_startup_snapshot()
     
-    if MODEL is None:
-        print("⚠ WARNING: Model not loaded. Predictions may fail.")
+    if PREDICT_BATCHING:
+        with _phase(STARTUP_PHASES, "batcher"):
+            await start_batcher()
+    
+    if DRIFT_MONITOR is not None:
+        DRIFT_MONITOR.start()
+        print(f"✓ Drift monitor scoring every {DRIFT_INTERVAL_S}s over the last {DRIFT_WINDOW} intervals")
+    
+    if AUDIT_LOG is not None:
+        AUDIT_LOG.start()
+        print(f"✓ Auditing predictions to {AUDIT_LOG_DIR} ({AUDIT_LOG_FORMAT})")
+    
+    if SHADOW is not None:
+        SHADOW.start()
+    
+    if not ADMIN_TOKEN:
+        print("⚠ ADMIN_TOKEN is not set: /admin endpoints are disabled")
+    
+    if MODEL_RELOAD_INTERVAL_S > 0:
+        WATCHER = RegistryWatcher(
+            lambda: _latest_registry_version(_watched_model_name()),
+            _served_registry_version,
+            reload_model,
+            interval_s=MODEL_RELOAD_INTERVAL_S
+        )
+        WATCHER.start()
+        print(f"✓ Watching the registry for new versions every {MODEL_RELOAD_INTERVAL_S}s")
+    elif from_cache:
+        # No watcher to catch up with the registry, so check once off the startup path
+        threading.Thread(target=_refresh_from_registry, name="registry-refresh", daemon=True).start()
+    
+    STARTUP_PHASES["total"] = round(time.perf_counter() - _MODULE_STARTED, 4)
+    print(f"✓ Started in {STARTUP_PHASES['total']:.2f}s: {STARTUP_PHASES}")
     print("="*60 + "\n")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the background threads, drain the micro-batcher and flush the audit log, if any"""
+    global WATCHER
+    if WATCHER is not None:
+        WATCHER.stop()
+        WATCHER = None
+    if DRIFT_MONITOR is not None:
+        DRIFT_MONITOR.stop()
+    if SHADOW is not None:
+        SHADOW.stop()
+    await stop_batcher()
+    if AUDIT_LOG is not None:
+        AUDIT_LOG.stop()
+
+def _score_snapshot(snapshot, features):
+    """Batcher scoring callback: score a coalesced matrix with the caller's snapshot"""
+    return snapshot.score(features, PREDICT_STAGES)
+
+async def start_batcher():
+    """Start coalescing concurrent /predict calls into batched model calls"""
+    global BATCHER
+    BATCHER = MicroBatcher(_score_snapshot, max_batch_size=BATCH_MAX_SIZE, max_wait_us=BATCH_MAX_WAIT_US)
+    await BATCHER.start()
+    print(f"✓ Micro-batching enabled (max batch {BATCH_MAX_SIZE}, max wait {BATCH_MAX_WAIT_US}us)")
+
+async def stop_batcher():
+    global BATCHER
+    if BATCHER is not None:
+        await BATCHER.stop()
+        BATCHER = None
+
+def _risk_level(prediction, confidence):
+    """Map a prediction and its confidence to a categorical risk level"""
+    if prediction == 1:
+        return "High" if confidence > 0.7 else "Moderate"
+    return "Low"
+
+def _format_validation_error(error):
+    """Flatten a pydantic ValidationError into a single readable line"""
+    parts = []
+    for err in error.errors():
+        field = ".".join(str(loc) for loc in err.get("loc", ())) or "row"
+        parts.append(f"{field}: {err.get('msg')}")
+    return "; ".join(parts)
+
+def _batch_rows(request):
+    """Return the batch as a list of row dicts, whichever form it was sent in"""
+    if request.patients is not None and request.columns is not None:
+        raise HTTPException(
+            status_code=422,
+            detail="Send either 'patients' or 'columns', not both."
+        )
+    
+    if request.patients is not None:
+        return request.patients
+    
+    if request.columns is not None:
+        lengths = {len(values) for values in request.columns.values()}
+        if len(lengths) > 1:
+            raise HTTPException(
+                status_code=422,
+                detail="All columns must have the same number of values."
+            )
+        names = list(request.columns.keys())
+        return [dict(zip(names, values)) for values in zip(*request.columns.values())]
+    
+    return []
+
+def _patient_row(data):
+    """Copy a PatientData into a preallocated (1, 13) float64 row, in FEATURE_NAMES order"""
+    row = np.empty((1, N_FEATURES), dtype=np.float64)
+    row[0] = _FEATURE_GETTER(data)
+    return row
+
+def _require_snapshot(endpoint):
+    """The snapshot to serve this request with, or a 503 if no model is loaded"""
+    snapshot = SNAPSHOT
+    if snapshot is None:
+        ERRORS.inc(endpoint, "ModelNotLoaded")
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded. Service unavailable."
+        )
+    return snapshot
+
+def _route(snapshot, request, features=None):
+    """
+    The snapshot to score a request with: the served one, or an A/B candidate.
+    Hash routing keys on the X-Routing-Key header, else on the feature row.
+    """
+    split = TRAFFIC_SPLIT
+    if split is None:
+        return snapshot
+    key = request.headers.get("x-routing-key")
+    if key is not None:
+        key = key.encode()
+    elif features is not None:
+        key = features.tobytes()
+    return split.choose(snapshot, key)
+
+def _require_admin(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def _request_deadline(request):
+    """When this request stops being worth scoring (a time.perf_counter() value)"""
+    timeout_ms = REQUEST_DEADLINE_MS
+    header = request.headers.get("x-request-deadline-ms")
+    if header:
+        try:
+            timeout_ms = min(timeout_ms, float(header))
+        except ValueError:
+            pass
+    return request.scope.get("received_ns", time.perf_counter_ns()) / 1e9 + timeout_ms / 1e3
+
+@asynccontextmanager
+async def _admitted(endpoint, request):
+    """Hold a scoring slot, or answer 503 with Retry-After if the queue is full or the deadline passed"""
+    if ADMISSION is None:
+        yield
+        return
+    try:
+        async with ADMISSION.slot(_request_deadline(request)):
+            yield
+    except Overloaded as e:
+        ERRORS.inc(endpoint, "Overloaded")
+        detail = "Server overloaded" if e.reason == "queue_full" else "Request deadline exceeded while queued"
+        raise HTTPException(
+            status_code=503,
+            detail=f"{detail}. Retry later.",
+            headers={"Retry-After": str(e.retry_after_s)}
+        )
+
+def _worker_pid():
+    """The pre-forked worker whose traffic per-process stats cover, or None in a single process"""
+    return os.getpid() if PREFORK_WORKER is not None else None
+
+def _snapshot_info(snapshot):
+    if snapshot is None:
+        return None
+    return {
+        "version": snapshot.version,
+        "source": snapshot.source,
+        "engine": snapshot.engine_name,
+        "loaded_at": snapshot.loaded_at,
+    }
+
 @app.get("/")
 def home():
+    snapshot = SNAPSHOT
     return {
         "message": "Heart Disease Prediction API is running",
-        "model_loaded": MODEL is not None,
-        "model_version": MODEL_VERSION
+        "model_loaded": snapshot is not None,
+        "model_version": snapshot.version if snapshot is not None else None
     }
 
 @app.get("/health")
 def health():
     """Health check endpoint"""
+    snapshot = SNAPSHOT
     return {
         "status": "healthy",
-        "model_available": MODEL is not None,
-        "model_version": MODEL_VERSION
+        "model_available": snapshot is not None,
+        "model_version": snapshot.version if snapshot is not None else None,
+        "model_source": snapshot.source if snapshot is not None else None,
+        "reload_watcher": WATCHER.stats() if WATCHER is not None else None,
+        "startup_mode": "fast" if FAST_START else "standard",
+        "startup_phases_s": STARTUP_PHASES,
+        "admission": ADMISSION.stats() if ADMISSION is not None else None,
+        "audit_log": AUDIT_LOG.stats() if AUDIT_LOG is not None else None,
+        "prefork_worker": PREFORK_WORKER.info() if PREFORK_WORKER is not None else None
     }
 
+@app.exception_handler(RequestValidationError)
+async def count_validation_errors(request: Request, exc: RequestValidationError):
+    """Count rejected request bodies, then answer with FastAPI's usual 422"""
+    ERRORS.inc(request.url.path, "RequestValidationError")
+    return await request_validation_exception_handler(request, exc)
+
+def _score_one(snapshot, features):
+    """Score a single (1, 13) row, returning (prediction, confidence)"""
+    predictions, confidences = snapshot.score(features, PREDICT_STAGES)
+    return predictions[0], confidences[0]
+
 @app.post("/predict", response_model=PredictionResponse)
-def predict(data: PatientData):
+async def predict(data: PatientData, request: Request):
     """
     Make a heart disease prediction.
     
@@ -155,62 +1130,443 @@ def predict(data: PatientData):
     - model_version: which model was used
     """
     
-    if MODEL is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Model not loaded. Service unavailable."
-        )
+    # Body parsing and validation ran before the handler was called
+    now = time.perf_counter_ns()
+    PREDICT_STAGES["validation"].observe_ns(now - request.scope.get("received_ns", now))
+    
+    # Read the served snapshot once: a reload mid-request can't mix models
+    snapshot = _require_snapshot("/predict")
     
     try:
-        # Convert input to dataframe (same format used in training)
-        input_data = pd.DataFrame([data.dict()])
-        
-        # Scale the features if scaler is available
-        if SCALER is not None:
-            feature_cols = [col for col in input_data.columns]
-            input_data[feature_cols] = SCALER.transform(input_data[feature_cols])
+        # Assemble the features straight into a NumPy row (same order used in training)
+        features = _patient_row(data)
+        if DRIFT_MONITOR is not None:
+            DRIFT_MONITOR.observe(features[0])
+        snapshot = _route(snapshot, request, features)
+        # Scoring scales the row in place, so the shadow gets its own copy
+        shadow = SHADOW
+        shadow_features = features.copy() if shadow is not None else None
+        now = PREDICT_STAGES["features"].observe_since(now)
         
-        # Make prediction
-        prediction = MODEL.predict(input_data)[0]
+        # Repeated payloads skip scaling and the forest entirely
+        cached = None
+        if PREDICTION_CACHE is not None:
+            cache_key = PredictionCache.make_key(snapshot.snapshot_id, features[0])
+            cached = PREDICTION_CACHE.get(cache_key)
         
-        # Get prediction probability if available
-        try:
-            probabilities = MODEL.predict_proba(input_data)[0]
-            confidence = float(max(probabilities))
-        except AttributeError:
-            # Model doesn't have predict_proba
-            confidence = 0.5
+        if cached is not None:
+            prediction, confidence = cached
+        else:
+            # Scale and score in a single predict_proba call, either coalesced
+            # with concurrent requests or on the threadpool, once admitted
+            async with _admitted("/predict", request):
+                if BATCHER is not None:
+                    prediction, confidence = await BATCHER.submit(features[0], snapshot)
+                else:
+                    prediction, confidence = await run_in_threadpool(_score_one, snapshot, features)
+            prediction, confidence = int(prediction), float(confidence)
+            
+            if PREDICTION_CACHE is not None:
+                PREDICTION_CACHE.put(cache_key, (prediction, confidence))
+            now = time.perf_counter_ns()
         
         # Determine risk level
-        if prediction == 1:
-            risk_level = "High" if confidence > 0.7 else "Moderate"
-        else:
-            risk_level = "Low"
+        risk_level = _risk_level(prediction, confidence)
         
-        return PredictionResponse(
+        response = PredictionResponse(
             prediction=int(prediction),
             confidence=confidence,
             risk_level=risk_level,
-            model_version=MODEL_VERSION
+            model_version=snapshot.version
         )
+        now = PREDICT_STAGES["response"].observe_since(now)
+        received_ns = request.scope.get("received_ns", now)
+        VERSION_STATS.observe(snapshot.version, now - received_ns, 1, int(prediction == 1), confidence)
+        if shadow is not None:
+            shadow.submit(snapshot.version, shadow_features, (prediction,), (confidence,))
+        if AUDIT_LOG is not None:
+            AUDIT_LOG.record("/predict", snapshot.version, (now - received_ns) / 1e9, data, prediction, confidence)
+        return response
     
+    except HTTPException:
+        raise
     except Exception as e:
+        ERRORS.inc("/predict", type(e).__name__)
         raise HTTPException(
             status_code=500,
             detail=f"Prediction failed: {str(e)}"
         )
 
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(request: BatchPredictionRequest, http_request: Request):
+    """
+    Score many patients in one call.
+    
+    Accepts either a list of patients or a columnar mapping of feature -> values.
+    Rows are validated individually; invalid rows get an `error` and are
+    skipped, the rest are scaled and scored together in a single model call.
+    """
+    
+    # A batch goes to one A/B arm as a whole
+    snapshot = _route(_require_snapshot("/predict/batch"), http_request)
+    
+    # A batch takes one scoring slot; validation and scoring run on the threadpool
+    async with _admitted("/predict/batch", http_request):
+        return await run_in_threadpool(_score_batch, request, http_request, snapshot)
+
+def _score_batch(request, http_request, snapshot):
+    rows = _batch_rows(request)
+    if len(rows) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(rows)} rows (max {MAX_BATCH_SIZE})"
+        )
+    
+    # Validate each row on its own so one bad row doesn't fail the batch
+    results = [BatchPredictionResult(index=i) for i in range(len(rows))]
+    valid_index = []
+    patients = []
+    for i, row in enumerate(rows):
+        try:
+            patients.append(PatientData(**row))
+        except ValidationError as e:
+            results[i].error = _format_validation_error(e)
+            ERRORS.inc("/predict/batch", "ValidationError")
+            continue
+        valid_index.append(i)
+    now = time.perf_counter_ns()
+    BATCH_STAGES["validation"].observe_ns(now - http_request.scope.get("received_ns", now))
+    
+    features = np.empty((len(patients), N_FEATURES), dtype=np.float64)
+    for j, patient in enumerate(patients):
+        features[j] = _FEATURE_GETTER(patient)
+    now = BATCH_STAGES["features"].observe_since(now)
+    
+    if DRIFT_MONITOR is not None:
+        DRIFT_MONITOR.observe_many(features)
+    shadow = SHADOW
+    shadow_features = features.copy() if shadow is not None and valid_index else None
+    
+    if valid_index:
+        try:
+            predictions, confidences = snapshot.score(features, BATCH_STAGES)
+        except Exception as e:
+            ERRORS.inc("/predict/batch", type(e).__name__)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Prediction failed: {str(e)}"
+            )
+        
+        for i, prediction, confidence in zip(valid_index, predictions, confidences):
+            results[i].prediction = int(prediction)
+            results[i].confidence = float(confidence)
+            results[i].risk_level = _risk_level(prediction, confidence)
+        now = time.perf_counter_ns()
+        received_ns = http_request.scope.get("received_ns", now)
+        VERSION_STATS.observe(
+            snapshot.version, now - received_ns, len(predictions),
+            int(np.count_nonzero(predictions == 1)), float(confidences.sum())
+        )
+        if shadow_features is not None:
+            shadow.submit(snapshot.version, shadow_features, predictions, confidences)
+        if AUDIT_LOG is not None:
+            AUDIT_LOG.record("/predict/batch", snapshot.version, (now - received_ns) / 1e9, patients, predictions, confidences)
+    
+    response = BatchPredictionResponse(
+        results=results,
+        n_scored=len(valid_index),
+        n_failed=len(rows) - len(valid_index),
+        model_version=snapshot.version
+    )
+    BATCH_STAGES["response"].observe_since(now)
+    return response
+
+@app.post("/predict/arrow")
+async def predict_arrow(request: Request):
+    """
+    Score an Arrow IPC stream of patients (the 13 features as numeric columns).
+    
+    Schema, whole-number and range checks run per column; rows that fail
+    are skipped with an `error`. Returns an Arrow IPC stream of prediction,
+    probability (of disease), confidence and error, one row per input row.
+    """
+    
+    content_type = request.headers.get("content-type", ARROW_STREAM_MEDIA_TYPE)
+    if content_type.split(";")[0].strip() not in (ARROW_STREAM_MEDIA_TYPE, "application/octet-stream"):
+        raise HTTPException(
+            status_code=415,
+            detail=f"Expected an Arrow IPC stream ({ARROW_STREAM_MEDIA_TYPE})"
+        )
+    
+    snapshot = _route(_require_snapshot("/predict/arrow"), request)
+    body = await _read_limited_body(request, MAX_ARROW_BODY_BYTES)
+    
+    async with _admitted("/predict/arrow", request):
+        content = await run_in_threadpool(_score_arrow, body, request.scope.get("received_ns"), snapshot)
+    return Response(content=content, media_type=ARROW_STREAM_MEDIA_TYPE, headers={"X-Model-Version": snapshot.version})
+
+async def _read_limited_body(request, max_bytes):
+    """The request body, or 413 once its declared or received size passes `max_bytes`"""
+    too_large = HTTPException(status_code=413, detail=f"Body too large (max {max_bytes} bytes)")
+    try:
+        declared = int(request.headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+    if declared > max_bytes:
+        raise too_large
+    
+    # Chunked bodies declare no length, so the limit is enforced while receiving too
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def _score_arrow(body, received_ns, snapshot):
+    now = time.perf_counter_ns()
+    try:
+        features, errors = read_features(body, FEATURE_NAMES, max_rows=MAX_BATCH_SIZE)
+    except ArrowSchemaError as e:
+        ERRORS.inc("/predict/arrow", "ArrowSchemaError")
+        raise HTTPException(status_code=422, detail=str(e))
+    except OverflowError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    now = ARROW_STAGES["validation"].observe_since(received_ns or now)
+    
+    valid = np.equal(errors, None)
+    n_valid = int(valid.sum())
+    if n_valid < len(valid):
+        ERRORS.inc("/predict/arrow", "ValidationError")
+    # Boolean indexing copies; a batch with no invalid rows is scored in place
+    valid_features = features if n_valid == len(valid) else features[valid]
+    now = ARROW_STAGES["features"].observe_since(now)
+    
+    predictions = np.full(len(valid), -1, dtype=np.int64)
+    confidences = np.full(len(valid), np.nan)
+    if DRIFT_MONITOR is not None:
+        DRIFT_MONITOR.observe_many(valid_features)
+    # Scoring scales the matrix in place, so the audit log and shadow share a copy
+    shadow = SHADOW
+    raw_features = valid_features.copy() if (AUDIT_LOG is not None or shadow is not None) and n_valid else None
+    
+    if n_valid:
+        try:
+            predictions[valid], confidences[valid] = snapshot.score(valid_features, ARROW_STAGES)
+        except Exception as e:
+            ERRORS.inc("/predict/arrow", type(e).__name__)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Prediction failed: {str(e)}"
+            )
+        now = time.perf_counter_ns()
+        valid_predictions, valid_confidences = predictions[valid], confidences[valid]
+        VERSION_STATS.observe(
+            snapshot.version, now - (received_ns or now), n_valid,
+            int(np.count_nonzero(valid_predictions == 1)), float(valid_confidences.sum())
+        )
+        if shadow is not None:
+            shadow.submit(snapshot.version, raw_features, valid_predictions, valid_confidences)
+        if AUDIT_LOG is not None:
+            AUDIT_LOG.record(
+                "/predict/arrow", snapshot.version, (now - (received_ns or now)) / 1e9,
+                raw_features, valid_predictions, valid_confidences
+            )
+    
+    probabilities = np.where(predictions == 1, confidences, 1.0 - confidences)
+    content = write_scores(predictions, probabilities, confidences, errors, snapshot.version)
+    ARROW_STAGES["response"].observe_since(now)
+    return content
+
+@app.get("/batcher-stats")
+def batcher_stats():
+    """Queue depth and batch-size statistics of the /predict micro-batcher"""
+    if BATCHER is None:
+        return {"enabled": False}
+    return {"enabled": True, **BATCHER.stats()}
+
+@app.get("/drift")
+def drift():
+    """Latest PSI/KS drift scores of live request features against the training distributions"""
+    monitor = DRIFT_MONITOR
+    if monitor is None:
+        return {"enabled": False}
+    report = monitor.report if monitor.report is not None else {"status": "pending"}
+    return {"enabled": True, "interval_s": monitor.interval_s, "prefork_worker": _worker_pid(), **report}
+
+@app.get("/experiment")
+def experiment():
+    """Traffic split, shadow agreement and per-version request stats"""
+    split = TRAFFIC_SPLIT
+    shadow = SHADOW
+    return {
+        "enabled": split is not None or shadow is not None,
+        "served_model": _snapshot_info(SNAPSHOT),
+        "split": split.info() if split is not None else None,
+        "shadow": shadow.stats() if shadow is not None else None,
+        "versions": VERSION_STATS.summary(),
+        "prefork_worker": _worker_pid(),
+    }
+
 @app.get("/model-info")
 def model_info():
     """Get information about the loaded model"""
+    snapshot = SNAPSHOT
     return {
-        "model_loaded": MODEL is not None,
-        "model_version": MODEL_VERSION,
-        "model_type": type(MODEL).__name__ if MODEL else None,
-        "scaler_available": SCALER is not None,
-        "features_expected": 13
+        "model_loaded": snapshot is not None,
+        "model_version": snapshot.version if snapshot is not None else None,
+        "model_source": snapshot.source if snapshot is not None else None,
+        "model_type": type(snapshot.model).__name__ if snapshot is not None else None,
+        "engine": snapshot.engine_name if snapshot is not None else None,
+        "scaler_available": snapshot is not None and snapshot.scaler is not None,
+        "features_expected": 13,
+        "loaded_at": snapshot.loaded_at if snapshot is not None else None,
+        "previous_model": _snapshot_info(PREVIOUS_SNAPSHOT),
+        "reload_watcher": WATCHER.stats() if WATCHER is not None else None,
+        "prediction_cache": PREDICTION_CACHE.stats() if PREDICTION_CACHE is not None else None
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of request-path latencies, model loads and errors"""
+    stage_histograms = {}
+    for endpoint, stages in (("/predict", PREDICT_STAGES), ("/predict/batch", BATCH_STAGES), ("/predict/arrow", ARROW_STAGES)):
+        for stage, histogram in stages.items():
+            stage_histograms[(endpoint, stage)] = histogram
+    
+    snapshot = SNAPSHOT
+    lines = render_histograms(
+        "heart_api_stage_latency_seconds", "Request-path latency by endpoint and stage",
+        stage_histograms, ("endpoint", "stage")
+    )
+    lines += render_histograms(
+        "heart_api_model_load_seconds", "Time to resolve, load and warm a model",
+        {(kind,): histogram for kind, histogram in MODEL_LOAD_LATENCY.items()}, ("kind",)
+    )
+    lines += render_errors("heart_api_errors_total", ERRORS)
+    lines += render_gauge(
+        "heart_api_model_info", "The model being served (always 1)",
+        1 if snapshot is not None else None,
+        **({"version": snapshot.version, "engine": snapshot.engine_name} if snapshot is not None else {})
+    )
+    if PREDICTION_CACHE is not None:
+        cache_stats = PREDICTION_CACHE.stats()
+        lines += render_counters(
+            "heart_api_prediction_cache_lookups_total", "Prediction cache lookups, by result",
+            {"hit": cache_stats["hits"], "miss": cache_stats["misses"]}, "result"
+        )
+    lines += render_histograms(
+        "heart_api_version_latency_seconds", "Request latency by the model version that served it",
+        {(version,): histogram for version, histogram in VERSION_STATS.latency_histograms().items()}, ("version",)
+    )
+    shadow = SHADOW
+    if shadow is not None:
+        agreement = list(shadow.agreement.items())
+        lines += render_counters(
+            "heart_api_shadow_rows_total", f"Rows shadow-scored with {shadow.snapshot.version}, by served version",
+            {version: counts[0] for version, counts in agreement}, "served_version"
+        )
+        lines += render_counters(
+            "heart_api_shadow_agreements_total", "Shadow-scored rows with the same prediction as served, by served version",
+            {version: counts[1] for version, counts in agreement}, "served_version"
+        )
+        lines += render_counters(
+            "heart_api_shadow_dropped_total", "Rows dropped from the shadow queue, by shadow version",
+            {shadow.snapshot.version: shadow.dropped}, "shadow_version"
+        )
+    if ADMISSION is not None:
+        lines += render_histograms(
+            "heart_api_admission_queue_seconds", "Time scoring requests waited for a slot",
+            {(): ADMISSION.queue_time}, ()
+        )
+        lines += render_counters(
+            "heart_api_shed_total", "Requests rejected by admission control, by reason", ADMISSION.shed, "reason"
+        )
+        lines += render_gauge("heart_api_in_flight", "Requests being scored", ADMISSION.in_flight)
+        lines += render_gauge("heart_api_admission_queued", "Requests waiting for a scoring slot", ADMISSION.queued)
+    
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@app.post("/admin/reload")
+def admin_reload(request: Optional[ReloadRequest] = None, x_admin_token: Optional[str] = Header(None)):
+    """
+    Load a registry version (the latest by default), warm it up and swap it in.
+    Requests in flight finish on the model they started with.
+    """
+    _require_admin(x_admin_token)
+    version = request.version if request is not None and request.version else "latest"
+    
+    if PREFORK_WORKER is not None:
+        # The supervisor loads the version once and forks a new generation of workers from it
+        PREFORK_WORKER.request("reload", version)
+        return JSONResponse(status_code=202, content={
+            "status": "reload requested", "version": version, "model": _snapshot_info(SNAPSHOT)
+        })
+    
+    snapshot = reload_model(version)
+    if snapshot is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Could not load model version '{version}'; still serving the current model"
+        )
+    return {"status": "reloaded", "model": _snapshot_info(snapshot), "previous_model": _snapshot_info(PREVIOUS_SNAPSHOT)}
+
+@app.post("/admin/rollback")
+def admin_rollback(x_admin_token: Optional[str] = Header(None)):
+    """Swap back to the previously served model"""
+    _require_admin(x_admin_token)
+    
+    if PREFORK_WORKER is not None:
+        PREFORK_WORKER.request("rollback")
+        return JSONResponse(status_code=202, content={"status": "rollback requested", "model": _snapshot_info(SNAPSHOT)})
+    
+    snapshot = rollback_model()
+    if snapshot is None:
+        raise HTTPException(status_code=409, detail="No previous model to roll back to")
+    return {"status": "rolled back", "model": _snapshot_info(snapshot), "previous_model": _snapshot_info(PREVIOUS_SNAPSHOT)}
+
+@app.post("/admin/experiment")
+def admin_experiment(request: ExperimentRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Load candidate and shadow registry versions next to the served model and
+    start splitting and shadowing traffic, replacing any running experiment.
+    """
+    _require_admin(x_admin_token)
+    if PREFORK_WORKER is not None:
+        raise HTTPException(
+            status_code=409,
+            detail="Under the pre-fork server, experiments are set with AB_CANDIDATES and SHADOW_VERSION"
+        )
+    
+    with _RELOAD_LOCK:
+        try:
+            started = load_experiment(list(request.candidates.items()), request.shadow, request.routing)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if not started:
+            raise HTTPException(status_code=404, detail="Could not load every requested model version")
+        if SHADOW is not None:
+            SHADOW.start()
+    return experiment()
+
+@app.delete("/admin/experiment")
+def admin_stop_experiment(x_admin_token: Optional[str] = Header(None)):
+    """Send all traffic back to the served model and stop shadow scoring"""
+    _require_admin(x_admin_token)
+    if PREFORK_WORKER is not None:
+        raise HTTPException(
+            status_code=409,
+            detail="Under the pre-fork server, experiments are set with AB_CANDIDATES and SHADOW_VERSION"
+        )
+    
+    with _RELOAD_LOCK:
+        install_experiment()
+    return {"status": "stopped", "versions": VERSION_STATS.summary()}
+
+STARTUP_PHASES["imports"] = round(time.perf_counter() - _MODULE_STARTED, 4)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
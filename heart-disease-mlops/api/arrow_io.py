@@ -0,0 +1,143 @@
+"""
+Arrow IPC stream bodies for bulk scoring (/predict/arrow).
+A request is a stream of record batches with the 13 features as numeric
+columns. Schema, integrality and ranges are checked a column at a time
+with NumPy, and the columns are copied straight into the float64 feature
+matrix, so no Python object is created per row. Rows that fail a check
+are skipped and get an error, as in /predict/batch; the response is an
+Arrow IPC stream with one row per input row, in order.
+pyarrow is imported on first use, so API workers that never see an Arrow
+request don't pay for loading it at startup.
+"""
+
+import numpy as np
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Accepted values per feature (inclusive), as coded in the UCI heart dataset
+FEATURE_RANGES = {
+    "age": (1, 120),
+    "sex": (0, 1),
+    "cp": (0, 3),
+    "trestbps": (50, 250),
+    "chol": (50, 700),
+    "fbs": (0, 1),
+    "restecg": (0, 2),
+    "thalach": (40, 250),
+    "exang": (0, 1),
+    "oldpeak": (-5.0, 10.0),
+    "slope": (0, 2),
+    "ca": (0, 4),
+    "thal": (0, 3),
+}
+
+# Features that must be whole numbers (PatientData declares all but oldpeak as int)
+FLOAT_FEATURES = {"oldpeak"}
+
+def result_schema():
+    """Schema of the response stream"""
+    import pyarrow as pa
+    return pa.schema([
+        ("prediction", pa.int8()),
+        ("probability", pa.float64()),
+        ("confidence", pa.float64()),
+        ("error", pa.string()),
+    ])
+
+class ArrowSchemaError(ValueError):
+    """The body is not an Arrow stream with the expected feature columns"""
+
+def read_features(body, feature_names, max_rows=None):
+    """
+    Decode an Arrow IPC stream into a (n_rows, n_features) float64 matrix.
+    Returns (features, errors): errors is an object array holding None for
+    valid rows and a message for rows to skip (their features are NaN).
+    The schema is checked before any batch is decoded, and the stream is
+    read a batch at a time, so one past `max_rows` raises OverflowError
+    without decoding the rest.
+    """
+    import pyarrow as pa
+    
+    try:
+        reader = pa.ipc.open_stream(body)
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ArrowSchemaError(f"Body is not an Arrow IPC stream: {e}")
+    
+    schema = reader.schema
+    missing = [name for name in feature_names if name not in schema.names]
+    if missing:
+        raise ArrowSchemaError(f"Missing feature columns: {', '.join(missing)}")
+    for name in feature_names:
+        column_type = schema.field(name).type
+        if not (pa.types.is_integer(column_type) or pa.types.is_floating(column_type)):
+            raise ArrowSchemaError(f"Column '{name}' must be numeric, got {column_type}")
+    
+    batches = []
+    n_rows = 0
+    try:
+        for batch in reader:
+            n_rows += batch.num_rows
+            if max_rows is not None and n_rows > max_rows:
+                raise OverflowError(f"Batch too large: more than {max_rows} rows")
+            batches.append(batch)
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ArrowSchemaError(f"Body is not an Arrow IPC stream: {e}")
+    table = pa.Table.from_batches(batches, schema=schema)
+    
+    features = np.empty((n_rows, len(feature_names)), dtype=np.float64)
+    errors = np.full(n_rows, None, dtype=object)
+    # Reversed, so a row failing several checks reports its first column
+    for j in reversed(range(len(feature_names))):
+        name = feature_names[j]
+        # Nulls become NaN; chunks are concatenated into the matrix column directly
+        values = features[:, j]
+        offset = 0
+        for chunk in table.column(name).chunks:
+            values[offset:offset + len(chunk)] = chunk.cast(pa.float64()).to_numpy(zero_copy_only=False)
+            offset += len(chunk)
+        
+        low, high = FEATURE_RANGES.get(name, (-np.inf, np.inf))
+        with np.errstate(invalid="ignore"):
+            bad_range = ~((values >= low) & (values <= high))
+            missing_value = np.isnan(values)
+            errors[bad_range] = f"{name}: must be between {low} and {high}"
+            if name not in FLOAT_FEATURES:
+                errors[values != np.floor(values)] = f"{name}: must be a whole number"
+            errors[missing_value] = f"{name}: missing value"
+    
+    valid = np.equal(errors, None)
+    features[~valid] = np.nan
+    return features, errors
+
+def write_scores(predictions, probabilities, confidences, errors, model_version):
+    """Encode per-row results (NaN/-1 for skipped rows) as an Arrow IPC stream"""
+    import pyarrow as pa
+    
+    skipped = np.not_equal(errors, None)
+    table = pa.Table.from_arrays([
+        pa.array(predictions.astype(np.int8), mask=skipped),
+        pa.array(probabilities, mask=skipped),
+        pa.array(confidences, mask=skipped),
+        pa.array(errors, type=pa.string()),
+    ], schema=result_schema().with_metadata({"model_version": model_version}))
+    
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def encode_frame(df):
+    """Client helper: a DataFrame of patients as an Arrow IPC stream body"""
+    import pyarrow as pa
+    
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def decode_table(body):
+    """Client helper: read a response body back into a pyarrow Table"""
+    import pyarrow as pa
+    
+    return pa.ipc.open_stream(body).read_all()
@@ -0,0 +1,284 @@
+"""
+Prediction audit log.
+The request path only appends a tuple of references (inputs, outputs,
+model version, latency) to an in-memory buffer; a background thread turns
+them into records and writes them in large batches to JSONL or Arrow IPC
+stream files, rotated by size and age. Both formats are readable up to
+the last flushed batch, so a crash only loses what was still buffered. The buffer holds at most `max_rows`
+predictions: when the writer can't keep up, the oldest (or, with
+drop_policy="newest", the incoming) predictions are dropped and counted
+instead of growing memory or blocking requests.
+
+Each record is one prediction:
+    {"ts", "endpoint", "model_version", "latency_ms", "inputs": {13 features},
+     "prediction", "confidence"}
+read_audit_log() reads a file or a directory of rotated files back in
+order, and benchmarks/load_test.py --replay accepts the same paths.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+FORMATS = ("jsonl", "arrow")
+DROP_POLICIES = ("oldest", "newest")
+
+class AuditLog:
+    """Bounded buffer of predictions plus the thread that writes them out"""
+    
+    def __init__(self, directory, feature_names, file_format="jsonl", max_rows=100000, flush_rows=10000,
+                 flush_interval_s=1.0, rotate_bytes=100 * 1024 * 1024, rotate_s=3600.0, drop_policy="oldest"):
+        if file_format not in FORMATS:
+            raise ValueError(f"Unknown audit log format '{file_format}' (use one of {FORMATS})")
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}' (use one of {DROP_POLICIES})")
+        
+        self.directory = directory
+        self.feature_names = list(feature_names)
+        self.format = file_format
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        self.rotate_bytes = rotate_bytes
+        self.rotate_s = rotate_s
+        self.drop_policy = drop_policy
+        
+        # Entries are (ts, endpoint, model_version, latency_s, inputs, predictions, confidences, n_rows)
+        self._entries = deque()
+        self._rows = 0
+        self._lock = threading.Lock()
+        # Serializes flushes (the writer thread's and explicit ones) on the open file
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # The open text file (jsonl) or output stream (arrow), and the Arrow writer on it
+        self._file = None
+        self._arrow_writer = None
+        self._opened_at = None
+        
+        # Stats
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.files = 0
+        self.current_path = None
+    
+    # Request path
+    
+    def record(self, endpoint, model_version, latency_s, inputs, predictions, confidences):
+        """
+        Queue predictions for writing. `inputs` is a PatientData (with scalar
+        outputs), a list of them, or a raw (n_rows, n_features) matrix the
+        caller won't modify; outputs are scalars or sequences to match.
+        """
+        n_rows = 1 if np.isscalar(predictions) else len(predictions)
+        if n_rows == 0:
+            return
+        entry = (time.time(), endpoint, model_version, latency_s, inputs, predictions, confidences, n_rows)
+        with self._lock:
+            self.logged += n_rows
+            if self._rows + n_rows > self.max_rows:
+                if self.drop_policy == "newest" or n_rows > self.max_rows:
+                    self.dropped += n_rows
+                    return
+                while self._rows + n_rows > self.max_rows:
+                    dropped_rows = self._entries.popleft()[-1]
+                    self._rows -= dropped_rows
+                    self.dropped += dropped_rows
+            self._entries.append(entry)
+            self._rows += n_rows
+            full = self._rows >= self.flush_rows
+        if full:
+            self._wakeup.set()
+    
+    # Writer
+    
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=10.0):
+        """Write out everything buffered and close the current file"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            self._close_file()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval_s)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.write_errors += 1
+                print(f"⚠ Audit log: write failed: {type(e).__name__}: {e}")
+    
+    def flush(self):
+        """Write the buffered predictions as one batch (called by the writer thread)"""
+        with self._write_lock:
+            with self._lock:
+                entries, self._entries = self._entries, deque()
+                self._rows = 0
+            if not entries:
+                self._rotate_if_due()
+                return 0
+            
+            records = self._records(entries)
+            self._rotate_if_due()
+            if self._file is None:
+                self._open_file()
+            if self.format == "jsonl":
+                self._file.write("".join(json.dumps(record) + "\n" for record in records))
+                self._file.flush()
+            else:
+                self._write_arrow(records)
+            self.written += len(records)
+            return len(records)
+    
+    def _records(self, entries):
+        records = []
+        names = self.feature_names
+        for ts, endpoint, model_version, latency_s, inputs, predictions, confidences, n_rows in entries:
+            base = {"ts": ts, "endpoint": endpoint, "model_version": model_version,
+                    "latency_ms": round(latency_s * 1e3, 4)}
+            if n_rows == 1 and np.isscalar(predictions):
+                inputs, predictions, confidences = [inputs], [predictions], [confidences]
+            if isinstance(inputs, np.ndarray):
+                rows = [dict(zip(names, row)) for row in inputs.tolist()]
+            else:
+                rows = [{name: getattr(patient, name) for name in names} for patient in inputs]
+            for row, prediction, confidence in zip(rows, np.asarray(predictions).tolist(),
+                                                   np.asarray(confidences).tolist()):
+                records.append({**base, "inputs": row, "prediction": prediction, "confidence": confidence})
+        return records
+    
+    # Files
+    
+    def _rotate_if_due(self):
+        if self._file is None:
+            return
+        too_big = self._file.tell() >= self.rotate_bytes
+        too_old = time.time() - self._opened_at >= self.rotate_s
+        if too_big or too_old:
+            self._close_file()
+    
+    def _open_file(self):
+        # The pid keeps the files of pre-forked workers apart
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        extension = "jsonl" if self.format == "jsonl" else "arrow"
+        self.current_path = os.path.join(self.directory, f"audit-{stamp}-{os.getpid()}-{self.files:04d}.{extension}")
+        if self.format == "jsonl":
+            self._file = open(self.current_path, "a")
+        else:
+            import pyarrow as pa
+            self._file = pa.OSFile(self.current_path, "wb")
+        self._opened_at = time.time()
+        self.files += 1
+    
+    def _close_file(self):
+        if self._file is None:
+            return
+        if self._arrow_writer is not None:
+            self._arrow_writer.close()
+            self._arrow_writer = None
+        self._file.close()
+        self._file = None
+    
+    def _write_arrow(self, records):
+        import pyarrow as pa
+        
+        columns = {
+            "ts": pa.array([r["ts"] for r in records], pa.float64()),
+            "endpoint": pa.array([r["endpoint"] for r in records], pa.string()),
+            "model_version": pa.array([r["model_version"] for r in records], pa.string()),
+            "latency_ms": pa.array([r["latency_ms"] for r in records], pa.float64()),
+        }
+        for name in self.feature_names:
+            columns[name] = pa.array([r["inputs"][name] for r in records], pa.float64())
+        columns["prediction"] = pa.array([r["prediction"] for r in records], pa.int64())
+        columns["confidence"] = pa.array([r["confidence"] for r in records], pa.float64())
+        table = pa.table(columns)
+        
+        # The stream format (unlike the file format) needs no footer written on close
+        if self._arrow_writer is None:
+            self._arrow_writer = pa.ipc.new_stream(self._file, table.schema)
+        self._arrow_writer.write_table(table)
+        self._file.flush()
+    
+    def stats(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "format": self.format,
+            "buffered": self._rows,
+            "max_rows": self.max_rows,
+            "drop_policy": self.drop_policy,
+            "logged": self.logged,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "files": self.files,
+            "current_file": self.current_path,
+        }
+
+def audit_files(path):
+    """A file, or the audit files of a directory in the order they were written"""
+    if not os.path.isdir(path):
+        return [path]
+    names = sorted(name for name in os.listdir(path) if name.startswith("audit-"))
+    return [os.path.join(path, name) for name in names]
+
+def _read_arrow_stream(file_path):
+    """
+    The batches of an Arrow audit file as a table (None if it holds no
+    schema yet). A file whose writer was killed mid-batch is read up to
+    its last complete batch.
+    """
+    import pyarrow as pa
+    
+    try:
+        reader = pa.ipc.open_stream(pa.memory_map(file_path, "r"))
+    except pa.ArrowInvalid:
+        return None
+    batches = []
+    try:
+        for batch in reader:
+            batches.append(batch)
+    except (pa.ArrowInvalid, OSError):
+        pass
+    return pa.Table.from_batches(batches, schema=reader.schema)
+
+def read_audit_log(path, feature_names=None):
+    """Yield audit records from a file or directory (JSONL or Arrow) in order"""
+    for file_path in audit_files(path):
+        if file_path.endswith(".arrow"):
+            table = _read_arrow_stream(file_path)
+            if table is None:
+                continue
+            names = feature_names or [
+                name for name in table.column_names
+                if name not in ("ts", "endpoint", "model_version", "latency_ms", "prediction", "confidence")
+            ]
+            for row in table.to_pylist():
+                yield {
+                    "ts": row["ts"], "endpoint": row["endpoint"], "model_version": row["model_version"],
+                    "latency_ms": row["latency_ms"], "inputs": {name: row[name] for name in names},
+                    "prediction": row["prediction"], "confidence": row["confidence"],
+                }
+            continue
+        with open(file_path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
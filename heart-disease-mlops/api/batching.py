@@ -0,0 +1,163 @@
+"""
+Dynamic micro-batching for /predict.
+Concurrent requests are queued on an asyncio queue, coalesced into one
+feature matrix and scored with a single model call; each caller's future
+is then resolved with its own row of the result.
+"""
+
+import asyncio
+import time
+
+import numpy as np
+
+class MicroBatcher:
+    """
+    Collects rows until `max_batch_size` is reached or the oldest row has
+    waited `max_wait_us` microseconds, then scores them together.
+    
+    score_fn takes a context and a (n_rows, n_features) float64 matrix and
+    returns (predictions, confidences). Rows are only scored together with
+    rows submitted under the same context (the API passes its model
+    snapshot, so a hot reload never mixes models within one call).
+    It runs on the default executor so the event loop keeps accepting
+    requests (and filling the next batch) while a batch is being scored.
+    """
+    
+    def __init__(self, score_fn, max_batch_size=64, max_wait_us=1000):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_us = max_wait_us
+        
+        self._queue = None
+        self._wakeup = None
+        self._task = None
+        
+        # Stats
+        self.requests = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+        self.total_wait_us = 0.0
+        self.batch_size_counts = {}
+    
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+    
+    async def start(self):
+        """Create the queue and the dispatcher task on the running loop"""
+        self._queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self):
+        """Stop dispatching and fail anything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        while self._queue is not None and not self._queue.empty():
+            _, _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+    
+    async def submit(self, row, context=None):
+        """Queue one feature row and wait for its (prediction, confidence) under `context`"""
+        if not self.running:
+            raise RuntimeError("Batcher is not running")
+        
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, context, future, time.perf_counter()))
+        self._wakeup.set()
+        return await future
+    
+    async def _next_batch(self):
+        """Block for the first row, then gather more until the batch is full or the wait expires"""
+        batch = [await self._queue.get()]
+        deadline = batch[0][3] + self.max_wait_us / 1e6
+        
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without touching the timer
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            
+            # Wait on an event rather than on queue.get() so a timeout can never drop a row
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        
+        return batch
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = await self._next_batch()
+            started = time.perf_counter()
+            self._record(batch, started)
+            
+            # Almost always one group; two only while a reload is in flight
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[1]), []).append(item)
+            
+            for group in groups.values():
+                await self._score_group(loop, group)
+    
+    async def _score_group(self, loop, group):
+        context = group[0][1]
+        features = np.vstack([row for row, _, _, _ in group])
+        try:
+            predictions, confidences = await loop.run_in_executor(None, self.score_fn, context, features)
+        except Exception as e:
+            for _, _, future, _ in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for i, (_, _, future, _) in enumerate(group):
+            # The caller may have gone away (e.g. client disconnect)
+            if not future.done():
+                future.set_result((predictions[i], confidences[i]))
+    
+    def _record(self, batch, started):
+        size = len(batch)
+        self.requests += size
+        self.batches += 1
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        self.total_wait_us += sum((started - queued) * 1e6 for _, _, _, queued in batch)
+        
+        # Power-of-two buckets: "1", "2-3", "4-7", ...
+        low = 1 << (size.bit_length() - 1)
+        bucket = str(low) if low == 1 else f"{low}-{2 * low - 1}"
+        self.batch_size_counts[bucket] = self.batch_size_counts.get(bucket, 0) + 1
+    
+    def stats(self):
+        """Queue depth and batch-size statistics"""
+        return {
+            "running": self.running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_us": self.max_wait_us,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            "mean_queue_wait_us": self.total_wait_us / self.requests if self.requests else 0.0,
+            "batch_size_histogram": dict(
+                sorted(self.batch_size_counts.items(), key=lambda item: int(item[0].split("-")[0]))
+            ),
+        }
@@ -0,0 +1,65 @@
+"""
+In-process LRU cache of predictions.
+Retries and repeat screenings send identical PatientData payloads, so the
+result for a (model snapshot, feature vector) key can be reused without
+scaling or evaluating the forest again.
+"""
+
+import threading
+from collections import OrderedDict
+
+class PredictionCache:
+    """
+    Size-bounded LRU mapping of key -> (prediction, confidence).
+    Keys include the served snapshot's id (not its version, which is a
+    constant such as "manual" for local models), so swapping models never
+    serves a stale entry; old entries simply age out.
+    """
+    
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(model_key, row):
+        """Normalize a feature row (ints and floats alike) into a hashable key"""
+        return (model_key, tuple(float(value) for value in row))
+    
+    def get(self, key):
+        """Return the cached value and mark it most recently used, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,159 @@
+"""
+Streaming feature-drift monitor for live traffic.
+Each scored feature row is counted into the reference histogram bins of
+src/drift.py: one bisect and one increment per feature, into a per-thread
+shard (a plain list, as in metrics.py), so an update is O(1), takes no
+lock and costs a few microseconds, and memory is fixed by the number of
+bins. A background thread periodically sums the shards, keeps
+the totals of the last `window` intervals in a ring, and scores the
+window's counts against the reference with PSI and KS. Requests only
+ever read the finished report.
+"""
+
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from api.metrics import _PerThreadShards
+from src.drift import (
+    KS_ALPHA, PSI_ALERT, PSI_WARN, ks_critical_value, ks_statistic, psi, psi_groups,
+)
+
+class DriftMonitor(_PerThreadShards):
+    """Live histograms of the features in `feature_names` against a reference profile"""
+    
+    def __init__(self, reference, feature_names, interval_s=60.0, window=60, min_samples=100):
+        super().__init__()
+        features = reference["features"]
+        missing = [name for name in feature_names if name not in features]
+        if missing:
+            raise ValueError(f"Drift reference has no profile for: {', '.join(missing)}")
+        
+        self.feature_names = list(feature_names)
+        self.interval_s = interval_s
+        self.window = window
+        self.min_samples = min_samples
+        
+        # Per feature: reference bin counts, PSI grouping, and where its bins start in a shard
+        self.reference_counts = [np.asarray(features[name]["counts"], dtype=np.int64) for name in feature_names]
+        self.reference_n = [int(features[name]["n"]) for name in feature_names]
+        self.groups = [psi_groups(counts) for counts in self.reference_counts]
+        sizes = [len(counts) for counts in self.reference_counts]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self.n_bins = int(sum(sizes))
+        
+        # (edges, offset) per feature, as plain lists for bisect on the single-row path
+        self.feature_edges = [np.asarray(features[name]["edges"], dtype=np.float64) for name in feature_names]
+        self._bisect_edges = list(zip((edges.tolist() for edges in self.feature_edges), self.offsets.tolist()))
+        
+        # Cumulative totals at the start and at the end of each of the last `window` intervals
+        self._history = [np.zeros(self.n_bins, dtype=np.int64)]
+        self.report = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _make_shard(self):
+        return [0] * self.n_bins
+    
+    def observe(self, row):
+        """Count one raw feature row (n_features float64 values, in feature_names order)"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        for (edges, offset), value in zip(self._bisect_edges, row.tolist()):
+            shard[offset + bisect_right(edges, value)] += 1
+    
+    def observe_many(self, features):
+        """Count the rows of a (n_rows, n_features) raw feature matrix"""
+        if len(features) == 0:
+            return
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        bins = np.concatenate([
+            offset + np.searchsorted(edges, features[:, j], side="right")
+            for j, (edges, offset) in enumerate(zip(self.feature_edges, self.offsets))
+        ])
+        for i, count in enumerate(np.bincount(bins, minlength=self.n_bins).tolist()):
+            if count:
+                shard[i] += count
+    
+    def totals(self):
+        totals = np.zeros(self.n_bins, dtype=np.int64)
+        for shard in self._all_shards():
+            totals += np.asarray(shard, dtype=np.int64)
+        return totals
+    
+    def compute(self):
+        """Score the last `window` intervals against the reference; stores and returns the report"""
+        totals = self.totals()
+        self._history.append(totals)
+        if len(self._history) > self.window + 1:
+            self._history.pop(0)
+        live = totals - self._history[0]
+        
+        features = {}
+        for j, name in enumerate(self.feature_names):
+            counts = live[self.offsets[j]:self.offsets[j] + len(self.reference_counts[j])]
+            n = int(counts.sum())
+            if n < self.min_samples:
+                features[name] = {"n": n, "psi": None, "ks": None, "status": "insufficient_data"}
+                continue
+            feature_psi = psi(self.reference_counts[j], counts, self.groups[j])
+            ks = ks_statistic(self.reference_counts[j], counts)
+            ks_critical = ks_critical_value(self.reference_n[j], n, alpha=KS_ALPHA / len(self.feature_names))
+            if feature_psi >= PSI_ALERT:
+                status = "drift"
+            elif feature_psi >= PSI_WARN or ks > ks_critical:
+                status = "warning"
+            else:
+                status = "stable"
+            features[name] = {
+                "n": n,
+                "psi": round(feature_psi, 6),
+                "ks": round(ks, 6),
+                "ks_critical": round(ks_critical, 6),
+                "out_of_range": int(counts[0] + counts[-1]),
+                "status": status,
+            }
+        
+        statuses = [feature["status"] for feature in features.values()]
+        if "drift" in statuses:
+            overall = "drift"
+        elif "warning" in statuses:
+            overall = "warning"
+        elif "stable" in statuses:
+            overall = "stable"
+        else:
+            overall = "insufficient_data"
+        
+        self.report = {
+            "status": overall,
+            "computed_at": time.time(),
+            "window_s": self.interval_s * (len(self._history) - 1),
+            "drifted_features": [name for name, feature in features.items() if feature["status"] == "drift"],
+            "features": features,
+        }
+        return self.report
+    
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.compute()
+            except Exception as e:
+                print(f"⚠ Drift monitor: {type(e).__name__}: {e}")
@@ -0,0 +1,258 @@
+"""
+A/B and shadow evaluation of candidate model versions on live traffic.
+TrafficSplit sends a share of requests to candidate snapshots, either at
+random by weight or by a stable hash of a routing key, so a client keeps
+seeing the same version; the rest stay on the served model.
+ShadowScorer scores the requests a second time with another snapshot,
+off the response path: the request only queues references to its raw
+features and served predictions, and a background thread scores them in
+batches and counts how often the shadow agrees with what was served.
+VersionStats keeps request counts, positive rates and latencies per
+version, so the arms can be compared before a promotion.
+"""
+
+import hashlib
+import random
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from itertools import accumulate
+
+import numpy as np
+
+from api.metrics import LatencyHistogram, QUANTILES, _PerThreadShards
+
+ROUTING_MODES = ("hash", "weight")
+
+def parse_candidates(spec):
+    """Parse "version:weight,version:weight" (e.g. "7:0.1") into [(version, weight)]"""
+    candidates = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        version, _, weight = item.partition(":")
+        try:
+            candidates.append((version.strip(), float(weight)))
+        except ValueError:
+            raise ValueError(f"Expected 'version:weight', got '{item}'")
+    return candidates
+
+class TrafficSplit:
+    """Routes a share of requests to each candidate snapshot; the remainder goes to the served model"""
+    
+    def __init__(self, candidates, routing="hash"):
+        if routing not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing '{routing}' (use one of {ROUTING_MODES})")
+        weights = [float(weight) for _, weight in candidates]
+        if any(weight <= 0 for weight in weights) or sum(weights) > 1.0:
+            raise ValueError("Candidate weights must be positive and add up to at most 1")
+        
+        self.candidates = [snapshot for snapshot, _ in candidates]
+        self.weights = weights
+        self.routing = routing
+        # Upper bound of each candidate's slice of [0, 1)
+        self._bounds = list(accumulate(weights))
+    
+    def choose(self, served, key=None):
+        """
+        The snapshot for one request. With hash routing, requests with the
+        same key (bytes) always land on the same arm; without a key, or with
+        weight routing, the arm is drawn at random.
+        """
+        if self.routing == "hash" and key is not None:
+            digest = hashlib.blake2b(key, digest_size=8).digest()
+            point = int.from_bytes(digest, "big") / 2.0 ** 64
+        else:
+            point = random.random()
+        i = bisect_right(self._bounds, point)
+        return self.candidates[i] if i < len(self.candidates) else served
+    
+    def info(self):
+        return {
+            "routing": self.routing,
+            "candidates": [
+                {"version": snapshot.version, "weight": weight}
+                for snapshot, weight in zip(self.candidates, self.weights)
+            ],
+            "served_weight": round(1.0 - sum(self.weights), 6),
+        }
+
+class VersionStats(_PerThreadShards):
+    """Requests, rows scored, positive predictions and latency per model version"""
+    
+    def __init__(self):
+        super().__init__()
+        self._latency = {}
+    
+    def _make_shard(self):
+        # version -> [requests, rows, positive predictions, sum of confidences]
+        return {}
+    
+    def observe(self, version, elapsed_ns, n_rows, n_positive, confidence_sum):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        counts = shard.get(version)
+        if counts is None:
+            counts = shard[version] = [0, 0, 0, 0.0]
+        counts[0] += 1
+        counts[1] += n_rows
+        counts[2] += n_positive
+        counts[3] += confidence_sum
+        
+        histogram = self._latency.get(version)
+        if histogram is None:
+            with self._shards_lock:
+                histogram = self._latency.setdefault(version, LatencyHistogram())
+        histogram.observe_ns(elapsed_ns)
+    
+    def latency_histograms(self):
+        with self._shards_lock:
+            return dict(self._latency)
+    
+    def summary(self):
+        totals = {}
+        for shard in self._all_shards():
+            for version, counts in list(shard.items()):
+                summed = totals.setdefault(version, [0, 0, 0, 0.0])
+                for i, value in enumerate(counts):
+                    summed[i] += value
+        
+        latency = self.latency_histograms()
+        summary = {}
+        for version, (requests, rows, positives, confidence_sum) in sorted(totals.items()):
+            counts, _ = latency[version].totals()
+            summary[version] = {
+                "requests": requests,
+                "rows": rows,
+                "positive_rate": round(positives / rows, 6) if rows else None,
+                "mean_confidence": round(confidence_sum / rows, 6) if rows else None,
+                "latency_s": {f"p{int(q * 100)}": LatencyHistogram.quantile(counts, q) for q in QUANTILES},
+            }
+        return summary
+
+class ShadowScorer:
+    """Scores served requests again with a shadow snapshot on a background thread, in batches"""
+    
+    def __init__(self, snapshot, max_rows=10000, flush_rows=256, flush_interval_s=0.05):
+        self.snapshot = snapshot
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        
+        # Entries are (served version, raw features, served predictions, served confidences)
+        self._entries = deque()
+        self._rows = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        
+        # Stats; the agreement counts are only updated by the scoring thread
+        self.submitted = 0
+        self.scored = 0
+        self.dropped = 0
+        self.errors = 0
+        self.batch_latency = LatencyHistogram()
+        # served version -> [rows, rows with the same prediction, sum of |confidence difference|]
+        self.agreement = {}
+    
+    def submit(self, served_version, features, predictions, confidences):
+        """
+        Queue a scored request for shadow scoring. `features` is the raw
+        (n_rows, n_features) matrix, which the caller won't modify, and the
+        predictions and confidences are what was served. Requests are
+        dropped (and counted) rather than queued past `max_rows`.
+        """
+        n_rows = len(features)
+        if n_rows == 0:
+            return
+        with self._lock:
+            self.submitted += n_rows
+            if self._rows + n_rows > self.max_rows:
+                self.dropped += n_rows
+                return
+            self._entries.append((served_version, features, predictions, confidences))
+            self._rows += n_rows
+            full = self._rows >= self.flush_rows
+        if full:
+            self._wakeup.set()
+    
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=5.0):
+        """Score whatever is still queued and stop the thread"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval_s)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠ Shadow scoring failed: {type(e).__name__}: {e}")
+    
+    def flush(self):
+        """Score the queued requests as one batch; returns the number of rows scored"""
+        with self._lock:
+            entries, self._entries = self._entries, deque()
+            self._rows = 0
+        if not entries:
+            return 0
+        
+        features = np.concatenate([entry[1] for entry in entries])
+        served_predictions = np.concatenate([np.asarray(entry[2]) for entry in entries])
+        served_confidences = np.concatenate([np.asarray(entry[3], dtype=np.float64) for entry in entries])
+        
+        started = time.perf_counter_ns()
+        predictions, confidences = self.snapshot.score(features)
+        self.batch_latency.observe_since(started)
+        
+        agree = predictions == served_predictions
+        difference = np.abs(confidences - served_confidences)
+        versions = [entry[0] for entry in entries]
+        row_versions = np.repeat(np.array(versions, dtype=object), [len(entry[2]) for entry in entries])
+        for version in set(versions):
+            rows = row_versions == version
+            counts = self.agreement.setdefault(version, [0, 0, 0.0])
+            counts[0] += int(rows.sum())
+            counts[1] += int(agree[rows].sum())
+            counts[2] += float(difference[rows].sum())
+        self.scored += len(features)
+        return len(features)
+    
+    def stats(self):
+        counts, sum_ns = self.batch_latency.totals()
+        return {
+            "version": self.snapshot.version,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "submitted": self.submitted,
+            "scored": self.scored,
+            "queued": self._rows,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "batches": sum(counts),
+            "batch_latency_s": {f"p{int(q * 100)}": LatencyHistogram.quantile(counts, q) for q in QUANTILES},
+            "latency_per_row_s": sum_ns / 1e9 / self.scored if self.scored else None,
+            "agreement": {
+                version: {
+                    "rows": rows,
+                    "agreement_rate": round(agreed / rows, 6),
+                    "mean_confidence_difference": round(difference / rows, 6),
+                }
+                for version, (rows, agreed, difference) in sorted(self.agreement.items())
+            },
+        }
@@ -0,0 +1,197 @@
+"""
+Low-overhead latency histograms and error counters for the request path.
+Every thread records into its own shard (a plain list or dict), so the hot
+path takes no lock; shards are only summed when /metrics is scraped.
+Latencies land in power-of-two nanosecond buckets picked with
+int.bit_length(), which keeps an observation to a few hundred nanoseconds.
+"""
+
+import threading
+import time
+
+# Bucket i holds durations with bit_length i, i.e. [2**(i-1), 2**i) ns.
+# 64 buckets cover every int64 duration, so no clamping is needed.
+N_BUCKETS = 64
+
+# Buckets exported to Prometheus: ~1us up to ~17s
+EXPORTED_BUCKETS = range(10, 35)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Labels added to every exported series. Each pre-forked worker (api/prefork.py)
+# sets worker="<pid>": its counters only cover the requests it served, so
+# series from different workers must be summed, not compared
+CONSTANT_LABELS = {}
+
+class _PerThreadShards:
+    """
+    One shard per thread, created on first use; the lock is only taken then.
+    Subclasses read `self._local.shard` inline on the hot path (one
+    attribute lookup instead of a method call).
+    """
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+    
+    def _make_shard(self):
+        raise NotImplementedError
+    
+    def _new_shard(self):
+        shard = self._make_shard()
+        with self._shards_lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+    
+    def _all_shards(self):
+        with self._shards_lock:
+            return list(self._shards)
+
+class LatencyHistogram(_PerThreadShards):
+    """Power-of-two latency histogram with per-thread shards"""
+    
+    def _make_shard(self):
+        # N_BUCKETS counts followed by the running sum in ns
+        return [0] * (N_BUCKETS + 1)
+    
+    def observe_ns(self, elapsed_ns):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[elapsed_ns.bit_length()] += 1
+        shard[N_BUCKETS] += elapsed_ns
+    
+    def observe_since(self, start_ns):
+        """Record the time since start_ns and return now, so stages can be chained"""
+        now = time.perf_counter_ns()
+        elapsed_ns = now - start_ns
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[elapsed_ns.bit_length()] += 1
+        shard[N_BUCKETS] += elapsed_ns
+        return now
+    
+    def totals(self):
+        """(bucket counts, sum in ns) summed over all threads"""
+        counts = [0] * (N_BUCKETS + 1)
+        for shard in self._all_shards():
+            for i, value in enumerate(shard):
+                counts[i] += value
+        return counts[:N_BUCKETS], counts[N_BUCKETS]
+    
+    @staticmethod
+    def quantile(counts, q):
+        """Estimate a quantile in seconds, interpolating linearly inside its bucket"""
+        total = sum(counts)
+        if total == 0:
+            return None
+        
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                low = 0 if i == 0 else 1 << (i - 1)
+                high = 1 << i
+                return (low + (high - low) * (rank - seen) / count) / 1e9
+            seen += count
+        return (1 << (N_BUCKETS - 1)) / 1e9
+
+class ErrorCounter(_PerThreadShards):
+    """Error counts keyed by (endpoint, exception type), with per-thread shards"""
+    
+    def _make_shard(self):
+        return {}
+    
+    def inc(self, endpoint, error_type):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        key = (endpoint, error_type)
+        shard[key] = shard.get(key, 0) + 1
+    
+    def totals(self):
+        totals = {}
+        for shard in self._all_shards():
+            for key, count in list(shard.items()):
+                totals[key] = totals.get(key, 0) + count
+        return totals
+
+class RequestTimingMiddleware:
+    """
+    Plain ASGI middleware that stamps each HTTP request with its arrival time
+    (scope["received_ns"]), so handlers can time body parsing and validation.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope["received_ns"] = time.perf_counter_ns()
+        await self.app(scope, receive, send)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels):
+    labels = {**CONSTANT_LABELS, **labels}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def render_histograms(name, help_text, histograms, label_names):
+    """
+    Prometheus text lines for a family of histograms plus their quantile estimates.
+    `histograms` maps a tuple of label values (in label_names order) to a LatencyHistogram.
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    quantile_lines = [
+        f"# HELP {name}_quantile Estimated quantiles of {name} (from the histogram buckets)",
+        f"# TYPE {name}_quantile gauge",
+    ]
+    
+    for label_values, histogram in histograms.items():
+        series = dict(zip(label_names, label_values))
+        counts, sum_ns = histogram.totals()
+        cumulative = sum(counts[:EXPORTED_BUCKETS[0]])
+        for i in EXPORTED_BUCKETS:
+            cumulative += counts[i]
+            le = f"{(1 << i) / 1e9:.9g}"
+            lines.append(f"{name}_bucket{_labels(**series, le=le)} {cumulative}")
+        total = sum(counts)
+        lines.append(f"{name}_bucket{_labels(**series, le='+Inf')} {total}")
+        lines.append(f"{name}_sum{_labels(**series)} {sum_ns / 1e9:.9g}")
+        lines.append(f"{name}_count{_labels(**series)} {total}")
+        
+        for q in QUANTILES:
+            value = LatencyHistogram.quantile(counts, q)
+            if value is not None:
+                labels = _labels(**series, quantile=q)
+                quantile_lines.append(f"{name}_quantile{labels} {value:.9g}")
+    
+    return lines + quantile_lines
+
+def render_errors(name, counter):
+    lines = [f"# HELP {name} Errors by endpoint and exception type", f"# TYPE {name} counter"]
+    for (endpoint, error_type), count in sorted(counter.totals().items()):
+        lines.append(f"{name}{_labels(endpoint=endpoint, type=error_type)} {count}")
+    return lines
+
+def render_counters(name, help_text, counts, label_name):
+    """Prometheus text lines for a counter family, one series per key of `counts`"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for value, count in sorted(counts.items()):
+        lines.append(f"{name}{_labels(**{label_name: value})} {count}")
+    return lines
+
+def render_gauge(name, help_text, value, **labels):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    if value is not None:
+        lines.append(f"{name}{_labels(**labels)} {value}")
+    return lines
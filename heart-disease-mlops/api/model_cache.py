@@ -0,0 +1,99 @@
+"""
+Local cache of the last resolved model, for fast cold starts.
+After a model is resolved from the registry, a run or models/, a copy of it
+is written next to a small JSON manifest (source, URI, version, sha256).
+The next start loads that copy directly, without importing mlflow or
+walking the registry -> runs -> local fallback chain.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_FILENAME = "resolved_model.json"
+
+# Cached artifact file names, by model kind
+ARTIFACT_FILENAMES = {
+    "sklearn": "model.pkl",
+    "folded": "model_folded.npz",
+    "compact": "model.forest",
+}
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ResolvedModelCache:
+    """
+    A manifest plus one cached artifact under `cache_dir`.
+    An entry is only used if the artifact's sha256 matches the manifest,
+    so a partial write or a swapped file falls back to normal resolution.
+    """
+    
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def load(self, kind):
+        """
+        Load the cached model of the given kind ("sklearn", "folded" or "compact").
+        Returns (model, manifest), or None on a miss or a hash mismatch.
+        """
+        manifest = self.read_manifest()
+        if manifest is None or manifest.get("kind") != kind:
+            return None
+        
+        path = os.path.join(self.cache_dir, ARTIFACT_FILENAMES[kind])
+        if not os.path.exists(path) or file_sha256(path) != manifest.get("sha256"):
+            print("⚠ Cached model does not match its manifest, resolving again")
+            return None
+        
+        if kind in ("folded", "compact"):
+            from src.forest_compiler import CompiledForest
+            model = CompiledForest.load(path)
+        else:
+            import joblib
+            model = joblib.load(path)
+        return model, manifest
+    
+    def store(self, model, kind, version, source, registry_version=None):
+        """Write the model and its manifest; the manifest is replaced atomically last"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, ARTIFACT_FILENAMES[kind])
+        
+        tmp_path = f"{path}.tmp"
+        if kind == "compact":
+            model.save_binary(tmp_path)
+        elif kind == "folded":
+            # np.savez appends .npz to names without it
+            tmp_path = f"{path[:-len('.npz')]}.tmp.npz"
+            model.save(tmp_path)
+        else:
+            import joblib
+            joblib.dump(model, tmp_path)
+        os.replace(tmp_path, path)
+        
+        manifest = {
+            "kind": kind,
+            "version": version,
+            "source": source,
+            "registry_version": registry_version,
+            "sha256": file_sha256(path),
+            "resolved_at": time.time(),
+        }
+        tmp_manifest = f"{self.manifest_path}.tmp"
+        with open(tmp_manifest, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest, self.manifest_path)
+        return manifest
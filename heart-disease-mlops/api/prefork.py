@@ -0,0 +1,338 @@
+"""
+Pre-fork serving: load the model once, then fork workers that share it.
+The supervisor process resolves and warms the model the same way the API's
+startup does, freezes the garbage collector (so collections in the workers
+don't write to the inherited objects and un-share their pages), binds the
+listening socket and forks N uvicorn workers that inherit both. Model
+memory and load time are paid once per node rather than once per worker;
+with MODEL_ENGINE=compact the node arrays are file-backed pages as well.
+
+The supervisor restarts workers that die and owns reloads. SIGHUP, a call to
+/admin/reload or /admin/rollback on any worker, or a new registry version
+(polled every MODEL_RELOAD_INTERVAL_S) makes it load the model and fork a new
+generation of workers from it; the old generation finishes its in-flight
+requests and exits. If the load fails, the current workers keep serving.
+
+Only the model is shared. Request metrics, /drift, /experiment and the
+admission and batcher stats are kept per worker, and each request (or
+scrape) reaches whichever worker accepts it. /metrics labels every series
+with worker="<pid>" and the JSON endpoints report the worker they came
+from, so sum across workers (e.g. sum without (worker) in Prometheus) and
+read drift and experiment numbers as a sample of the traffic.
+
+Usage (from the heart-disease-mlops directory, Linux/macOS):
+    python -m api.prefork --workers 4 --port 8000
+"""
+
+import argparse
+import fcntl
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+import uvicorn
+
+import api.app as app_module
+from api.metrics import CONSTANT_LABELS
+from api.reloader import RegistryWatcher
+
+# Worker processes (the usual uvicorn/gunicorn variable); defaults to one per core
+WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+
+# Seconds a retired or stopping worker gets to finish its requests before SIGKILL
+GRACEFUL_TIMEOUT_S = float(os.getenv("GRACEFUL_TIMEOUT_S", "30"))
+
+# A worker that dies within this many seconds of starting is replaced after a pause
+MIN_WORKER_UPTIME_S = 1.0
+RESTART_BACKOFF_S = 1.0
+
+def memory_usage(pid="self"):
+    """Resident memory of a process split into shared and private MB (Linux only; {} elsewhere)"""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {}
+    
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "shared_mb": round((fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)) / 1024, 1),
+        "private_mb": round((fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024, 1),
+    }
+
+class WorkerHandle:
+    """A worker's view of its supervisor (installed as api.app.PREFORK_WORKER)"""
+    
+    def __init__(self, generation, control_fd, supervisor_pid):
+        self.generation = generation
+        self.control_fd = control_fd
+        self.supervisor_pid = supervisor_pid
+    
+    def request(self, command, argument=""):
+        """Ask the supervisor to run "reload <version>" or "rollback" for every worker"""
+        # One short write to a pipe is atomic, so concurrent requests don't interleave
+        os.write(self.control_fd, f"{command} {argument}\n".encode())
+    
+    def info(self):
+        return {
+            "pid": os.getpid(),
+            "supervisor_pid": self.supervisor_pid,
+            "generation": self.generation,
+            **memory_usage(),
+        }
+    
+    def watch_supervisor(self, interval_s=1.0):
+        """Shut the worker down if the supervisor goes away (the worker would be re-parented)"""
+        def watch():
+            while os.getppid() == self.supervisor_pid:
+                time.sleep(interval_s)
+            os.kill(os.getpid(), signal.SIGTERM)
+        threading.Thread(target=watch, name="supervisor-watch", daemon=True).start()
+
+class Supervisor:
+    """Loads the model, forks and supervises the workers, and replaces them on reload"""
+    
+    def __init__(self, host="0.0.0.0", port=8000, workers=WORKERS, backlog=2048, log_level="info"):
+        self.host = host
+        self.port = port
+        self.n_workers = max(1, workers)
+        self.backlog = backlog
+        self.log_level = log_level
+        
+        self.generation = 0
+        # pid -> (generation, monotonic start time) of every live worker
+        self.workers = {}
+        # pid -> monotonic deadline of workers told to finish and exit
+        self.retiring = {}
+        self.sock = None
+        self.watcher = None
+        self._stopping = False
+        self._control_r, self._control_w = os.pipe()
+        flags = fcntl.fcntl(self._control_w, fcntl.F_GETFL)
+        fcntl.fcntl(self._control_w, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+    
+    def bind(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(self.backlog)
+        self.sock.set_inheritable(True)
+        self.port = self.sock.getsockname()[1]
+    
+    # Workers
+    
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.workers[pid] = (self.generation, time.monotonic())
+    
+    def _run_worker(self):
+        """Body of a forked worker: serve on the inherited socket, then exit without returning"""
+        code = 1
+        try:
+            os.close(self._control_r)
+            for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            # SIGHUP is for the supervisor (reload); a terminal hangup shouldn't kill the workers first
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            
+            handle = WorkerHandle(self.generation, self._control_w, os.getppid())
+            app_module.PREFORK_WORKER = handle
+            CONSTANT_LABELS["worker"] = str(os.getpid())
+            handle.watch_supervisor()
+            config = uvicorn.Config(app_module.app, log_level=self.log_level)
+            uvicorn.Server(config).run(sockets=[self.sock])
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    
+    def _start_generation(self):
+        """Fork a new generation of workers from the current model and retire the previous one"""
+        # Unfreeze first so models replaced by a reload can be collected, then freeze what's left
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+        
+        previous = list(self.workers)
+        self.generation += 1
+        for _ in range(self.n_workers):
+            self._spawn()
+        for pid in previous:
+            self._retire(pid)
+        
+        snapshot = app_module.SNAPSHOT
+        print(f"✓ Generation {self.generation}: {self.n_workers} workers serving "
+              f"{snapshot.version if snapshot is not None else 'no model'} on port {self.port}")
+    
+    def _retire(self, pid):
+        if pid in self.retiring:
+            return
+        self.retiring[pid] = time.monotonic() + GRACEFUL_TIMEOUT_S
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    
+    def _reap(self):
+        """Collect exited workers, replace crashed ones and kill retirees past their deadline"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            
+            generation, started = self.workers.pop(pid, (None, None))
+            self.retiring.pop(pid, None)
+            if generation == self.generation and not self._stopping:
+                print(f"⚠ Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, starting a replacement")
+                if time.monotonic() - started < MIN_WORKER_UPTIME_S:
+                    time.sleep(RESTART_BACKOFF_S)
+                self._spawn()
+        
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+    
+    def current_workers(self):
+        return [pid for pid, (generation, _) in self.workers.items() if generation == self.generation]
+    
+    # Reloads
+    
+    def reload(self, version="latest"):
+        """Load a model version once, here, and move every worker onto it; None if loading failed"""
+        snapshot = app_module.reload_model(version)
+        if snapshot is None:
+            print(f"✗ Could not load model version '{version}'; generation {self.generation} keeps serving")
+            return None
+        self._start_generation()
+        return snapshot
+    
+    def rollback(self):
+        snapshot = app_module.rollback_model()
+        if snapshot is None:
+            print("⚠ No previous model to roll back to")
+            return None
+        self._start_generation()
+        return snapshot
+    
+    def _handle(self, line):
+        command, _, argument = line.strip().partition(" ")
+        if command == "reload":
+            self.reload(argument or "latest")
+        elif command == "rollback":
+            self.rollback()
+        elif command == "stop":
+            self._stopping = True
+        elif command:
+            print(f"⚠ Unknown supervisor command: {line!r}")
+    
+    def _on_signal(self, signum, frame):
+        # Handled by the main loop, like the workers' requests
+        command = {signal.SIGHUP: "reload latest", signal.SIGCHLD: ""}.get(signum, "stop")
+        try:
+            os.write(self._control_w, f"{command}\n".encode())
+        except BlockingIOError:
+            pass
+    
+    def _poll_registry(self, force=False):
+        watcher = self.watcher
+        if watcher is None:
+            return
+        if not force and watcher.last_poll is not None and time.time() - watcher.last_poll < watcher.interval_s:
+            return
+        try:
+            watcher.poll_once()
+        except Exception as e:
+            # Keep serving the current generation; try again next interval
+            watcher.errors += 1
+            watcher.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠ Registry watcher: reload failed: {watcher.last_error}")
+    
+    # Main loop
+    
+    def serve(self):
+        print("\n" + "="*60)
+        print(f"Starting Heart Disease Prediction API (pre-fork, {self.n_workers} workers)")
+        print("="*60)
+        
+        self.bind()
+        from_cache = app_module.load_startup_snapshot()
+        
+        # Polled from the main loop rather than a thread, so the supervisor is single-threaded when it forks
+        if app_module.MODEL_RELOAD_INTERVAL_S > 0 or from_cache:
+            self.watcher = RegistryWatcher(
+                lambda: app_module._latest_registry_version(app_module._watched_model_name()),
+                app_module._served_registry_version,
+                self.reload,
+                interval_s=app_module.MODEL_RELOAD_INTERVAL_S or float("inf"),
+            )
+        
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+        
+        self._start_generation()
+        if from_cache:
+            # Catch up with the registry once after a start from the cache
+            self._poll_registry(force=True)
+        
+        pending = b""
+        while not self._stopping:
+            readable, _, _ = select.select([self._control_r], [], [], 1.0)
+            if readable:
+                pending += os.read(self._control_r, 4096)
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    self._handle(line.decode())
+            self._reap()
+            if not self._stopping and app_module.MODEL_RELOAD_INTERVAL_S > 0:
+                self._poll_registry()
+        
+        self.shutdown()
+    
+    def shutdown(self):
+        """Let every worker finish its requests (SIGKILL after GRACEFUL_TIMEOUT_S), then close the socket"""
+        self._stopping = True
+        print(f"Stopping {len(self.workers)} workers...")
+        for pid in list(self.workers):
+            self._retire(pid)
+        while self.workers:
+            self._reap()
+            time.sleep(0.05)
+        if self.sock is not None:
+            self.sock.close()
+        print("✓ All workers stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from pre-forked workers sharing one loaded model")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Worker processes (default: WEB_CONCURRENCY or CPU count)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    
+    Supervisor(args.host, args.port, args.workers, log_level=args.log_level).serve()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Background watcher for zero-downtime model reloads.
+Polls the MLflow Model Registry with a cheap "latest version" check and,
+when a new version appears, has it loaded and warmed off the request path
+before it is swapped in.
+"""
+
+import threading
+import time
+
+class RegistryWatcher:
+    """
+    Calls `latest_version_fn()` every `interval_s` seconds and, when it is
+    newer than every version served so far, calls `reload_fn(version)`,
+    which returns None if the version could not be loaded. Only a strictly
+    newer version triggers a reload, so a manual rollback to an older
+    version sticks until the next version is registered.
+    All three callables are provided by the API; the watcher only owns
+    the polling thread and its stats.
+    """
+    
+    def __init__(self, latest_version_fn, current_version_fn, reload_fn, interval_s=30.0):
+        self.latest_version_fn = latest_version_fn
+        self.current_version_fn = current_version_fn
+        self.reload_fn = reload_fn
+        self.interval_s = interval_s
+        
+        self._stop = threading.Event()
+        self._thread = None
+        
+        # Stats
+        self.polls = 0
+        self.reloads = 0
+        self.failed_reloads = 0
+        # Highest registry version served or loaded while watching
+        self.highest_version = None
+        self.errors = 0
+        self.last_poll = None
+        self.last_error = None
+    
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="registry-watcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def poll_once(self):
+        """Check the registry once; reload if a newer version is registered"""
+        self.polls += 1
+        self.last_poll = time.time()
+        
+        current = self.current_version_fn()
+        if current is not None and (self.highest_version is None or current > self.highest_version):
+            self.highest_version = current
+        
+        latest = self.latest_version_fn()
+        if latest is None or (self.highest_version is not None and latest <= self.highest_version):
+            return False
+        
+        print(f"Registry watcher: new model version {latest} found, reloading...")
+        if self.reload_fn(latest) is None:
+            self.failed_reloads += 1
+            return False
+        self.highest_version = latest
+        self.reloads += 1
+        return True
+    
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.poll_once()
+            except Exception as e:
+                # Keep serving the current model; try again next interval
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠ Registry watcher: reload failed: {self.last_error}")
+    
+    def stats(self):
+        return {
+            "interval_s": self.interval_s,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "polls": self.polls,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "highest_version": self.highest_version,
+            "errors": self.errors,
+            "last_poll": self.last_poll,
+            "last_error": self.last_error,
+        }
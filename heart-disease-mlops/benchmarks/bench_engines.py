@@ -0,0 +1,81 @@
+"""
+Benchmark: sklearn vs compiled forest engine.
+Scores scaled feature matrices of several batch sizes with both engines and
+reports p50 latency per call and throughput in rows/s, then compares the
+model file formats (sklearn pickle, .npz, compact binary) by size and load time.
+
+Run from the heart-disease-mlops directory:
+    python benchmarks/bench_engines.py [--repeats 50]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from bench_single_row import load_or_fit_model
+from api import app as api_app
+from src.forest_compiler import CompiledForest, compile_forest, verify_compiled
+
+BATCH_SIZES = [1, 16, 256, 4096]
+
+def time_engine(predict_proba, X, repeats):
+    predict_proba(X)
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        predict_proba(X)
+        timings[i] = time.perf_counter() - start
+    return timings
+
+def compare_formats(model, compiled, repeats):
+    """Size and p50 load time of each model file format"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {
+            "pickle": os.path.join(tmp, "model.pkl"),
+            "npz": os.path.join(tmp, "model.npz"),
+            "compact": os.path.join(tmp, "model.forest"),
+        }
+        joblib.dump(model, paths["pickle"])
+        compiled.save(paths["npz"])
+        compiled.save_binary(paths["compact"])
+        loaders = {
+            "pickle": joblib.load,
+            "npz": CompiledForest.load,
+            "compact": CompiledForest.load_binary,
+        }
+        
+        print(f"\n{'format':>8}{'size (KB)':>12}{'load p50 (ms)':>16}")
+        for name, path in paths.items():
+            p50 = np.percentile(time_engine(lambda _: loaders[name](path), None, repeats), 50)
+            print(f"{name:>8}{os.path.getsize(path) / 1024:>12.1f}{p50 * 1e3:>16.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    
+    load_or_fit_model()
+    model = api_app.SNAPSHOT.model
+    compiled = compile_forest(model)
+    if not verify_compiled(model, compiled):
+        raise SystemExit("Compiled forest disagrees with sklearn")
+    print(f"Compiled {compiled.n_trees} trees, {compiled.n_nodes} nodes, depth {compiled.max_depth}")
+    
+    rng = np.random.RandomState(0)
+    engines = (("sklearn", model.predict_proba), ("compiled", compiled.predict_proba))
+    
+    print(f"\n{'rows':>6}{'engine':>10}{'p50 (ms)':>12}{'rows/s':>14}")
+    for n_rows in BATCH_SIZES:
+        X = rng.normal(size=(n_rows, compiled.n_features_in_))
+        for name, predict_proba in engines:
+            p50 = np.percentile(time_engine(predict_proba, X, args.repeats), 50)
+            print(f"{n_rows:>6}{name:>10}{p50 * 1e3:>12.3f}{n_rows / p50:>14,.0f}")
+    
+    compare_formats(model, compiled, args.repeats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Microbenchmark: single-row /predict inference paths.
+Compares the original DataFrame-based path against the NumPy fast path
+used by api/app.py, reporting p50/p99 latency per call.
+
+Run from the heart-disease-mlops directory:
+    python benchmarks/bench_single_row.py [--iterations 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import app as api_app
+
+SAMPLE_PATIENT = {
+    "age": 63, "sex": 1, "cp": 3, "trestbps": 145, "chol": 233, "fbs": 1,
+    "restecg": 0, "thalach": 150, "exang": 0, "oldpeak": 2.3, "slope": 0,
+    "ca": 0, "thal": 1,
+}
+
+def load_or_fit_model():
+    """Serve the model the API would load, or fit a stand-in of the same shape"""
+    snapshot = api_app.load_current_model()
+    if snapshot is not None:
+        api_app.install_snapshot(snapshot)
+        return
+    
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    
+    print("Fitting a stand-in RandomForest(n_estimators=100, max_depth=5)")
+    rng = np.random.RandomState(42)
+    X = pd.DataFrame(rng.rand(300, len(api_app.FEATURE_NAMES)), columns=api_app.FEATURE_NAMES)
+    y = rng.randint(0, 2, 300)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42)
+    model.fit(pd.DataFrame(scaler.transform(X), columns=api_app.FEATURE_NAMES), y)
+    api_app.install_model(model, scaler, version="stand-in")
+
+def legacy_path(data):
+    """The original predict() body: DataFrame build, pandas scaling, two forest calls"""
+    snapshot = api_app.SNAPSHOT
+    input_data = pd.DataFrame([data.model_dump()])
+    if snapshot.scaler is not None:
+        feature_cols = [col for col in input_data.columns]
+        input_data[feature_cols] = snapshot.scaler.transform(input_data[feature_cols])
+    prediction = snapshot.model.predict(input_data)[0]
+    confidence = float(max(snapshot.model.predict_proba(input_data)[0]))
+    return int(prediction), confidence
+
+def fast_path(data):
+    """The NumPy path: preallocated row, in-place scaling, one predict_proba"""
+    predictions, confidences = api_app.SNAPSHOT.score(api_app._patient_row(data))
+    return int(predictions[0]), float(confidences[0])
+
+def time_calls(fn, data, iterations, warmup=50):
+    for _ in range(warmup):
+        fn(data)
+    
+    timings = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(data)
+        timings[i] = time.perf_counter() - start
+    return timings * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    
+    load_or_fit_model()
+    data = api_app.PatientData(**SAMPLE_PATIENT)
+    
+    if legacy_path(data) != fast_path(data):
+        raise SystemExit("Fast path disagrees with the legacy path")
+    
+    print(f"\n{'path':<10}{'p50 (us)':>12}{'p99 (us)':>12}{'mean (us)':>12}")
+    results = {}
+    for name, fn in (("legacy", legacy_path), ("fast", fast_path)):
+        timings = time_calls(fn, data, args.iterations)
+        results[name] = np.percentile(timings, 50)
+        print(f"{name:<10}{results[name]:>12.1f}{np.percentile(timings, 99):>12.1f}{timings.mean():>12.1f}")
+    
+    print(f"\nSpeedup (p50): {results['legacy'] / results['fast']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Load test: replay or synthesize request streams against the API.
+Runs the FastAPI app in-process (httpx ASGI transport, no network) or
+against a running server (--url), at a fixed concurrency and optionally a
+fixed arrival rate. Reports throughput and latency percentiles per endpoint
+and saves them as JSON that can be compared between commits.
+
+Run from the heart-disease-mlops directory:
+    python benchmarks/load_test.py --requests 2000 --concurrency 16 --output results.json
+    python benchmarks/load_test.py --url http://localhost:8000 --rate 200 --duration 30
+    python benchmarks/load_test.py --replay payloads.jsonl --output after.json --compare before.json
+    python benchmarks/load_test.py --replay /var/log/heart-api/audit --concurrency 16
+
+Replay files hold one JSON object per line: either a /predict payload
+(the 13 patient fields) or {"path": "/predict/batch", "body": {...}}.
+Prediction audit logs (api/audit.py) replay too, as a directory of rotated
+files or a single .jsonl/.arrow file (the current one included, while
+it is still being written): each logged prediction becomes one /predict
+request, in the order they were served.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PERCENTILES = (50, 90, 95, 99)
+
+# (low, high) ranges for synthetic patients; integer fields are drawn as ints
+PATIENT_RANGES = {
+    "age": (29, 78), "sex": (0, 2), "cp": (0, 4), "trestbps": (94, 201),
+    "chol": (126, 565), "fbs": (0, 2), "restecg": (0, 3), "thalach": (71, 203),
+    "exang": (0, 2), "oldpeak": (0.0, 6.2), "slope": (0, 3), "ca": (0, 5), "thal": (0, 4),
+}
+
+def synthetic_patient(rng):
+    patient = {}
+    for name, (low, high) in PATIENT_RANGES.items():
+        if isinstance(low, float):
+            patient[name] = round(float(rng.uniform(low, high)), 1)
+        else:
+            patient[name] = int(rng.randint(low, high))
+    return patient
+
+def synthesize_requests(n_requests, batch_fraction=0.0, batch_size=32, seed=0):
+    """A reproducible mix of /predict and /predict/batch requests"""
+    rng = np.random.RandomState(seed)
+    requests = []
+    for _ in range(n_requests):
+        if rng.rand() < batch_fraction:
+            patients = [synthetic_patient(rng) for _ in range(batch_size)]
+            requests.append(("/predict/batch", {"patients": patients}))
+        else:
+            requests.append(("/predict", synthetic_patient(rng)))
+    return requests
+
+def load_replay_file(path):
+    """Read (path, body) pairs from a JSONL file or audit log; bare payloads go to /predict"""
+    if os.path.isdir(path) or path.endswith(".arrow"):
+        from api.audit import read_audit_log
+        requests = [("/predict", record["inputs"]) for record in read_audit_log(path)]
+        if not requests:
+            raise SystemExit(f"✗ No requests found in {path}")
+        return requests
+    
+    requests = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "path" in record and "body" in record:
+                requests.append((record["path"], record["body"]))
+            elif "inputs" in record:
+                # A line of a JSONL audit log
+                requests.append(("/predict", record["inputs"]))
+            elif "patients" in record or "columns" in record:
+                requests.append(("/predict/batch", record))
+            else:
+                requests.append(("/predict", record))
+    if not requests:
+        raise SystemExit(f"✗ No requests found in {path}")
+    return requests
+
+def make_client(url, timeout):
+    """An httpx client for a live server, or one wired straight into the ASGI app"""
+    import httpx
+    
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+    
+    from api import app as api_app
+    from bench_single_row import load_or_fit_model
+    
+    load_or_fit_model()
+    transport = httpx.ASGITransport(app=api_app.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://in-process", timeout=timeout)
+
+async def run_load(client, requests, concurrency, rate=0.0, duration=None):
+    """
+    Send `requests` (cycled if a duration is given) with `concurrency` workers.
+    With a rate, request i is due at start + i / rate and its latency is
+    measured from that time, so a slow server can't hide its queueing delay.
+    Returns a list of (path, status, latency_s) and the wall time.
+    """
+    samples = []
+    next_index = 0
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+    
+    def take():
+        nonlocal next_index
+        i = next_index
+        if deadline is None and i >= len(requests):
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        next_index += 1
+        return i
+    
+    async def worker():
+        while True:
+            i = take()
+            if i is None:
+                return
+            path, body = requests[i % len(requests)]
+            
+            sent = time.perf_counter()
+            if rate:
+                due = started + i / rate
+                if due > sent:
+                    await asyncio.sleep(due - sent)
+                sent = due
+            
+            try:
+                response = await client.post(path, json=body)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            samples.append((path, status, time.perf_counter() - sent))
+    
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+def summarize(samples, wall_s):
+    """Throughput and latency percentiles (ms), overall and per endpoint"""
+    def stats(group):
+        latencies = np.array([latency for _, _, latency in group]) * 1e3
+        ok = sum(1 for _, status, _ in group if status == 200)
+        summary = {
+            "requests": len(group),
+            "ok": ok,
+            "errors": len(group) - ok,
+            "throughput_rps": len(group) / wall_s if wall_s else 0.0,
+        }
+        if len(latencies):
+            summary["latency_ms"] = {
+                **{f"p{p}": float(np.percentile(latencies, p)) for p in PERCENTILES},
+                "mean": float(latencies.mean()),
+                "max": float(latencies.max()),
+            }
+        return summary
+    
+    endpoints = sorted({path for path, _, _ in samples})
+    return {
+        "wall_s": wall_s,
+        "overall": stats(samples),
+        "endpoints": {path: stats([s for s in samples if s[0] == path]) for path in endpoints},
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+async def run_load_test(url=None, requests=None, concurrency=8, rate=0.0, duration=None,
+                        warmup=50, timeout=30.0):
+    """Warm up, run the load and return the JSON-ready results"""
+    async with make_client(url, timeout) as client:
+        if warmup:
+            await run_load(client, requests[:warmup], min(concurrency, warmup))
+        samples, wall_s = await run_load(client, requests, concurrency, rate, duration)
+    
+    return {
+        "config": {
+            "target": url or "in-process",
+            "concurrency": concurrency,
+            "rate_rps": rate or None,
+            "duration_s": duration,
+            "n_distinct_requests": len(requests),
+        },
+        "environment": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+        },
+        **summarize(samples, wall_s),
+    }
+
+def print_results(results):
+    print(f"\n{'endpoint':<18}{'requests':>10}{'errors':>8}{'req/s':>10}"
+          + "".join(f"{'p' + str(p) + ' (ms)':>12}" for p in PERCENTILES))
+    rows = [("overall", results["overall"])] + list(results["endpoints"].items())
+    for name, stats in rows:
+        latency = stats.get("latency_ms", {})
+        print(f"{name:<18}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>10.1f}"
+              + "".join(f"{latency.get(f'p{p}', float('nan')):>12.2f}" for p in PERCENTILES))
+
+def compare_results(baseline, current):
+    """Per-metric change from a baseline results file, as {name: (before, after, ratio)}"""
+    changes = {}
+    for name in ["overall"] + sorted(set(baseline["endpoints"]) & set(current["endpoints"])):
+        before = baseline["overall"] if name == "overall" else baseline["endpoints"][name]
+        after = current["overall"] if name == "overall" else current["endpoints"][name]
+        metrics = [("throughput_rps", before["throughput_rps"], after["throughput_rps"])]
+        for p in PERCENTILES:
+            key = f"p{p}"
+            if key in before.get("latency_ms", {}) and key in after.get("latency_ms", {}):
+                metrics.append((f"{key}_ms", before["latency_ms"][key], after["latency_ms"][key]))
+        for metric, old, new in metrics:
+            changes[f"{name} {metric}"] = (old, new, new / old if old else None)
+    return changes
+
+def print_comparison(changes, baseline_commit, current_commit):
+    print(f"\nCompared with {baseline_commit or 'baseline'} -> {current_commit or 'current'}")
+    print(f"{'metric':<36}{'before':>12}{'after':>12}{'change':>10}")
+    for name, (old, new, ratio) in changes.items():
+        change = f"{(ratio - 1) * 100:+.1f}%" if ratio is not None else "n/a"
+        print(f"{name:<36}{old:>12.2f}{new:>12.2f}{change:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Base URL of a running API; default runs the app in-process")
+    parser.add_argument("--replay", help="JSONL file of requests, or an audit log file or directory, to replay")
+    parser.add_argument("--requests", type=int, default=1000, help="Synthetic requests to generate")
+    parser.add_argument("--batch-fraction", type=float, default=0.0,
+                        help="Share of synthetic requests sent to /predict/batch")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="Arrival rate in req/s (0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds, cycling the requests")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+    
+    if args.replay:
+        requests = load_replay_file(args.replay)
+    else:
+        requests = synthesize_requests(args.requests, args.batch_fraction, args.batch_size, args.seed)
+    
+    results = asyncio.run(run_load_test(
+        url=args.url, requests=requests, concurrency=args.concurrency,
+        rate=args.rate, duration=args.duration, warmup=args.warmup,
+    ))
+    print_results(results)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results saved to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print_comparison(
+            compare_results(baseline, results),
+            baseline["environment"].get("commit"), results["environment"].get("commit")
+        )
+
+if __name__ == "__main__":
+    main()
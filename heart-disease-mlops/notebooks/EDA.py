@@ -23,6 +23,18 @@ def load_raw_data(path='data/heart.csv'):
         raise FileNotFoundError(f"Dataset not found at {path}")
     return pd.read_csv(path)
 
+def load_clean_data(path='data/heart_clean.arrow'):
+    """
+    Load the cleaned, unscaled Arrow file written by src/preprocess.py
+    (memory-mapped, int8/float32): missing values imputed, target binarized.
+    Returns None if it hasn't been written yet.
+    """
+    if not os.path.exists(path):
+        return None
+    import pyarrow as pa
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
 def eda_basic_info(df):
     """Display basic information about the dataset"""
     print("="*70)
@@ -163,17 +175,21 @@ def run_eda():
     print("EXPLORATORY DATA ANALYSIS (EDA)")
     print("="*70)
     
-    # Load data
+    # Load data: missing values and severity levels are described on the raw
+    # data, the disease/no-disease comparisons use the binarized clean data
     df = load_raw_data()
+    clean_df = load_clean_data()
+    if clean_df is None:
+        clean_df = df
     
     # Basic info
     eda_basic_info(df)
     
     # Visualizations
-    plot_class_balance(df)
+    plot_class_balance(clean_df)
     plot_feature_distributions(df)
     plot_correlation_heatmap(df)
-    plot_feature_by_target(df)
+    plot_feature_by_target(clean_df)
     
     print("\n" + "="*70)
     print("EDA COMPLETE - All plots saved to plots/ directory")
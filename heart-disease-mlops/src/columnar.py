@@ -0,0 +1,112 @@
+"""
+Columnar storage for the cleaned and processed datasets.
+Files are uncompressed Arrow IPC (Feather v2) with explicit dtypes:
+int8 for the categorical codes and the target, float32 for continuous and
+scaled features. Readers memory-map the file, so loading skips text
+parsing and dtype inference and the column buffers are shared with the
+page cache instead of being copied.
+"""
+
+import os
+
+import numpy as np
+import pyarrow as pa
+
+# Integer-coded columns stored as int8 (while their values fit)
+CATEGORICAL_COLUMNS = ['sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal', 'target']
+
+INT8_MIN, INT8_MAX = np.iinfo(np.int8).min, np.iinfo(np.int8).max
+
+# Schema metadata flag on files whose features are already scaled (preprocess output)
+SCALED_METADATA_KEY = b"heart.scaled"
+
+def fits_int8(values):
+    """True when every value is a whole number in the int8 range (no missing values)"""
+    values = np.asarray(values, dtype=np.float64)
+    return bool(np.isfinite(values).all()
+                and (values == np.round(values)).all()
+                and (values >= INT8_MIN).all() and (values <= INT8_MAX).all())
+
+def column_type(name, values, float_columns=()):
+    """int8 for categorical codes that fit, float32 for other numbers, string otherwise"""
+    if not np.issubdtype(np.asarray(values).dtype, np.number):
+        return pa.string()
+    if name in CATEGORICAL_COLUMNS and name not in float_columns and fits_int8(values):
+        return pa.int8()
+    return pa.float32()
+
+def schema_for(df, float_columns=()):
+    """
+    The storage schema for a DataFrame. Columns in float_columns
+    (e.g. scaled features) are float32 even when they are categorical.
+    """
+    return pa.schema([(name, column_type(name, df[name].to_numpy(), float_columns)) for name in df.columns])
+
+def mark_scaled(schema):
+    """The schema with the flag that its features are already scaled"""
+    return schema.with_metadata({**(schema.metadata or {}), SCALED_METADATA_KEY: b"true"})
+
+def is_scaled(path):
+    """True for a file written with a mark_scaled schema (e.g. data/heart_processed.arrow)"""
+    metadata = pa.ipc.open_file(pa.memory_map(path, 'r')).schema.metadata or {}
+    return metadata.get(SCALED_METADATA_KEY) == b"true"
+
+def to_table(df, schema):
+    arrays = []
+    for field in schema:
+        if pa.types.is_string(field.type):
+            arrays.append(pa.array(df[field.name], type=field.type, from_pandas=True))
+        else:
+            arrays.append(pa.array(df[field.name].to_numpy(dtype=field.type.to_pandas_dtype()), type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+class ColumnarWriter:
+    """Appends DataFrame chunks to an Arrow IPC file with a fixed schema"""
+    
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._sink = pa.OSFile(path, 'wb')
+        self._writer = pa.ipc.new_file(self._sink, schema)
+    
+    def write(self, df):
+        self._writer.write_table(to_table(df, self.schema))
+    
+    def close(self):
+        self._writer.close()
+        self._sink.close()
+
+def write_columnar(df, path, float_columns=(), scaled=False):
+    """Write a DataFrame to `path` and return the schema used (flagged with scaled=True)"""
+    schema = schema_for(df, float_columns)
+    if scaled:
+        schema = mark_scaled(schema)
+    writer = ColumnarWriter(path, schema)
+    try:
+        writer.write(df)
+    finally:
+        writer.close()
+    return schema
+
+def read_table(path, columns=None):
+    """Memory-map an Arrow IPC file as a pyarrow Table (no copy of the column data)"""
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns is not None else table
+
+def read_columnar(path, columns=None):
+    """Load an Arrow IPC file as a DataFrame, keeping the stored dtypes"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Columnar data not found at {path}")
+    # split_blocks keeps one block per column, so pandas doesn't consolidate (copy) them
+    return read_table(path, columns).to_pandas(split_blocks=True)
+
+def iter_batches(path, chunk_size, columns=None):
+    """Yield DataFrames of at most chunk_size rows, sliced zero-copy from the mapped file"""
+    table = read_table(path, columns)
+    for batch in table.to_batches(max_chunksize=chunk_size):
+        yield batch.to_pandas()
+
+def column_names(path):
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).schema.names
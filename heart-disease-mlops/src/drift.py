@@ -0,0 +1,119 @@
+"""
+Reference feature distributions for drift monitoring, and the scores
+that compare live traffic against them.
+When the scaler is fit, each feature's training distribution is summarized
+as its percentiles (a 101-point quantile sketch) and a histogram over the
+distinct percentiles. Binary and low-cardinality features get one bin per
+value, continuous ones about one bin per percentile, plus a bin below the
+training minimum and one above the maximum. The API counts live requests
+into the same bins (see api/drift_monitor.py), so PSI and KS come from
+two histograms and no raw request is ever stored.
+"""
+
+import json
+import os
+
+import numpy as np
+
+REFERENCE_PATH = "models/drift_reference.json"
+REFERENCE_ARTIFACT_PATH = "drift"
+
+# Percentiles kept per feature (0, 1, ..., 100)
+N_QUANTILES = 101
+
+# PSI is computed over about this many bins of equal reference mass
+PSI_BINS = 10
+
+# Added to empty bins so PSI stays finite
+PSI_EPSILON = 1e-4
+
+# Conventional PSI thresholds: below WARN is stable, above ALERT has drifted
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+
+# Family-wise significance of the KS warnings (split across the features monitored)
+KS_ALPHA = 0.05
+
+def feature_reference(values, counts=None):
+    """Quantile sketch and histogram of one feature, from its values (with optional counts per value)"""
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.ones(len(values), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+    keep = ~np.isnan(values)
+    values, counts = values[keep], counts[keep]
+    if len(values) == 0:
+        raise ValueError("A reference needs at least one non-missing value")
+    order = np.argsort(values, kind="stable")
+    values, counts = values[order], counts[order]
+    
+    # Weighted percentiles (lower value at each rank)
+    cumulative = np.cumsum(counts)
+    n = int(cumulative[-1])
+    ranks = np.linspace(0, n - 1, N_QUANTILES)
+    quantiles = values[np.searchsorted(cumulative, ranks, side="right")]
+    
+    # Bin i holds edges[i-1] <= x < edges[i]; an extra edge just above the
+    # maximum gives the maximum (or the last category) a bin of its own
+    edges = np.unique(quantiles)
+    edges = np.append(edges, np.nextafter(edges[-1], np.inf))
+    bins = np.searchsorted(edges, values, side="right")
+    histogram = np.bincount(bins, weights=counts, minlength=len(edges) + 1).astype(np.int64)
+    
+    return {
+        "n": n,
+        "quantiles": quantiles.tolist(),
+        "edges": edges.tolist(),
+        "counts": histogram.tolist(),
+    }
+
+def reference_profile(df, columns=None):
+    """Reference for every column of a DataFrame (missing values ignored)"""
+    columns = list(df.columns) if columns is None else list(columns)
+    return {"features": {name: feature_reference(df[name].to_numpy(dtype=np.float64)) for name in columns}}
+
+def save_reference(reference, path=REFERENCE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(reference, f)
+    return path
+
+def load_reference(path=REFERENCE_PATH):
+    """The saved reference, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def psi_groups(counts, n_groups=PSI_BINS):
+    """
+    Map histogram bins to PSI bins of roughly equal reference mass. The
+    tails (outside the training range) keep bins of their own.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    interior = counts[1:-1]
+    before = np.cumsum(interior) - interior
+    groups = np.minimum((before / max(interior.sum(), 1) * n_groups).astype(np.int64), n_groups - 1) + 1
+    groups = np.concatenate([[0], groups, [n_groups + 1]])
+    # Renumber consecutively (categorical features may use fewer groups)
+    return np.unique(groups, return_inverse=True)[1]
+
+def psi(reference_counts, live_counts, groups=None):
+    """Population stability index of live counts against reference counts over the same bins"""
+    reference_counts = np.asarray(reference_counts, dtype=np.float64)
+    live_counts = np.asarray(live_counts, dtype=np.float64)
+    if groups is not None:
+        reference_counts = np.bincount(groups, weights=reference_counts)
+        live_counts = np.bincount(groups, weights=live_counts)
+    expected = np.maximum(reference_counts / reference_counts.sum(), PSI_EPSILON)
+    actual = np.maximum(live_counts / live_counts.sum(), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def ks_statistic(reference_counts, live_counts):
+    """Largest gap between the two empirical CDFs, evaluated at the bin edges"""
+    reference_cdf = np.cumsum(reference_counts) / np.sum(reference_counts)
+    live_cdf = np.cumsum(live_counts) / np.sum(live_counts)
+    return float(np.abs(reference_cdf - live_cdf).max())
+
+def ks_critical_value(n_reference, n_live, alpha=0.05):
+    """Two-sample KS statistic above which the distributions differ at level alpha"""
+    c = np.sqrt(-0.5 * np.log(alpha / 2))
+    return float(c * np.sqrt((n_reference + n_live) / (n_reference * n_live)))
@@ -0,0 +1,202 @@
+"""
+Export a "scaler-folded" model artifact.
+Trees only compare features against thresholds, so the StandardScaler can be
+pushed into the split thresholds once. The folded forest takes raw patient
+features directly and gives exactly the same predictions as scaler + model.
+
+Also exports the "compact" artifact: the compiled forest (scaled features
+in, float32 thresholds) in the memory-mappable binary format of
+forest_compiler.py, which loads without unpickling sklearn.
+"""
+
+import os
+import sys
+import warnings
+
+import numpy as np
+import joblib
+import mlflow
+import mlflow.pyfunc
+import mlflow.sklearn
+
+from forest_compiler import CompiledForest, compile_forest, verify_compiled
+
+FOLDED_ARTIFACT_PATH = "scaler_folded_model"
+FOLDED_FILENAME = "model_folded.npz"
+COMPACT_ARTIFACT_PATH = "compact_model"
+COMPACT_FILENAME = "model.forest"
+
+# Maps float64 bit patterns to int64 keys with the same ordering (and back)
+_SIGN_MASK = np.int64(0x7FFFFFFFFFFFFFFF)
+
+def _float_to_key(values):
+    bits = np.asarray(values, dtype=np.float64).view(np.int64)
+    return bits ^ ((bits >> 63) & _SIGN_MASK)
+
+def _key_to_float(keys):
+    return (keys ^ ((keys >> 63) & _SIGN_MASK)).view(np.float64)
+
+def _scaled(raw, mean, scale):
+    """The value a tree sees for a raw input: StandardScaler arithmetic, then sklearn's float32 cast"""
+    return ((raw - mean) / scale).astype(np.float32)
+
+def _raw_thresholds(threshold, mean, scale):
+    """
+    For each split, the largest raw float64 x with float32((x - mean) / scale) <= threshold.
+    That map is monotone in x, so a bisection over the ordered float64
+    bit patterns finds the exact boundary: `x <= result` then picks the same
+    branch as the scaled comparison for every raw input.
+    """
+    lo = np.full(len(threshold), _float_to_key(-np.inf))
+    hi = np.full(len(threshold), _float_to_key(np.inf))
+    
+    # The keys span 2**64 values, so 64 halvings always reach the boundary
+    for _ in range(64):
+        # Overflow-safe midpoint of two int64 keys
+        mid = (lo >> 1) + (hi >> 1) + (lo & hi & 1)
+        goes_left = _scaled(_key_to_float(mid), mean, scale) <= threshold
+        lo = np.where(goes_left, mid, lo)
+        hi = np.where(goes_left, hi, mid)
+    
+    return _key_to_float(lo)
+
+def fold_scaler(compiled, scaler):
+    """Return a CompiledForest that takes raw features, with the scaler folded into its thresholds"""
+    n_features = compiled.n_features_in_
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    
+    is_split = np.isfinite(compiled.threshold)
+    feature = compiled.feature[is_split]
+    
+    threshold = np.full(compiled.n_nodes, np.inf)
+    threshold[is_split] = _raw_thresholds(
+        compiled.threshold[is_split].astype(np.float32), mean[feature], scale[feature]
+    )
+    
+    return CompiledForest(
+        feature=compiled.feature,
+        threshold=threshold,
+        left=compiled.left,
+        right=compiled.right,
+        value=compiled.value,
+        roots=compiled.roots,
+        classes=compiled.classes_,
+        n_features=n_features,
+        max_depth=compiled.max_depth,
+    )
+
+def raw_probe_matrix(folded, scaler, n_random=256, seed=0):
+    """Raw-feature inputs around the folded thresholds, for train/serve skew checks"""
+    rng = np.random.RandomState(seed)
+    n_features = folded.n_features_in_
+    
+    rows = [scaler.inverse_transform(rng.normal(size=(n_random, n_features)))]
+    
+    split_nodes = np.flatnonzero(np.isfinite(folded.threshold))
+    if len(split_nodes) == 0:
+        return rows[0]
+    
+    on_threshold = folded.threshold[split_nodes]
+    for value in (on_threshold, np.nextafter(on_threshold, np.inf)):
+        boundary = scaler.inverse_transform(rng.normal(size=(len(split_nodes), n_features)))
+        boundary[np.arange(len(split_nodes)), folded.feature[split_nodes]] = value
+        rows.append(boundary)
+    
+    return np.vstack(rows)
+
+def verify_folded(model, scaler, folded, X_raw=None):
+    """Return True if folded(raw) reproduces model.predict_proba(scaler.transform(raw)) exactly"""
+    if X_raw is None:
+        X_raw = raw_probe_matrix(folded, scaler)
+    
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        expected = model.predict_proba(scaler.transform(X_raw))
+    
+    return np.array_equal(expected, folded.predict_proba(X_raw))
+
+def export_folded_model(model, scaler, output_path=f"models/{FOLDED_FILENAME}"):
+    """
+    Compile the forest, fold the scaler into it, check it against the
+    scaler + model pipeline and save it as a single .npz artifact.
+    """
+    print("\n--- Exporting Scaler-Folded Model ---")
+    
+    folded = fold_scaler(compile_forest(model), scaler)
+    if not verify_folded(model, scaler, folded):
+        raise ValueError("Folded model does not reproduce scaler + model predictions")
+    
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    folded.save(output_path)
+    print(f"✓ Folded model saved to {output_path} ({os.path.getsize(output_path)} bytes)")
+    
+    return output_path
+
+def export_compact_model(model, output_path=f"models/{COMPACT_FILENAME}"):
+    """Compile the forest, check it against sklearn and save it in the binary format"""
+    compiled = compile_forest(model)
+    if not verify_compiled(model, compiled):
+        raise ValueError("Compiled model does not reproduce sklearn predictions")
+    
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    compiled.save_binary(output_path)
+    print(f"✓ Compact model saved to {output_path} ({os.path.getsize(output_path)} bytes)")
+    
+    return output_path
+
+class FoldedForestModel(mlflow.pyfunc.PythonModel):
+    """MLflow pyfunc wrapper: raw patient features in, probability of disease out"""
+    
+    def load_context(self, context):
+        self.forest = CompiledForest.load(context.artifacts["forest"])
+    
+    def predict(self, context, model_input, params=None):
+        return self.forest.predict_proba(np.asarray(model_input, dtype=np.float64))[:, 1]
+
+def folded_pyfunc_kwargs(folded_path):
+    """mlflow.pyfunc log_model/save_model arguments for a folded artifact"""
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    return dict(
+        python_model=FoldedForestModel(),
+        artifacts={"forest": folded_path},
+        code_paths=[
+            os.path.join(src_dir, "forest_compiler.py"),
+            os.path.join(src_dir, "export_model.py"),
+        ],
+    )
+
+def log_folded_model(folded_path, artifact_path=FOLDED_ARTIFACT_PATH):
+    """Log the folded artifact to the active MLflow run as a pyfunc model"""
+    mlflow.pyfunc.log_model(artifact_path, **folded_pyfunc_kwargs(folded_path))
+    print(f"✓ Logged folded model to MLflow as '{artifact_path}'")
+
+if __name__ == "__main__":
+
+    # Example usage:
+    # python src/export_model.py [run_id]
+    # Folds models/scaler.pkl into the run's random_forest_model and logs
+    # the result, plus the compact binary of the model, back to the same run.
+    
+    run_id = sys.argv[1] if len(sys.argv) > 1 else None
+    
+    if run_id is None:
+        mlflow.set_experiment("Heart Disease Prediction")
+        runs = mlflow.search_runs(
+            experiment_names=["Heart Disease Prediction"],
+            filter_string="tags.mlflow.parentRunId IS NULL",
+            order_by=["start_time DESC"],
+            max_results=1
+        )
+        if len(runs) == 0:
+            sys.exit("✗ No runs found. Please train a model first.")
+        run_id = runs.iloc[0]["run_id"]
+    
+    model = mlflow.sklearn.load_model(f"runs:/{run_id}/random_forest_model")
+    scaler = joblib.load("models/scaler.pkl")
+    
+    folded_path = export_folded_model(model, scaler)
+    compact_path = export_compact_model(model)
+    with mlflow.start_run(run_id=run_id):
+        log_folded_model(folded_path)
+        mlflow.log_artifact(compact_path, artifact_path=COMPACT_ARTIFACT_PATH)
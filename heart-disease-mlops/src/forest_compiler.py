@@ -0,0 +1,338 @@
+"""
+Compile a fitted scikit-learn forest into flat NumPy arrays.
+All trees are concatenated into one set of node arrays (feature, threshold,
+left, right, value) so inference walks every tree at once, one depth level
+per step, instead of dispatching per estimator.
+
+`save_binary` packs the arrays into one flat file (smallest integer types
+for the indices, thresholds as stored) that `load_binary` memory-maps:
+loading costs a header parse, and processes serving the same file share
+its pages instead of each holding an unpickled copy.
+"""
+
+import json
+import os
+import struct
+import warnings
+
+import numpy as np
+
+# sklearn marks leaves with children_left == -1
+TREE_LEAF = -1
+
+# Rows traversed together; keeps the (n_trees, block) working set in cache
+BLOCK_SIZE = 256
+
+# Binary format: magic, uint32 header length, JSON header, then the arrays,
+# each starting on an ALIGNMENT boundary after the header
+BINARY_MAGIC = b"HDFOREST"
+BINARY_VERSION = 1
+ALIGNMENT = 64
+
+# Index arrays are kept as these types; anything else is converted to int32
+INDEX_DTYPES = (np.dtype(np.uint8), np.dtype(np.uint16), np.dtype(np.int32))
+
+def _index_array(values):
+    values = np.asarray(values)
+    return values if values.dtype in INDEX_DTYPES else values.astype(np.int32)
+
+def _compact_index_dtype(upper):
+    """Smallest stored type for indices in [0, upper)"""
+    if upper <= 1 << 8:
+        return np.dtype("<u1")
+    if upper <= 1 << 16:
+        return np.dtype("<u2")
+    return np.dtype("<i4")
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+class CompiledForest:
+    """
+    A forest of decision trees stored as contiguous node arrays.
+    
+    Leaves point back to themselves and carry an infinite threshold, so a row
+    that reaches a leaf early stays there for the remaining depth steps.
+    `value` holds the normalized class probabilities of every node.
+    
+    Inputs are cast to the threshold dtype before comparing. Forests compiled
+    from sklearn use float32, matching sklearn's own float32 traversal.
+    """
+    
+    def __init__(self, feature, threshold, left, right, value, roots, classes, n_features, max_depth, children=None):
+        self.feature = _index_array(feature)
+        self.threshold = np.asarray(threshold)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = _index_array(roots)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features)
+        self.max_depth = int(max_depth)
+        # File this forest is memory-mapped from (see load_binary), else None
+        self.mapped_path = None
+        
+        # Interleaved children: [2*i] is the left child of node i, [2*i + 1] the right one.
+        # Passing `children` (e.g. a memory-mapped array) uses it as is instead of left/right.
+        if children is None:
+            left, right = _index_array(left), _index_array(right)
+            children = np.empty(2 * len(left), dtype=np.result_type(left, right))
+            children[0::2] = left
+            children[1::2] = right
+        self._children = _index_array(children)
+        self.left = self._children[0::2]
+        self.right = self._children[1::2]
+    
+    def __reduce_ex__(self, protocol):
+        # A memory-mapped forest pickles as its path, so worker processes map
+        # the same file instead of receiving a copy of every array
+        if self.mapped_path is not None:
+            return type(self).load_binary, (self.mapped_path,)
+        return super().__reduce_ex__(protocol)
+    
+    @property
+    def n_trees(self):
+        return len(self.roots)
+    
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+    
+    def _leaves(self, X):
+        """Leaf node reached in every tree, shape (n_trees, n_rows)"""
+        X = np.ascontiguousarray(X, dtype=self.threshold.dtype)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input of shape (n_rows, {self.n_features_in_}), got {X.shape}")
+        
+        leaves = np.empty((self.n_trees, X.shape[0]), dtype=np.int32)
+        for start in range(0, X.shape[0], BLOCK_SIZE):
+            block = X[start:start + BLOCK_SIZE]
+            flat = block.ravel()
+            row_offsets = np.arange(block.shape[0], dtype=np.int32) * self.n_features_in_
+            
+            nodes = np.repeat(self.roots[:, np.newaxis], block.shape[0], axis=1)
+            for _ in range(self.max_depth):
+                values = flat.take(self.feature.take(nodes) + row_offsets)
+                go_right = values > self.threshold.take(nodes)
+                # int32 arithmetic: compact (uint8/uint16) indices would overflow when doubled
+                nodes = self._children.take(np.add(nodes, nodes, dtype=np.int32) + go_right)
+            
+            leaves[:, start:start + block.shape[0]] = nodes
+        return leaves
+    
+    def predict_proba(self, X):
+        """Average of the per-tree leaf probabilities, accumulated in tree order like sklearn"""
+        return self.value.take(self._leaves(X), axis=0).sum(axis=0) / self.n_trees
+    
+    def predict(self, X):
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+    
+    def save(self, path):
+        """Save the node arrays to a single .npz file"""
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            roots=self.roots,
+            classes=self.classes_,
+            n_features=self.n_features_in_,
+            max_depth=self.max_depth,
+        )
+    
+    @classmethod
+    def load(cls, path):
+        """Load a forest written by `save`, or memory-map one written by `save_binary`"""
+        with open(path, "rb") as f:
+            if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+                return cls.load_binary(path)
+        
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                left=data["left"],
+                right=data["right"],
+                value=data["value"],
+                roots=data["roots"],
+                classes=data["classes"],
+                n_features=data["n_features"],
+                max_depth=data["max_depth"],
+            )
+    
+    def save_binary(self, path):
+        """
+        Write the forest in the flat binary format (see module docstring).
+        The file is written next to `path` and renamed over it, so processes
+        that have the old file mapped keep reading a complete copy.
+        """
+        node_index = _compact_index_dtype(self.n_nodes)
+        arrays = {
+            "feature": self.feature.astype(_compact_index_dtype(self.n_features_in_)),
+            "threshold": self.threshold.astype(self.threshold.dtype.newbyteorder("<")),
+            "children": self._children.astype(node_index),
+            "roots": self.roots.astype(node_index),
+            "value": self.value.astype("<f8"),
+        }
+        
+        header = {
+            "version": BINARY_VERSION,
+            "n_features": self.n_features_in_,
+            "max_depth": self.max_depth,
+            "classes": self.classes_.tolist(),
+            "classes_dtype": self.classes_.dtype.str,
+            "arrays": {},
+        }
+        offset = 0
+        for name, array in arrays.items():
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = _aligned(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode()
+        
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(BINARY_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+            data_start = _aligned(f.tell())
+            for name, array in arrays.items():
+                f.seek(data_start + header["arrays"][name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load_binary(cls, path, mmap=True):
+        """Load a forest written by `save_binary`; the arrays are views of a read-only memory map unless mmap=False"""
+        with open(path, "rb") as f:
+            if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+                raise ValueError(f"{path} is not a compiled forest binary")
+            (header_length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_length))
+        if header["version"] != BINARY_VERSION:
+            raise ValueError(f"Unsupported forest binary version {header['version']} (expected {BINARY_VERSION})")
+        
+        data_start = _aligned(len(BINARY_MAGIC) + 4 + header_length)
+        buffer = np.memmap(path, dtype=np.uint8, mode="r") if mmap else np.fromfile(path, dtype=np.uint8)
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            start = data_start + spec["offset"]
+            size = int(np.prod(spec["shape"])) * dtype.itemsize
+            arrays[name] = np.asarray(buffer[start:start + size]).view(dtype).reshape(spec["shape"])
+        
+        forest = cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=None,
+            right=None,
+            value=arrays["value"],
+            roots=arrays["roots"],
+            classes=np.asarray(header["classes"], dtype=header["classes_dtype"]),
+            n_features=header["n_features"],
+            max_depth=header["max_depth"],
+            children=arrays["children"],
+        )
+        if mmap:
+            forest.mapped_path = os.path.abspath(path)
+        return forest
+
+def float32_floor(values):
+    """
+    Largest float32 <= each float64 value.
+    For float32 inputs, `x <= t` and `x <= float32_floor(t)` always agree,
+    so sklearn's float64 thresholds can be stored as float32 losslessly.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+def compile_forest(model):
+    """
+    Flatten a fitted forest classifier (e.g. RandomForestClassifier) into a CompiledForest.
+    
+    Raises TypeError if the model is not a forest of decision trees and
+    ValueError for multi-output models.
+    """
+    estimators = getattr(model, "estimators_", None)
+    if not estimators or not all(hasattr(est, "tree_") for est in estimators):
+        raise TypeError(f"{type(model).__name__} is not a fitted forest of decision trees")
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output forests can be compiled")
+    
+    n_classes = len(model.classes_)
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    
+    for estimator in estimators:
+        tree = estimator.tree_
+        n = tree.node_count
+        node_ids = np.arange(offset, offset + n)
+        is_leaf = tree.children_left == TREE_LEAF
+        
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        
+        # Same normalization as DecisionTreeClassifier.predict_proba
+        proba = tree.value[:, 0, :n_classes].astype(np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(proba / normalizer)
+        
+        roots.append(offset)
+        offset += n
+    
+    return CompiledForest(
+        feature=np.concatenate(feature),
+        threshold=float32_floor(np.concatenate(threshold)),
+        left=np.concatenate(left),
+        right=np.concatenate(right),
+        value=np.concatenate(value),
+        roots=roots,
+        classes=model.classes_,
+        n_features=model.n_features_in_,
+        max_depth=max(est.tree_.max_depth for est in estimators),
+    )
+
+def probe_matrix(compiled, n_random=256, seed=0):
+    """
+    Inputs for checking a compiled forest against sklearn: random rows spanning
+    the split thresholds, plus rows sitting exactly on and just above each threshold.
+    """
+    rng = np.random.RandomState(seed)
+    n_features = compiled.n_features_in_
+    is_split = np.isfinite(compiled.threshold)
+    
+    low = np.full(n_features, -1.0)
+    high = np.full(n_features, 1.0)
+    for f in range(n_features):
+        split_values = compiled.threshold[is_split & (compiled.feature == f)]
+        if len(split_values):
+            low[f] = split_values.min() - 1.0
+            high[f] = split_values.max() + 1.0
+    
+    rows = [rng.uniform(low, high, size=(n_random, n_features))]
+    
+    # Boundary rows: one split threshold (or the next representable value) per row
+    split_nodes = np.flatnonzero(is_split)
+    if len(split_nodes):
+        on_threshold = compiled.threshold[split_nodes]
+        above = np.nextafter(on_threshold, on_threshold.dtype.type(np.inf))
+        for value in (on_threshold, above):
+            boundary = rng.uniform(low, high, size=(len(split_nodes), n_features))
+            boundary[np.arange(len(split_nodes)), compiled.feature[split_nodes]] = value
+            rows.append(boundary)
+    
+    return np.vstack(rows)
+
+def verify_compiled(model, compiled, X=None):
+    """Return True if the compiled forest reproduces sklearn's predict_proba exactly on X"""
+    if X is None:
+        X = probe_matrix(compiled)
+    
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        expected = model.predict_proba(X)
+    
+    return np.array_equal(expected, compiled.predict_proba(X))
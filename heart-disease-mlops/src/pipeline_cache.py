@@ -0,0 +1,161 @@
+"""
+Content-hash cache for pipeline stages.
+A stage's key is a sha256 over its input files, its source files, its
+parameters and the library versions it runs with, so a rerun with nothing
+changed can reuse the previous result:
+- preprocessing stores its output files under PIPELINE_CACHE_DIR/<stage>/<key>/
+  and copies them back on a hit
+- training looks for an earlier MLflow run tagged with the same key and
+  reuses its model (the hit is recorded on that run)
+
+Set PIPELINE_CACHE=0, or pass --no-cache to the scripts, to always rerun.
+"""
+
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+
+PIPELINE_CACHE_DIR = os.environ.get("PIPELINE_CACHE_DIR", ".pipeline_cache")
+PIPELINE_CACHE_ENABLED = os.environ.get("PIPELINE_CACHE", "1") != "0"
+
+MANIFEST_FILENAME = "manifest.json"
+
+# MLflow tags written on training runs
+KEY_TAG = "pipeline_cache.key"
+HITS_TAG = "pipeline_cache.hits"
+LAST_HIT_TAG = "pipeline_cache.last_hit_at"
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def library_versions():
+    """Versions that can change a stage's output without any change to our code"""
+    import numpy
+    import pandas
+    import sklearn
+    
+    return {
+        "python": ".".join(platform.python_version_tuple()[:2]),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+def stage_key(stage, inputs=(), code=(), params=None):
+    """
+    sha256 of everything a stage's output depends on.
+    inputs are data file paths, code are source file names in src/.
+    """
+    for path in inputs:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Input for stage '{stage}' not found at {path}")
+    
+    description = {
+        "stage": stage,
+        "inputs": {path: file_sha256(path) for path in inputs},
+        "code": {name: file_sha256(os.path.join(SRC_DIR, name)) for name in code},
+        "params": params or {},
+        "versions": library_versions(),
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+
+class StageCache:
+    """
+    Output files of a stage, stored per (stage, key) with a manifest of
+    their original paths and sha256. An entry whose files don't match the
+    manifest counts as a miss.
+    """
+    
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or PIPELINE_CACHE_DIR
+    
+    def entry_dir(self, stage, key):
+        return os.path.join(self.cache_dir, stage, key)
+    
+    def read_manifest(self, stage, key):
+        try:
+            with open(os.path.join(self.entry_dir(stage, key), MANIFEST_FILENAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def restore(self, stage, key):
+        """Copy a cached entry's files back to their paths; returns the manifest, or None on a miss"""
+        manifest = self.read_manifest(stage, key)
+        if manifest is None:
+            return None
+        
+        entry = self.entry_dir(stage, key)
+        for output in manifest["outputs"]:
+            stored = os.path.join(entry, output["file"])
+            if not os.path.exists(stored) or file_sha256(stored) != output["sha256"]:
+                print(f"⚠ Cached {stage} output {output['path']} is damaged, rerunning the stage")
+                return None
+        
+        for output in manifest["outputs"]:
+            path = output["path"]
+            if os.path.exists(path) and file_sha256(path) == output["sha256"]:
+                continue
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp-{os.getpid()}"
+            shutil.copyfile(os.path.join(entry, output["file"]), tmp_path)
+            os.replace(tmp_path, path)
+        return manifest
+    
+    def store(self, stage, key, outputs, info=None):
+        """Copy `outputs` (file paths) into the cache under (stage, key)"""
+        entry = self.entry_dir(stage, key)
+        tmp_entry = f"{entry}.tmp-{os.getpid()}"
+        os.makedirs(tmp_entry, exist_ok=True)
+        
+        manifest = {"stage": stage, "key": key, "created_at": time.time(), "info": info or {}, "outputs": []}
+        for i, path in enumerate(outputs):
+            name = f"{i}-{os.path.basename(path)}"
+            shutil.copyfile(path, os.path.join(tmp_entry, name))
+            manifest["outputs"].append({"path": path, "file": name, "sha256": file_sha256(path)})
+        with open(os.path.join(tmp_entry, MANIFEST_FILENAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+        
+        # Publish the whole entry at once (replacing a damaged one)
+        if os.path.exists(entry):
+            shutil.rmtree(entry)
+        os.replace(tmp_entry, entry)
+        return manifest
+
+def find_cached_run(key, experiment_name, artifact_path):
+    """Run id of the latest finished MLflow run with this stage key that still has its model, or None"""
+    import mlflow
+    from mlflow.tracking import MlflowClient
+    
+    runs = mlflow.search_runs(
+        experiment_names=[experiment_name],
+        filter_string=f"tags.`{KEY_TAG}` = '{key}' and attributes.status = 'FINISHED'",
+        order_by=["start_time DESC"],
+        max_results=1,
+    )
+    if len(runs) == 0:
+        return None
+    
+    run_id = runs.iloc[0]["run_id"]
+    if not MlflowClient().list_artifacts(run_id, artifact_path):
+        return None
+    return run_id
+
+def record_cache_hit(run_id):
+    """Count a reuse of this run's outputs on the run itself"""
+    from mlflow.tracking import MlflowClient
+    
+    client = MlflowClient()
+    hits = int(client.get_run(run_id).data.tags.get(HITS_TAG, "0")) + 1
+    client.set_tag(run_id, HITS_TAG, str(hits))
+    client.set_tag(run_id, LAST_HIT_TAG, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+    return hits
@@ -1,13 +1,51 @@
 """
 Data preprocessing and cleaning script.
 Handles missing values, feature encoding, and scaling.
+
+Besides the CSV, the cleaned (unscaled) and processed data are written as
+memory-mappable Arrow files (see columnar.py) for training, EDA and scoring.
+
+Inputs too large for memory can be processed chunk by chunk:
+    python src/preprocess.py --streaming [--chunk-size 100000]
+
+When the scaler is fit, the unscaled training distribution of every
+feature is saved to models/drift_reference.json for the API's drift
+monitor (see drift.py).
+
+Reruns with an unchanged data/heart.csv, code and settings restore the
+outputs from the pipeline cache (see pipeline_cache.py); --no-cache
+always reprocesses. --profile times each stage (load, impute, encode,
+scale, write) and logs the profile to MLflow (see profiling.py).
 """
 
+import argparse
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 from sklearn.preprocessing import StandardScaler
 import os
 
+from columnar import ColumnarWriter, column_type, mark_scaled, write_columnar
+from drift import REFERENCE_PATH, feature_reference, reference_profile, save_reference
+from pipeline_cache import PIPELINE_CACHE_ENABLED, StageCache, stage_key
+from profiling import StageProfiler, stage
+
+CLEAN_COLUMNAR_PATH = 'data/heart_clean.arrow'
+PROCESSED_COLUMNAR_PATH = 'data/heart_processed.arrow'
+
+# Everything preprocessing writes, as cached by the pipeline cache
+PREPROCESS_OUTPUTS = ['data/heart_processed.csv', PROCESSED_COLUMNAR_PATH, CLEAN_COLUMNAR_PATH, 'models/scaler.pkl',
+                      REFERENCE_PATH]
+
+# MLflow experiment for --profile runs
+PROFILE_EXPERIMENT_NAME = "Heart Disease Preprocessing"
+
+# Columns with more distinct values than this switch from exact median counts to a sample
+MAX_EXACT_DISTINCT = 100000
+
+# Values kept per column for sample-based medians
+MEDIAN_SAMPLE_SIZE = 100000
+
 def load_data(path='data/heart.csv'):
     """Load the raw heart disease dataset"""
     if not os.path.exists(path):
@@ -28,7 +66,7 @@ def handle_missing_values(df):
     for col in numeric_cols:
         if df[col].isnull().sum() > 0:
             median_val = df[col].median()
-            df[col].fillna(median_val, inplace=True)
+            df[col] = df[col].fillna(median_val)
             print(f"Filled {col} with median: {median_val}")
     
     print("✓ Missing values handled")
@@ -63,6 +101,9 @@ def scale_features(df, exclude_cols=['target']):
     numeric_cols = df.select_dtypes(include=[np.number]).columns
     cols_to_scale = [col for col in numeric_cols if col not in exclude_cols]
     
+    # Reference distributions for drift monitoring, from the features the scaler is fit on
+    save_reference(reference_profile(df, cols_to_scale))
+    
     scaler = StandardScaler()
     df[cols_to_scale] = scaler.fit_transform(df[cols_to_scale])
     
@@ -82,26 +123,303 @@ def preprocess_pipeline():
     print("="*50)
     
     # Load
-    df = load_data()
+    with stage("load"):
+        df = load_data()
     
     # Clean
-    df = handle_missing_values(df)
+    with stage("impute"):
+        df = handle_missing_values(df)
     
     # Encode
-    df = encode_features(df)
+    with stage("encode"):
+        df = encode_features(df)
+    with stage("write"):
+        write_columnar(df, CLEAN_COLUMNAR_PATH)
     
     # Scale
-    df, scaler = scale_features(df)
+    with stage("scale"):
+        df, scaler = scale_features(df)
     
     # Save processed data
     output_path = 'data/heart_processed.csv'
-    df.to_csv(output_path, index=False)
-    print(f"\n✓ Processed data saved to {output_path}")
+    with stage("write"):
+        df.to_csv(output_path, index=False)
+        write_columnar(df, PROCESSED_COLUMNAR_PATH, float_columns=list(scaler.feature_names_in_), scaled=True)
+    print(f"\n✓ Processed data saved to {output_path} and {PROCESSED_COLUMNAR_PATH}")
+    print(f"✓ Cleaned (unscaled) data saved to {CLEAN_COLUMNAR_PATH}")
     
     print("\nProcessed data summary:")
     print(df.describe())
     
     return df
 
+class StreamingColumnStats:
+    """
+    One pass over a numeric column, chunk by chunk, in constant memory:
+    count, mean and M2 (merged with Chan et al.'s parallel update) plus the
+    median. The median is exact (value counts) while the column has at
+    most MAX_EXACT_DISTINCT distinct values and falls back to a uniform
+    reservoir sample of MEDIAN_SAMPLE_SIZE values after that.
+    """
+    
+    def __init__(self, seed=0):
+        self.count = 0
+        self.n_missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.value_counts = {}
+        self._rng = np.random.RandomState(seed)
+        self._sample = np.empty(MEDIAN_SAMPLE_SIZE)
+    
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        missing = np.isnan(values)
+        self.n_missing += int(missing.sum())
+        values = values[~missing]
+        if len(values) == 0:
+            return
+        
+        self._update_sample(values)
+        
+        # Merge this chunk's (count, mean, M2) into the running totals
+        n, mean = len(values), values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        
+        if self.value_counts is not None:
+            unique, counts = np.unique(values, return_counts=True)
+            for value, count in zip(unique.tolist(), counts.tolist()):
+                self.value_counts[value] = self.value_counts.get(value, 0) + count
+            if len(self.value_counts) > MAX_EXACT_DISTINCT:
+                self.value_counts = None
+    
+    def _update_sample(self, values):
+        """Algorithm R, vectorized per chunk (later rows overwrite earlier ones, as in the sequential version)"""
+        seen = self.count
+        n_fill = max(0, min(MEDIAN_SAMPLE_SIZE - seen, len(values)))
+        self._sample[seen:seen + n_fill] = values[:n_fill]
+        
+        rest = values[n_fill:]
+        if len(rest):
+            positions = np.arange(seen + n_fill, seen + len(values)) + 1
+            slots = (self._rng.random_sample(len(rest)) * positions).astype(np.int64)
+            keep = slots < MEDIAN_SAMPLE_SIZE
+            self._sample[slots[keep]] = rest[keep]
+    
+    @property
+    def exact(self):
+        return self.value_counts is not None
+    
+    def median(self):
+        """Median of the non-missing values (the same convention as pandas.Series.median)"""
+        if self.count == 0:
+            return np.nan
+        
+        if not self.exact:
+            return float(np.median(self._sample[:min(self.count, MEDIAN_SAMPLE_SIZE)]))
+        
+        values = np.array(sorted(self.value_counts))
+        cumulative = np.cumsum([self.value_counts[v] for v in values])
+        lower = values[np.searchsorted(cumulative, (self.count - 1) // 2 + 1)]
+        upper = values[np.searchsorted(cumulative, self.count // 2 + 1)]
+        return float((lower + upper) / 2)
+    
+    def imputed_moments(self, fill_value):
+        """(count, mean, population variance) after the missing values are filled with fill_value"""
+        total = self.count + self.n_missing
+        if self.n_missing == 0 or np.isnan(fill_value):
+            return self.count, self.mean, self.m2 / self.count if self.count else np.nan
+        
+        delta = fill_value - self.mean
+        mean = self.mean + delta * self.n_missing / total
+        m2 = self.m2 + delta ** 2 * self.count * self.n_missing / total
+        return total, mean, m2 / total
+    
+    def reference(self, fill_value):
+        """Drift reference (see drift.py) of the column after imputation: exact while value counts are kept"""
+        if not self.exact:
+            return feature_reference(self._sample[:min(self.count, MEDIAN_SAMPLE_SIZE)])
+        counts = dict(self.value_counts)
+        if self.n_missing and not np.isnan(fill_value):
+            counts[fill_value] = counts.get(fill_value, 0) + self.n_missing
+        return feature_reference(list(counts), list(counts.values()))
+
+def scaler_from_stats(columns, stats, medians):
+    """A fitted StandardScaler built from streamed statistics instead of fit()"""
+    moments = [stats[col].imputed_moments(medians[col]) for col in columns]
+    
+    scaler = StandardScaler()
+    scaler.n_features_in_ = len(columns)
+    scaler.feature_names_in_ = np.asarray(columns, dtype=object)
+    scaler.n_samples_seen_ = int(moments[0][0]) if moments else 0
+    scaler.mean_ = np.array([mean for _, mean, _ in moments])
+    scaler.var_ = np.array([var for _, _, var in moments])
+    # Same zero-variance handling as StandardScaler.fit
+    scale = np.sqrt(scaler.var_)
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+    scaler.scale_ = scale
+    return scaler
+
+def streamed_column_types(template, stats, medians, float_columns=()):
+    """
+    The columnar schema for the streamed output. Pass 2 only sees one chunk
+    at a time, so int8 vs float32 is decided from the pass-1 value counts
+    (plus the fill value) instead of from the data being written.
+    """
+    fields = []
+    for col in template.columns:
+        if col == 'target':
+            values = [0, 1]
+        elif col not in stats:
+            values = template[col].to_numpy()
+        elif stats[col].exact:
+            values = list(stats[col].value_counts) + ([medians[col]] if stats[col].n_missing else [])
+        else:
+            values = [np.nan]
+        fields.append((col, column_type(col, np.asarray(values), float_columns)))
+    return pa.schema(fields)
+
+def preprocess_streaming(input_path='data/heart.csv', output_path='data/heart_processed.csv',
+                         chunk_size=100000, exclude_cols=['target'],
+                         columnar_path=PROCESSED_COLUMNAR_PATH, clean_columnar_path=CLEAN_COLUMNAR_PATH):
+    """
+    Out-of-core version of preprocess_pipeline with the same output.
+    Pass 1 gathers medians and scaler statistics, pass 2 imputes, encodes,
+    scales and appends each chunk to the output. Memory depends on the
+    chunk size, not on the size of the input. Pass None as a columnar path
+    to skip that Arrow file.
+    """
+    print("="*50)
+    print("DATA PREPROCESSING PIPELINE (STREAMING)")
+    print("="*50)
+    
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Dataset not found at {input_path}. Run data/download_dataset.py first.")
+    
+    # Pass 1: statistics
+    print(f"\n--- Pass 1: Gathering Statistics (chunks of {chunk_size}) ---")
+    stats = None
+    n_rows = 0
+    with stage("stats"):
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+            if stats is None:
+                template = chunk.iloc[:0]
+                numeric_cols = list(chunk.select_dtypes(include=[np.number]).columns)
+                stats = {col: StreamingColumnStats(seed=i) for i, col in enumerate(numeric_cols)}
+            for col, col_stats in stats.items():
+                col_stats.update(chunk[col].to_numpy(dtype=np.float64, na_value=np.nan))
+            n_rows += len(chunk)
+    
+    if stats is None:
+        raise ValueError(f"No rows found in {input_path}")
+    print(f"Scanned {n_rows} rows, {len(stats)} numeric columns")
+    
+    medians = {col: col_stats.median() for col, col_stats in stats.items()}
+    for col, col_stats in stats.items():
+        if col_stats.n_missing:
+            kind = "exact" if col_stats.exact else "sampled"
+            print(f"Will fill {col_stats.n_missing} missing {col} with {kind} median: {medians[col]}")
+    
+    cols_to_scale = [col for col in stats if col not in exclude_cols]
+    scaler = scaler_from_stats(cols_to_scale, stats, medians)
+    os.makedirs('models', exist_ok=True)
+    import joblib
+    joblib.dump(scaler, 'models/scaler.pkl')
+    save_reference({"features": {col: stats[col].reference(medians[col]) for col in cols_to_scale}})
+    print(f"✓ Scaler fitted on {len(cols_to_scale)} features from streamed statistics")
+    
+    # Pass 2: impute, encode, scale, write
+    print("\n--- Pass 2: Transforming ---")
+    writers = {}
+    if clean_columnar_path:
+        writers['clean'] = ColumnarWriter(clean_columnar_path, streamed_column_types(template, stats, medians))
+    if columnar_path:
+        schema = mark_scaled(streamed_column_types(template, stats, medians, cols_to_scale))
+        writers['processed'] = ColumnarWriter(columnar_path, schema)
+    
+    header = True
+    try:
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+            with stage("impute"):
+                chunk = chunk.fillna({col: value for col, value in medians.items() if stats[col].n_missing})
+            with stage("encode"):
+                if 'target' in chunk.columns:
+                    chunk['target'] = (chunk['target'] > 0).astype(int)
+            with stage("write"):
+                if 'clean' in writers:
+                    writers['clean'].write(chunk)
+            with stage("scale"):
+                chunk[cols_to_scale] = (chunk[cols_to_scale].to_numpy(dtype=np.float64) - scaler.mean_) / scaler.scale_
+            with stage("write"):
+                chunk.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+                if 'processed' in writers:
+                    writers['processed'].write(chunk)
+            header = False
+    finally:
+        for writer in writers.values():
+            writer.close()
+    
+    print(f"\n✓ Processed data saved to {output_path}")
+    for writer in writers.values():
+        print(f"✓ Columnar copy saved to {writer.path}")
+    return scaler
+
+def log_profile(profiler):
+    """Print a stage profile and log it as its own run (kept apart from the training runs)"""
+    import mlflow
+    
+    profiler.report()
+    mlflow.set_experiment(PROFILE_EXPERIMENT_NAME)
+    with mlflow.start_run(run_name="preprocess") as run:
+        profiler.log_to_mlflow(run.info.run_id)
+    print(f"✓ Stage profile logged to run {run.info.run_id}")
+    return run.info.run_id
+
+def cached_preprocess(streaming=False, chunk_size=100000, cache=None):
+    """
+    Run preprocessing unless an identical run (same data/heart.csv, code,
+    settings and library versions) is in the pipeline cache, in which case
+    its outputs are restored instead. Returns True on a cache hit.
+    """
+    params = {"streaming": streaming, "chunk_size": chunk_size if streaming else None}
+    cache = cache or StageCache()
+    with stage("cache"):
+        key = stage_key("preprocess", inputs=['data/heart.csv'], code=['preprocess.py', 'columnar.py', 'drift.py'], params=params)
+        restored = cache.restore("preprocess", key)
+    
+    if restored is not None:
+        print(f"✓ Inputs unchanged, restored processed data and scaler from the pipeline cache ({key[:12]})")
+        return True
+    
+    if streaming:
+        preprocess_streaming(chunk_size=chunk_size)
+    else:
+        preprocess_pipeline()
+    with stage("cache"):
+        cache.store("preprocess", key, PREPROCESS_OUTPUTS, info=params)
+    print(f"✓ Outputs stored in the pipeline cache ({key[:12]})")
+    return False
+
 if __name__ == "__main__":
-    preprocess_pipeline()
+    parser = argparse.ArgumentParser(description="Clean, encode and scale the heart disease dataset")
+    parser.add_argument("--streaming", action="store_true", help="Process the CSV chunk by chunk in constant memory")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--no-cache", action="store_true", help="Reprocess even if the inputs are unchanged")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Time each stage and log the profile to the '{PROFILE_EXPERIMENT_NAME}' MLflow experiment")
+    args = parser.parse_args()
+    
+    with StageProfiler("preprocess") as profiler:
+        if PIPELINE_CACHE_ENABLED and not args.no_cache:
+            cached_preprocess(streaming=args.streaming, chunk_size=args.chunk_size)
+        elif args.streaming:
+            preprocess_streaming(chunk_size=args.chunk_size)
+        else:
+            preprocess_pipeline()
+    
+    if args.profile:
+        log_profile(profiler)
@@ -0,0 +1,218 @@
+"""
+Per-stage profiling for the preprocessing and training pipelines.
+Code marks its stages with `with stage("fit"):` or `@profiled("train")`.
+While a StageProfiler is active, each stage records wall time, process
+CPU time (so a fit's worker threads count, as do concurrent stages'),
+the process's peak RSS and, with PROFILE_TRACEMALLOC=1, the peak of
+Python allocations during the stage; with no active profiler the markers
+cost nothing. Profiling is opt-in: @profiled functions only start a
+profiler with PIPELINE_PROFILE=1 (or train_model.py --profile). The
+results are printed, logged to MLflow as profile/<stage>/* metrics and
+attached to the run as a Chrome trace (chrome://tracing, Perfetto,
+speedscope) and folded stacks (flamegraph.pl).
+"""
+
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# PIPELINE_PROFILE=1 lets @profiled functions start (and log) a profile on their own; off by default
+PROFILE_ENABLED = os.environ.get("PIPELINE_PROFILE", "0") == "1"
+PROFILE_TRACEMALLOC = os.environ.get("PROFILE_TRACEMALLOC", "0") == "1"
+
+TRACE_ARTIFACT = "profile/trace.json"
+FOLDED_ARTIFACT = "profile/stacks.folded"
+
+# Profiler that stage() records into (None: stages are not recorded)
+_ACTIVE = None
+
+def _peak_rss_mb():
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak / (1 << 20) if os.uname().sysname == "Darwin" else peak / 1024
+
+class StageProfiler:
+    """Records the stages run while it is active; see the module docstring"""
+    
+    def __init__(self, name, trace_memory=PROFILE_TRACEMALLOC):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.records = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._started_tracemalloc = False
+        self._previous = None
+    
+    def __enter__(self):
+        global _ACTIVE
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._previous, _ACTIVE = _ACTIVE, self
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        global _ACTIVE
+        _ACTIVE = self._previous
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+    
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+    
+    @contextmanager
+    def stage(self, name):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        frame = {"name": name, "path": f"{parent['path']}/{name}" if parent else name, "py_peak": 0}
+        
+        # tracemalloc has one peak counter: fold the parent's peak so far into it before resetting
+        if self.trace_memory and tracemalloc.is_tracing():
+            if parent is not None:
+                parent["py_peak"] = max(parent["py_peak"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        
+        stack.append(frame)
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        rss_started = _peak_rss_mb()
+        try:
+            yield
+        finally:
+            wall_s = time.perf_counter() - started
+            cpu_s = time.process_time() - cpu_started
+            rss_mb = _peak_rss_mb()
+            if self.trace_memory and tracemalloc.is_tracing():
+                frame["py_peak"] = max(frame["py_peak"], tracemalloc.get_traced_memory()[1])
+                if parent is not None:
+                    parent["py_peak"] = max(parent["py_peak"], frame["py_peak"])
+            stack.pop()
+            
+            with self._lock:
+                self.records.append({
+                    "name": name,
+                    "path": frame["path"],
+                    "thread": threading.current_thread().name,
+                    "tid": threading.get_ident(),
+                    "start_s": started - self._origin,
+                    "wall_s": wall_s,
+                    "cpu_s": cpu_s,
+                    "peak_rss_mb": rss_mb,
+                    "rss_growth_mb": rss_mb - rss_started,
+                    "py_peak_mb": frame["py_peak"] / (1 << 20) if self.trace_memory else None,
+                })
+    
+    def summary(self):
+        """Per stage path: calls, total wall/CPU seconds and the memory high-water marks"""
+        totals = defaultdict(lambda: {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0.0, "py_peak_mb": None})
+        for record in sorted(self.records, key=lambda r: r["start_s"]):
+            total = totals[record["path"]]
+            total["calls"] += 1
+            total["wall_s"] += record["wall_s"]
+            total["cpu_s"] += record["cpu_s"]
+            total["peak_rss_mb"] = max(total["peak_rss_mb"], record["peak_rss_mb"])
+            if record["py_peak_mb"] is not None:
+                total["py_peak_mb"] = max(total["py_peak_mb"] or 0.0, record["py_peak_mb"])
+        return dict(totals)
+    
+    def metrics(self):
+        """MLflow metrics: profile/<stage path>/<wall_s|cpu_s|peak_rss_mb|py_peak_mb>"""
+        metrics = {}
+        for path, total in self.summary().items():
+            for key in ("wall_s", "cpu_s", "peak_rss_mb", "py_peak_mb"):
+                if total[key] is not None:
+                    metrics[f"profile/{path}/{key}"] = total[key]
+        return metrics
+    
+    def chrome_trace(self):
+        """Complete ("X") events in the Chrome trace event format"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": record["name"], "cat": self.name, "ph": "X", "pid": pid, "tid": record["tid"],
+                "ts": record["start_s"] * 1e6, "dur": record["wall_s"] * 1e6,
+                "args": {k: record[k] for k in ("path", "cpu_s", "peak_rss_mb", "rss_growth_mb", "py_peak_mb")},
+            }
+            for record in self.records
+        ]
+        threads = {record["tid"]: record["thread"] for record in self.records}
+        events += [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+    
+    def folded_stacks(self):
+        """Brendan Gregg's folded format: "a;b;c <self wall time in us>" per stage path"""
+        self_us = defaultdict(float)
+        for record in self.records:
+            self_us[record["path"]] += record["wall_s"] * 1e6
+            if "/" in record["path"]:
+                self_us[record["path"].rsplit("/", 1)[0]] -= record["wall_s"] * 1e6
+        return "".join(
+            f"{path.replace('/', ';')} {max(int(us), 0)}\n" for path, us in sorted(self_us.items())
+        )
+    
+    def report(self):
+        print(f"\n--- Stage profile: {self.name} ---")
+        print(f"{'stage':<40}{'calls':>6}{'wall s':>10}{'cpu s':>10}{'peak RSS MB':>13}{'py peak MB':>12}")
+        for path, total in self.summary().items():
+            py_peak = f"{total['py_peak_mb']:>12.1f}" if total["py_peak_mb"] is not None else f"{'-':>12}"
+            print(f"{path:<40}{total['calls']:>6}{total['wall_s']:>10.3f}{total['cpu_s']:>10.3f}"
+                  f"{total['peak_rss_mb']:>13.1f}{py_peak}")
+    
+    def log_to_mlflow(self, run_id, client=None, trace=True):
+        """Log the stage metrics (one log_batch) and, optionally, the trace files to a run"""
+        from mlflow.entities import Metric
+        from mlflow.tracking import MlflowClient
+        
+        client = client or MlflowClient()
+        timestamp = int(time.time() * 1000)
+        client.log_batch(run_id, metrics=[Metric(k, float(v), timestamp, 0) for k, v in self.metrics().items()])
+        if trace:
+            client.log_dict(run_id, self.chrome_trace(), TRACE_ARTIFACT)
+            client.log_text(run_id, self.folded_stacks(), FOLDED_ARTIFACT)
+
+@contextmanager
+def stage(name):
+    """Record a stage in the active profiler, if there is one"""
+    profiler = _ACTIVE
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
+
+def active_profiler():
+    return _ACTIVE
+
+def profiled(name):
+    """
+    Decorator: run the function as a stage, starting a StageProfiler named
+    after it when none is active and profiling is enabled (so a top-level
+    call is profiled with PIPELINE_PROFILE=1)
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _ACTIVE is not None or not PROFILE_ENABLED:
+                with stage(name):
+                    return fn(*args, **kwargs)
+            with StageProfiler(name) as profiler, profiler.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -7,13 +7,15 @@ import mlflow
 import mlflow.sklearn
 import sys
 
-def register_model(run_id: str = None, model_name: str = "heart-disease-model"):
+def register_model(run_id: str = None, model_name: str = "heart-disease-model",
+                   artifact_path: str = "random_forest_model"):
     """
     Register a model from MLflow run to the Model Registry.
     
     Args:
         run_id: The MLflow run ID containing the model (if None, uses latest run)
         model_name: Name to register the model under
+        artifact_path: Model artifact within the run to register
     
     Returns:
         ModelVersion object with registration details
@@ -30,6 +32,7 @@ def register_model(run_id: str = None, model_name: str = "heart-disease-model"):
         
         runs = mlflow.search_runs(
             experiment_names=["Heart Disease Prediction"],
+            filter_string="tags.mlflow.parentRunId IS NULL",
             order_by=["start_time DESC"],
             max_results=1
         )
@@ -43,7 +46,7 @@ def register_model(run_id: str = None, model_name: str = "heart-disease-model"):
     
     try:
         # Register the model
-        model_uri = f"runs:/{run_id}/random_forest_model"
+        model_uri = f"runs:/{run_id}/{artifact_path}"
         
         print(f"\nRegistering model from: {model_uri}")
         print(f"Model name: {model_name}")
@@ -139,6 +142,9 @@ if __name__ == "__main__":
     model_version = register_model(run_id)
     
     if model_version:
+        # Register the scaler-folded export alongside it, if the run has one
+        register_model(model_version.run_id, "heart-disease-model-folded", "scaler_folded_model")
+        
         # Optionally transition to Staging for testing
         # transition_model_stage(model_version.name, model_version.version, "Staging")
         
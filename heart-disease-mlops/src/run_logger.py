@@ -0,0 +1,226 @@
+"""
+Batched, asynchronous MLflow logging for one run.
+Params, metrics and tags are buffered and sent with MlflowClient.log_batch
+(one round trip instead of one per value); plots and models are rendered,
+saved and uploaded on background threads while training continues.
+Leaving the `with` block flushes the buffer and waits for every background
+job, so nothing is lost when the run ends. Time spent on tracking-store
+round trips, plotting, model serialization and uploads is reported
+separately and logged to the run as logging_* metrics.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
+
+from profiling import stage
+
+# log_batch limits of the MLflow tracking API
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+
+TIMING_NAMES = ("tracking", "plotting", "model_save", "upload")
+
+class RunLogger:
+    """Buffers and backgrounds the logging of one MLflow run (see module docstring)"""
+    
+    def __init__(self, run_id, client=None, max_workers=2):
+        self.run_id = run_id
+        self.client = client or MlflowClient()
+        self._params = {}
+        self._metrics = []
+        self._tags = {}
+        self._buffer_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mlflow-logging")
+        self._futures = []
+        self._timing_lock = threading.Lock()
+        self.timings = {name: 0.0 for name in TIMING_NAMES}
+        self.round_trips = 0
+        self.wait_s = 0.0
+        self._experiment_id = None
+        self._closed = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close(raise_errors=exc_type is None)
+    
+    def _timed(self, name, started):
+        with self._timing_lock:
+            self.timings[name] += time.perf_counter() - started
+            if name == "tracking":
+                self.round_trips += 1
+    
+    # Buffered values
+    
+    def log_param(self, key, value):
+        with self._buffer_lock:
+            self._params[key] = value
+    
+    def log_params(self, params):
+        with self._buffer_lock:
+            self._params.update(params)
+    
+    def log_metric(self, key, value, step=0):
+        with self._buffer_lock:
+            self._metrics.append(Metric(key, float(value), int(time.time() * 1000), step))
+    
+    def log_metrics(self, metrics, step=0):
+        for key, value in metrics.items():
+            self.log_metric(key, value, step)
+    
+    def set_tag(self, key, value):
+        with self._buffer_lock:
+            self._tags[key] = value
+    
+    def set_tags(self, tags):
+        with self._buffer_lock:
+            self._tags.update(tags)
+    
+    @staticmethod
+    def _batches(params, metrics, tags):
+        """Split values into (metrics, params, tags) chunks within the log_batch limits"""
+        params = [Param(key, str(value)) for key, value in params.items()]
+        tags = [RunTag(key, str(value)) for key, value in tags.items()]
+        batches = []
+        while params or metrics or tags:
+            batch_params, params = params[:MAX_PARAMS_PER_BATCH], params[MAX_PARAMS_PER_BATCH:]
+            batch_tags, tags = tags[:MAX_TAGS_PER_BATCH], tags[MAX_TAGS_PER_BATCH:]
+            room = MAX_METRICS_PER_BATCH - len(batch_params) - len(batch_tags)
+            batch_metrics, metrics = metrics[:room], metrics[room:]
+            batches.append((batch_metrics, batch_params, batch_tags))
+        return batches
+    
+    def _log_batch(self, run_id, params, metrics, tags):
+        """Send values in as few log_batch calls as the API limits allow"""
+        for batch_metrics, batch_params, batch_tags in self._batches(params, metrics, tags):
+            started = time.perf_counter()
+            self.client.log_batch(run_id, metrics=batch_metrics, params=batch_params, tags=batch_tags)
+            self._timed("tracking", started)
+    
+    def flush(self):
+        """Send everything buffered so far in batch calls"""
+        with self._buffer_lock:
+            params, metrics, tags = self._params, self._metrics, self._tags
+            self._params, self._metrics, self._tags = {}, [], {}
+        self._log_batch(self.run_id, params, metrics, tags)
+    
+    # Background jobs
+    
+    def submit(self, fn, *args, **kwargs):
+        """Run fn on the logging threads; its errors are raised by close()"""
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._futures.append(future)
+        return future
+    
+    def _upload(self, local_path, artifact_path=None):
+        started = time.perf_counter()
+        if os.path.isdir(local_path):
+            self.client.log_artifacts(self.run_id, local_path, artifact_path)
+        else:
+            self.client.log_artifact(self.run_id, local_path, artifact_path)
+        self._timed("upload", started)
+    
+    def _save_figure(self, render_fn, local_path):
+        """Render with render_fn() -> matplotlib Figure, save to local_path and upload it"""
+        started = time.perf_counter()
+        with stage("plot"):
+            figure = render_fn()
+            os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+            figure.savefig(local_path)
+        self._timed("plotting", started)
+        self._upload(local_path)
+    
+    def log_figure(self, render_fn, local_path):
+        """
+        Render, save and upload a plot in the background. render_fn must build
+        a matplotlib.figure.Figure directly (not through pyplot, whose global
+        state isn't thread-safe).
+        """
+        return self.submit(self._save_figure, render_fn, local_path)
+    
+    def log_artifact(self, local_path, artifact_path=None):
+        return self.submit(self._upload, local_path, artifact_path)
+    
+    def save_model(self, save_fn, artifact_path):
+        """Blocking: save_fn(local_dir) writes an MLflow model, which is uploaded under artifact_path"""
+        with tempfile.TemporaryDirectory() as tmp:
+            local_dir = os.path.join(tmp, artifact_path)
+            started = time.perf_counter()
+            with stage("log_model"):
+                save_fn(local_dir)
+            self._timed("model_save", started)
+            with stage("upload"):
+                self._upload(local_dir, artifact_path)
+    
+    def log_model(self, save_fn, artifact_path):
+        """Save and upload a model in the background (e.g. save_fn=lambda path: mlflow.sklearn.save_model(m, path))"""
+        return self.submit(self.save_model, save_fn, artifact_path)
+    
+    def _child_run(self, run_name, params, metrics):
+        if self._experiment_id is None:
+            started = time.perf_counter()
+            self._experiment_id = self.client.get_run(self.run_id).info.experiment_id
+            self._timed("tracking", started)
+        
+        started = time.perf_counter()
+        child = self.client.create_run(
+            self._experiment_id, tags={"mlflow.parentRunId": self.run_id, "mlflow.runName": run_name}, run_name=run_name
+        )
+        self._timed("tracking", started)
+        
+        timestamp = int(time.time() * 1000)
+        self._log_batch(child.info.run_id, params, [Metric(k, float(v), timestamp, 0) for k, v in metrics.items()], {})
+        
+        started = time.perf_counter()
+        self.client.set_terminated(child.info.run_id)
+        self._timed("tracking", started)
+        return child.info.run_id
+    
+    def log_child_run(self, run_name, params, metrics):
+        """A finished nested run with these params and metrics, created in the background"""
+        return self.submit(self._child_run, run_name, params, metrics)
+    
+    # Shutdown
+    
+    def close(self, raise_errors=True):
+        """Wait for background jobs, flush the buffer and record the logging timings on the run"""
+        if self._closed:
+            return
+        self._closed = True
+        
+        started = time.perf_counter()
+        errors = []
+        with stage("logging_wait"):
+            for future in self._futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(e)
+            self._executor.shutdown(wait=True)
+        self.wait_s = time.perf_counter() - started
+        
+        for name in TIMING_NAMES:
+            self.log_metric(f"logging_{name}_s", self.timings[name])
+        self.log_metric("logging_wait_s", self.wait_s)
+        # Count the final flush's own batches too ([None] stands in for the round-trip metric itself)
+        with self._buffer_lock:
+            n_final = len(self._batches(self._params, self._metrics + [None], self._tags))
+        self.log_metric("logging_round_trips", self.round_trips + n_final)
+        self.flush()
+        
+        print(f"MLflow logging: {self.round_trips} round trips ({self.timings['tracking']:.2f}s), "
+              f"plots {self.timings['plotting']:.2f}s, model saves {self.timings['model_save']:.2f}s, "
+              f"uploads {self.timings['upload']:.2f}s, {self.wait_s:.2f}s waited at the end of the run")
+        
+        if errors:
+            if raise_errors:
+                raise errors[0]
+            print(f"✗ Background MLflow logging failed: {errors[0]}")
@@ -0,0 +1,222 @@
+"""
+Offline batch scoring for large patient files (CSV, Parquet or Arrow IPC).
+Loads the same model the API serves, streams the input in fixed-size
+chunks, scores the chunks on a process pool and appends the results to
+the output file in input order. At most a few chunks are in memory at
+once, however large the input is.
+
+Usage (from the heart-disease-mlops directory):
+    python src/score_offline.py registry.parquet scores.parquet
+    python src/score_offline.py registry.csv scores.csv --chunk-size 100000 --workers 8 --id-column patient_id
+    python src/score_offline.py data/heart_clean.arrow scores.arrow
+
+Arrow (.arrow/.feather) inputs are memory-mapped and sliced into chunks
+without parsing or copying. With MODEL_ENGINE=compact the model is the
+memory-mapped forest binary, and every worker maps the same file instead
+of holding its own copy of the model.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.app import FEATURE_NAMES, load_current_model
+from columnar import column_names, iter_batches
+
+# Snapshot each worker process scores with (set once by the pool initializer)
+_SNAPSHOT = None
+
+def _file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    if extension in (".arrow", ".feather"):
+        return "arrow"
+    raise SystemExit(f"✗ Unsupported file type '{extension}' (use .csv, .parquet or .arrow)")
+
+def read_chunks(path, chunk_size, columns):
+    """Yield DataFrames of at most chunk_size rows, reading only `columns`"""
+    file_format = _file_format(path)
+    if file_format == "csv":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+        return
+    if file_format == "arrow":
+        yield from iter_batches(path, chunk_size, columns)
+        return
+    
+    import pyarrow.parquet as pq
+    
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        yield batch.to_pandas()
+
+def input_columns(path):
+    file_format = _file_format(path)
+    if file_format == "csv":
+        return list(pd.read_csv(path, nrows=0).columns)
+    if file_format == "arrow":
+        return column_names(path)
+    
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).schema_arrow.names
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV, Parquet or Arrow IPC file"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.format = _file_format(path)
+        self._sink = None
+        self._table_writer = None
+        self._wrote_header = False
+    
+    def write(self, df):
+        if self.format == "csv":
+            df.to_csv(self.path, mode="a" if self._wrote_header else "w", header=not self._wrote_header, index=False)
+            self._wrote_header = True
+            return
+        
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._table_writer is None:
+            if self.format == "arrow":
+                self._sink = pa.OSFile(self.path, "wb")
+                self._table_writer = pa.ipc.new_file(self._sink, table.schema)
+            else:
+                self._table_writer = pq.ParquetWriter(self.path, table.schema)
+        self._table_writer.write_table(table)
+    
+    def close(self):
+        if self._table_writer is not None:
+            self._table_writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+def _init_worker(snapshot):
+    global _SNAPSHOT
+    _SNAPSHOT = snapshot
+
+def score_features(snapshot, features):
+    """
+    Score a raw (n_rows, 13) feature matrix; rows with missing values are skipped.
+    Returns (prediction, confidence, risk_level) columns.
+    """
+    n_rows = len(features)
+    prediction = np.full(n_rows, -1, dtype=np.int64)
+    confidence = np.full(n_rows, np.nan)
+    
+    valid = np.isfinite(features).all(axis=1)
+    if valid.any():
+        scored, scored_confidence = snapshot.score(np.ascontiguousarray(features[valid]))
+        prediction[valid] = scored
+        confidence[valid] = scored_confidence
+    
+    risk_level = np.where(prediction == 1, np.where(confidence > 0.7, "High", "Moderate"), "Low")
+    risk_level = np.where(valid, risk_level, None)
+    return prediction, confidence, risk_level
+
+def _score_chunk(features):
+    return score_features(_SNAPSHOT, features)
+
+def _result_frame(chunk, id_columns, scores):
+    prediction, confidence, risk_level = scores
+    result = chunk[id_columns].reset_index(drop=True) if id_columns else pd.DataFrame(index=range(len(chunk)))
+    predictions = pd.array(prediction, dtype="Int64")
+    predictions[prediction < 0] = pd.NA
+    result["prediction"] = predictions
+    result["confidence"] = confidence
+    result["risk_level"] = risk_level
+    return result
+
+def score_file(snapshot, input_path, output_path, chunk_size=50000, workers=None, id_columns=()):
+    """
+    Stream input_path through the model and write the scores to output_path.
+    Up to 2 * workers chunks are in flight; results are written in input order.
+    Returns (rows scored, rows skipped for missing values).
+    """
+    id_columns = list(id_columns)
+    available = input_columns(input_path)
+    missing = [name for name in FEATURE_NAMES + id_columns if name not in available]
+    if missing:
+        raise SystemExit(f"✗ Input is missing columns: {missing}")
+    
+    workers = os.cpu_count() if workers is None else workers
+    chunks = read_chunks(input_path, chunk_size, FEATURE_NAMES + [c for c in id_columns if c not in FEATURE_NAMES])
+    writer = ChunkWriter(output_path)
+    n_scored = n_skipped = 0
+    
+    def collect(chunk, scores):
+        nonlocal n_scored, n_skipped
+        writer.write(_result_frame(chunk, id_columns, scores))
+        skipped = int((scores[0] < 0).sum())
+        n_scored += len(chunk) - skipped
+        n_skipped += skipped
+    
+    try:
+        if workers <= 1:
+            for chunk in chunks:
+                features = chunk[FEATURE_NAMES].to_numpy(dtype=np.float64)
+                collect(chunk, score_features(snapshot, features))
+            return n_scored, n_skipped
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot,)) as pool:
+            in_flight = deque()
+            for chunk in chunks:
+                features = chunk[FEATURE_NAMES].to_numpy(dtype=np.float64)
+                in_flight.append((chunk, pool.submit(_score_chunk, features)))
+                
+                # Bound memory: wait for the oldest chunk before reading too far ahead
+                if len(in_flight) >= 2 * workers:
+                    oldest, future = in_flight.popleft()
+                    collect(oldest, future.result())
+            
+            while in_flight:
+                oldest, future = in_flight.popleft()
+                collect(oldest, future.result())
+    finally:
+        writer.close()
+    
+    return n_scored, n_skipped
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a large CSV/Parquet/Arrow file of patients offline")
+    parser.add_argument("input", help="Input .csv, .parquet or .arrow with the 13 feature columns")
+    parser.add_argument("output", help="Output .csv, .parquet or .arrow")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count; 1 = inline)")
+    parser.add_argument("--id-column", action="append", default=[], help="Input column to copy to the output (repeatable)")
+    parser.add_argument("--model-version", default="latest", help="Registry version to score with")
+    args = parser.parse_args()
+    
+    print("\n--- Offline Scoring ---")
+    snapshot = load_current_model(args.model_version)
+    if snapshot is None:
+        sys.exit("✗ Could not load a model. Please train and register one first.")
+    print(f"✓ Scoring with model {snapshot.version} ({snapshot.engine_name} engine)")
+    
+    started = time.perf_counter()
+    n_scored, n_skipped = score_file(
+        snapshot, args.input, args.output,
+        chunk_size=args.chunk_size, workers=args.workers, id_columns=args.id_column
+    )
+    elapsed = time.perf_counter() - started
+    
+    print(f"✓ Scored {n_scored} rows in {elapsed:.1f}s ({n_scored / max(elapsed, 1e-9):,.0f} rows/s)")
+    if n_skipped:
+        print(f"⚠ Skipped {n_skipped} rows with missing feature values")
+    print(f"✓ Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
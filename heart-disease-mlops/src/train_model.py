@@ -1,13 +1,52 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold, train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import mlflow
+import mlflow.pyfunc
 import mlflow.sklearn
+from mlflow.tracking import MlflowClient
+import joblib
+import argparse
+import copy
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from columnar import is_scaled, read_columnar
+from drift import REFERENCE_ARTIFACT_PATH, REFERENCE_PATH
+from export_model import (
+    COMPACT_ARTIFACT_PATH, COMPACT_FILENAME, FOLDED_ARTIFACT_PATH,
+    export_compact_model, export_folded_model, folded_pyfunc_kwargs,
+)
+from pipeline_cache import KEY_TAG, PIPELINE_CACHE_ENABLED, find_cached_run, record_cache_hit, stage_key
+import profiling
+from profiling import active_profiler, profiled, stage
+from register_model import register_model
+from run_logger import RunLogger
+
+PROCESSED_COLUMNAR_PATH = 'data/heart_processed.arrow'
+
+EXPERIMENT_NAME = "Heart Disease Prediction"
+MODEL_ARTIFACT_PATH = "random_forest_model"
+REGISTERED_MODEL_NAME = "heart-disease-model"
+
+# Source files whose changes invalidate cached training runs
+TRAIN_CODE = ['train_model.py', 'export_model.py', 'forest_compiler.py', 'columnar.py']
+
+# Hyperparameters tried by --search (every combination for grid, a sample for random)
+SEARCH_SPACE = {
+    "n_estimators": [100, 200],
+    "max_depth": [3, 5, 8, None],
+    "min_samples_leaf": [1, 2, 4],
+    "max_features": ["sqrt", 0.5],
+}
+
+# (X, y, folds) shared by the search worker processes (set once by the pool initializer)
+_SEARCH_DATA = None
 
 # Create dummy data if not exists for demonstration
 def create_dummy_data():
@@ -22,66 +61,454 @@ def create_dummy_data():
         df['target'] = np.random.randint(0, 2, 100)
         df.to_csv('data/heart.csv', index=False)
 
-def train():
+def training_data_path():
+    """
+    The preprocessed data (memory-mapped Arrow, already scaled like the API's
+    inputs) when preprocess.py has been run, otherwise the raw CSV.
+    """
+    if os.path.exists(PROCESSED_COLUMNAR_PATH):
+        return PROCESSED_COLUMNAR_PATH
+    
     create_dummy_data()
+    return 'data/heart.csv'
+
+def load_training_data(path=None):
+    path = path or training_data_path()
+    if path.endswith('.arrow'):
+        print(f"Loading processed data from {path}")
+        return read_columnar(path)
+    return pd.read_csv(path)
+
+def _cached_run(data_path, params, use_cache):
+    """(cache key, run id of an earlier identical run or None) for this data, scaler, code and parameters"""
+    inputs = [data_path] + (["models/scaler.pkl"] if os.path.exists("models/scaler.pkl") else [])
+    cache_key = stage_key("train", inputs=inputs, code=TRAIN_CODE, params=params)
+    if use_cache:
+        cached_run_id = find_cached_run(cache_key, EXPERIMENT_NAME, MODEL_ARTIFACT_PATH)
+        if cached_run_id:
+            hits = record_cache_hit(cached_run_id)
+            print(f"✓ Inputs unchanged, reusing the model from run {cached_run_id} (cache hit #{hits})")
+            return cache_key, cached_run_id
+    return cache_key, None
+
+def _split_data(data_path, test_size):
+    with stage("load"):
+        df = load_training_data(data_path)
+    with stage("split"):
+        X = df.drop('target', axis=1)
+        y = df['target']
+        return train_test_split(X, y, test_size=test_size, random_state=42)
+
+def _fit_forest(X, y, **params):
+    """Fit on all cores, but keep the saved model single-threaded for one-row predictions"""
+    with stage("fit"):
+        clf = RandomForestClassifier(random_state=42, n_jobs=-1, **params)
+        clf.fit(X, y)
+    clf.set_params(n_jobs=None)
+    return clf
+
+def confusion_matrix_figure(cm):
+    """Confusion matrix heatmap as a standalone Figure (no pyplot state, so it can render off the main thread)"""
+    figure = Figure(figsize=(8, 6))
+    ax = figure.subplots()
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax)
+    ax.set_title('Confusion Matrix')
+    ax.set_ylabel('Actual')
+    ax.set_xlabel('Predicted')
+    return figure
+
+def _save_folded_model(clf, scaler, path):
+    mlflow.pyfunc.save_model(path, **folded_pyfunc_kwargs(export_folded_model(clf, scaler)))
+
+def _save_compact_model(clf, path):
+    os.makedirs(path)
+    export_compact_model(clf, os.path.join(path, COMPACT_FILENAME))
+
+def log_trained_model(clf, X_test, y_test, logger):
+    """
+    Log test metrics, the confusion matrix, the model, its compact binary,
+    its folded export and the drift reference of its training features through the
+    run's RunLogger: the metric is buffered, everything else is rendered, saved and
+    uploaded in the background.
+    """
+    # Predict
+    with stage("evaluate"):
+        y_pred = clf.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred)
+        cm = confusion_matrix(y_test, y_pred)
     
-    # Load Data
-    df = pd.read_csv('data/heart.csv')
-    X = df.drop('target', axis=1)
-    y = df['target']
+    # 2. Log Metrics
+    logger.log_metric("accuracy", accuracy)
+    print(f"Model Accuracy: {accuracy}")
+    
+    # 3. Log Artifacts (Plots): rendered to plots/ and uploaded in the background
+    logger.log_figure(lambda: confusion_matrix_figure(cm), "plots/confusion_matrix.png")
+    
+    # 4. Log Model
+    logger.log_model(lambda path: mlflow.sklearn.save_model(clf, path), MODEL_ARTIFACT_PATH)
+    
+    # 5. Log the compact binary (memory-mapped by the API's "compact" engine)
+    logger.log_model(lambda path: _save_compact_model(clf, path), COMPACT_ARTIFACT_PATH)
     
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # 6. Log the scaler-folded model (raw features in, no separate scaler)
+    if os.path.exists("models/scaler.pkl"):
+        scaler = joblib.load("models/scaler.pkl")
+        logger.log_model(lambda path: _save_folded_model(clf, scaler, path), FOLDED_ARTIFACT_PATH)
+    
+    # 7. Log the reference feature distributions the API's drift monitor compares traffic with
+    if os.path.exists(REFERENCE_PATH):
+        logger.log_artifact(REFERENCE_PATH, REFERENCE_ARTIFACT_PATH)
+    
+    return accuracy
+
+def log_profile(run_id):
+    """Print the active stage profile and add it to the run (after its background logging has finished)"""
+    profiler = active_profiler()
+    if profiler is None:
+        return
+    profiler.report()
+    profiler.log_to_mlflow(run_id)
+
+@profiled("train")
+def train(use_cache=PIPELINE_CACHE_ENABLED):
+    """Train and log a model; returns the MLflow run id (an earlier run's if nothing changed)"""
+    n_estimators = 100
+    max_depth = 5
+    test_size = 0.2
+    
+    data_path = training_data_path()
     
     # Set experiment name
-    mlflow.set_experiment("Heart Disease Prediction")
+    mlflow.set_experiment(EXPERIMENT_NAME)
+    
+    # Skip training if a finished run already used the same data, scaler, code and parameters
+    params = {"n_estimators": n_estimators, "max_depth": max_depth, "test_size": test_size, "random_state": 42}
+    with stage("cache"):
+        cache_key, cached_run_id = _cached_run(data_path, params, use_cache)
+    if cached_run_id:
+        return cached_run_id
+    
+    # Load Data
+    X_train, X_test, y_train, y_test = _split_data(data_path, test_size)
     
     # Enable autologging (captures params, metrics, and model artifacts automatically)
     # mlflow.sklearn.autolog() 
     # Note: We are doing manual logging below to demonstrate "how it is done" as requested.
     
-    with mlflow.start_run():
+    with mlflow.start_run() as run, RunLogger(run.info.run_id) as logger:
         print("Starting training run...")
+        logger.set_tag(KEY_TAG, cache_key)
         
         # 1. Log Parameters
-        n_estimators = 100
-        max_depth = 5
-        mlflow.log_param("n_estimators", n_estimators)
-        mlflow.log_param("max_depth", max_depth)
-        mlflow.log_param("test_size", 0.2)
+        logger.log_param("n_estimators", n_estimators)
+        logger.log_param("max_depth", max_depth)
+        logger.log_param("test_size", test_size)
         
-        clf = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42)
-        clf.fit(X_train, y_train)
-        
-        # Predict
-        y_pred = clf.predict(X_test)
-        
-        # 2. Log Metrics
-        accuracy = accuracy_score(y_test, y_pred)
-        mlflow.log_metric("accuracy", accuracy)
-        print(f"Model Accuracy: {accuracy}")
+        clf = _fit_forest(X_train, y_train, n_estimators=n_estimators, max_depth=max_depth)
+        log_trained_model(clf, X_test, y_test, logger)
         
-        # 3. Log Artifacts (Plots)
-        # Generate Confusion Matrix Plot
-        cm = confusion_matrix(y_test, y_pred)
-        plt.figure(figsize=(8, 6))
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
-        plt.title('Confusion Matrix')
-        plt.ylabel('Actual')
-        plt.xlabel('Predicted')
+        print("Run complete. Check MLflow UI for details.")
+    
+    log_profile(run.info.run_id)
+    return run.info.run_id
+
+def candidate_params(mode="grid", n_iter=20, seed=42):
+    """Hyperparameter sets to evaluate: the whole SEARCH_SPACE grid, or n_iter random draws from it"""
+    if mode == "grid":
+        return list(ParameterGrid(SEARCH_SPACE))
+    if mode == "random":
+        return list(ParameterSampler(SEARCH_SPACE, n_iter=n_iter, random_state=seed))
+    raise ValueError(f"Unknown search mode '{mode}' (use 'grid' or 'random')")
+
+def _init_search_worker(X, y, folds):
+    global _SEARCH_DATA
+    _SEARCH_DATA = (X, y, folds)
+
+def _fit_fold(params, fold):
+    """Fit one candidate on one shared fold: (validation accuracy, fit seconds)"""
+    X, y, folds = _SEARCH_DATA
+    train_idx, val_idx = folds[fold]
+    started = time.perf_counter()
+    clf = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+    clf.fit(X[train_idx], y[train_idx])
+    fit_s = time.perf_counter() - started
+    return accuracy_score(y[val_idx], clf.predict(X[val_idx])), fit_s
+
+def evaluate_candidates(candidates, X, y, folds, workers=None):
+    """
+    Cross-validate every candidate on the same folds. Each (candidate, fold)
+    fit is one task on a process pool; X, y and the folds are sent to each
+    worker once, and the largest forests are scheduled first so the last
+    tasks don't leave cores idle.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    tasks = [(i, fold) for i in range(len(candidates)) for fold in range(len(folds))]
+    tasks.sort(key=lambda task: -(candidates[task[0]].get("n_estimators") or 100))
+    task_params = [candidates[i] for i, _ in tasks]
+    task_folds = [fold for _, fold in tasks]
+    
+    if workers <= 1:
+        _init_search_worker(X, y, folds)
+        try:
+            results = list(map(_fit_fold, task_params, task_folds))
+        finally:
+            _init_search_worker(None, None, None)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_search_worker, initargs=(X, y, folds)) as pool:
+            results = list(pool.map(_fit_fold, task_params, task_folds))
+    
+    scores = np.zeros((len(candidates), len(folds)))
+    fit_s = np.zeros((len(candidates), len(folds)))
+    for (i, fold), (score, seconds) in zip(tasks, results):
+        scores[i, fold] = score
+        fit_s[i, fold] = seconds
+    
+    return [
+        {
+            "params": params,
+            "cv_accuracy_mean": float(scores[i].mean()),
+            "cv_accuracy_std": float(scores[i].std()),
+            "fit_time_s": float(fit_s[i].sum()),
+        }
+        for i, params in enumerate(candidates)
+    ]
+
+@profiled("search")
+def search(mode="grid", n_iter=20, n_folds=5, workers=None, use_cache=PIPELINE_CACHE_ENABLED):
+    """
+    Hyperparameter search: k-fold cross-validation of every candidate across a
+    process pool, one nested MLflow run per candidate, then the best candidate
+    refit on the whole training split and logged as the parent run's model.
+    Returns the parent run id.
+    """
+    test_size = 0.2
+    data_path = training_data_path()
+    mlflow.set_experiment(EXPERIMENT_NAME)
+    
+    candidates = candidate_params(mode, n_iter)
+    params = {
+        "search": mode, "space": SEARCH_SPACE, "n_iter": n_iter if mode == "random" else None,
+        "cv_folds": n_folds, "test_size": test_size, "random_state": 42,
+    }
+    with stage("cache"):
+        cache_key, cached_run_id = _cached_run(data_path, params, use_cache)
+    if cached_run_id:
+        return cached_run_id
+    
+    X_train, X_test, y_train, y_test = _split_data(data_path, test_size)
+    
+    # Folds are computed once here and shared by every candidate (and worker)
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42).split(X_train, y_train))
+    workers = os.cpu_count() if workers is None else workers
+    
+    print(f"Searching {len(candidates)} candidates x {n_folds} folds on {workers} worker(s)...")
+    started = time.perf_counter()
+    with stage("cross_validate"):
+        results = evaluate_candidates(candidates, X_train.to_numpy(), y_train.to_numpy(), folds, workers)
+    search_s = time.perf_counter() - started
+    best = max(results, key=lambda result: result["cv_accuracy_mean"])
+    print(f"✓ Search took {search_s:.1f}s, best CV accuracy {best['cv_accuracy_mean']:.4f} with {best['params']}")
+    
+    with mlflow.start_run() as run, RunLogger(run.info.run_id) as logger:
+        logger.set_tag(KEY_TAG, cache_key)
+        logger.set_tag("search_mode", mode)
+        logger.log_params({
+            "search": mode, "n_candidates": len(candidates), "cv_folds": n_folds,
+            "search_workers": workers, "test_size": test_size,
+        })
         
-        # Save plot locally first
-        os.makedirs("plots", exist_ok=True)
-        plot_path = "plots/confusion_matrix.png"
-        plt.savefig(plot_path)
-        plt.close()
+        for i, result in enumerate(results):
+            logger.log_child_run(
+                f"candidate-{i:03d}", result["params"],
+                {k: result[k] for k in ("cv_accuracy_mean", "cv_accuracy_std", "fit_time_s")},
+            )
         
-        # Log the plot artifact to MLflow
-        mlflow.log_artifact(plot_path)
+        # The parent run reads like a plain training run of the winning candidate
+        logger.log_params(best["params"])
+        logger.log_metrics({"cv_accuracy": best["cv_accuracy_mean"], "search_wall_time_s": search_s})
+        clf = _fit_forest(X_train, y_train, **best["params"])
+        log_trained_model(clf, X_test, y_test, logger)
         
-        # 4. Log Model
-        mlflow.sklearn.log_model(clf, "random_forest_model")
+        print("Search complete. Check MLflow UI for the candidate runs.")
+    
+    log_profile(run.info.run_id)
+    return run.info.run_id
+
+def load_registered_model(model_name=REGISTERED_MODEL_NAME, version="latest"):
+    """(model, ModelVersion) of a registry version, the newest one for "latest" """
+    client = MlflowClient()
+    if version == "latest":
+        versions = client.search_model_versions(f"name='{model_name}'", order_by=["version_number DESC"], max_results=1)
+        if not versions:
+            raise ValueError(f"No registered versions of '{model_name}' to continue training from")
+        model_version = versions[0]
+    else:
+        model_version = client.get_model_version(model_name, str(version))
+    
+    model = mlflow.sklearn.load_model(f"models:/{model_name}/{model_version.version}")
+    return model, model_version
+
+def prepare_new_rows(df, scaled=False):
+    """
+    Bring newly arrived rows into the model's feature space: binary target,
+    rows with missing values dropped, then the saved scaler (the parent was
+    trained on scaled features whenever models/scaler.pkl exists) unless
+    the rows are `scaled` already.
+    """
+    df = df.dropna()
+    y = (df['target'] > 0).astype(int)
+    X = df.drop('target', axis=1)
+    if not scaled and os.path.exists("models/scaler.pkl"):
+        scaler = joblib.load("models/scaler.pkl")
+        X = pd.DataFrame(scaler.transform(X), columns=X.columns, index=X.index)
+    return X, y
+
+def load_new_rows(path):
+    """
+    Features and labels for incremental training from raw rows (a CSV like
+    data/heart.csv, or an unscaled Arrow file such as data/heart_clean.arrow)
+    or from preprocess output flagged as scaled (data/heart_processed.arrow),
+    which is not scaled a second time
+    """
+    df = load_training_data(path)
+    scaled = path.endswith('.arrow') and is_scaled(path)
+    if scaled:
+        print(f"✓ {path} is already scaled, using its features as they are")
+    return prepare_new_rows(df, scaled=scaled)
+
+def retire_trees(clf, max_trees, policy="oldest", X_recent=None, y_recent=None, n_new=0):
+    """
+    Drop trees beyond max_trees. "oldest" keeps a sliding window of the most
+    recently added trees; "worst" drops, among all but the n_new newest trees,
+    the ones that score lowest on the recent rows. Returns the number of trees retired.
+    """
+    excess = len(clf.estimators_) - max_trees if max_trees else 0
+    if excess <= 0 or policy == "none":
+        return 0
+    
+    if policy == "oldest":
+        keep = np.arange(excess, len(clf.estimators_))
+    elif policy == "worst":
+        # The newest trees were fit on these rows, so they would always look best
+        n_old = len(clf.estimators_) - n_new
+        X_recent = np.asarray(X_recent, dtype=np.float32)
+        scores = np.array([
+            accuracy_score(y_recent, clf.classes_.take(tree.predict(X_recent).astype(np.intp)))
+            for tree in clf.estimators_[:n_old]
+        ])
+        # Stable sort: among equal scores, the oldest tree goes first
+        retired = set(np.argsort(scores, kind="stable")[:min(excess, n_old)].tolist())
+        keep = np.array([i for i in range(len(clf.estimators_)) if i not in retired])
+    else:
+        raise ValueError(f"Unknown retirement policy '{policy}' (use 'oldest', 'worst' or 'none')")
+    
+    n_retired = len(clf.estimators_) - len(keep)
+    clf.estimators_ = [clf.estimators_[i] for i in keep]
+    clf.n_estimators = len(clf.estimators_)
+    return n_retired
+
+def add_trees(parent, X_new, y_new, n_new_trees, max_trees=None, retire_policy="oldest"):
+    """
+    warm_start the parent forest with n_new_trees fit on the new rows only,
+    then retire trees by the policy. Returns (model, trees retired); the
+    parent object is left untouched.
+    """
+    missing = set(parent.classes_.tolist()) - set(np.unique(y_new).tolist())
+    if missing:
+        raise ValueError(f"New rows lack classes {sorted(missing)}; warm-started trees need every class the model predicts")
+    if list(X_new.columns) != list(parent.feature_names_in_):
+        raise ValueError("New rows don't have the parent model's feature columns")
+    
+    clf = copy.deepcopy(parent)
+    clf.set_params(warm_start=True, n_estimators=len(clf.estimators_) + n_new_trees, n_jobs=-1)
+    clf.fit(X_new, y_new)
+    n_retired = retire_trees(clf, max_trees, retire_policy, X_new, y_new, n_new=n_new_trees)
+    clf.set_params(warm_start=False, n_jobs=None)
+    return clf, n_retired
+
+@profiled("train_incremental")
+def train_incremental(new_data_path, n_new_trees=20, max_trees=None, retire_policy="oldest",
+                      model_name=REGISTERED_MODEL_NAME, parent_version="latest", register=True,
+                      use_cache=PIPELINE_CACHE_ENABLED):
+    """
+    Continue training the registered model on newly arrived rows only: fit
+    n_new_trees on them (20% is held out for the test metrics), retire old
+    trees by policy, and log/register the result as a new version tagged
+    with its parent. Cost grows with the new rows, not the full dataset.
+    Returns the new run id.
+    """
+    mlflow.set_experiment(EXPERIMENT_NAME)
+    with stage("load_parent"):
+        parent, parent_version = load_registered_model(model_name, parent_version)
+    print(f"✓ Continuing from {model_name} v{parent_version.version} ({len(parent.estimators_)} trees, run {parent_version.run_id})")
+    
+    params = {
+        "mode": "incremental", "parent_run_id": parent_version.run_id, "n_new_trees": n_new_trees,
+        "max_trees": max_trees, "retire_policy": retire_policy, "test_size": 0.2, "random_state": 42,
+    }
+    with stage("cache"):
+        cache_key, cached_run_id = _cached_run(new_data_path, params, use_cache)
+    if cached_run_id:
+        return cached_run_id
+    
+    with stage("load"):
+        X, y = load_new_rows(new_data_path)
+    with stage("split"):
+        X_fit, X_test, y_fit, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    
+    with mlflow.start_run() as run, RunLogger(run.info.run_id) as logger:
+        print(f"Adding {n_new_trees} trees fit on {len(X_fit)} new rows...")
+        with stage("fit"):
+            clf, n_retired = add_trees(parent, X_fit, y_fit, n_new_trees, max_trees, retire_policy)
         
-        print("Run complete. Check MLflow UI for details.")
+        logger.set_tags({
+            KEY_TAG: cache_key,
+            "training_mode": "incremental",
+            "lineage.parent_run_id": parent_version.run_id,
+            "lineage.parent_model": f"{model_name}/{parent_version.version}",
+        })
+        logger.log_params({
+            "n_estimators": clf.n_estimators, "max_depth": clf.max_depth, "n_new_trees": n_new_trees,
+            "max_trees": max_trees, "retire_policy": retire_policy, "n_new_rows": len(X),
+        })
+        logger.log_metric("trees_retired", n_retired)
+        log_trained_model(clf, X_test, y_test, logger)
+        print(f"✓ Model now has {clf.n_estimators} trees ({n_retired} retired)")
+    
+    log_profile(run.info.run_id)
+    if register:
+        register_model(run.info.run_id, model_name, MODEL_ARTIFACT_PATH)
+        # The folded export too, as register_model.py does after full training,
+        # so the folded engine and its registry watcher see the new version
+        register_model(run.info.run_id, f"{model_name}-folded", FOLDED_ARTIFACT_PATH)
+    return run.info.run_id
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the heart disease model and log it to MLflow")
+    parser.add_argument("--no-cache", action="store_true", help="Retrain even if nothing changed since a logged run")
+    parser.add_argument("--search", choices=["grid", "random"], help="Cross-validated hyperparameter search instead of the fixed settings")
+    parser.add_argument("--n-iter", type=int, default=20, help="Candidates to sample with --search random")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="Search processes (default: CPU count; 1 = inline)")
+    parser.add_argument("--incremental", metavar="NEW_ROWS", help="Add trees fit on these new labeled rows (raw CSV/Arrow, or data/heart_processed.arrow) to the registered model")
+    parser.add_argument("--new-trees", type=int, default=20)
+    parser.add_argument("--max-trees", type=int, default=None, help="Retire trees beyond this many")
+    parser.add_argument("--retire", choices=["oldest", "worst", "none"], default="oldest")
+    parser.add_argument("--parent-version", default="latest", help="Registry version to continue from")
+    parser.add_argument("--no-register", action="store_true", help="Log the incremental model without registering it")
+    parser.add_argument("--profile", action="store_true", help="Time each stage and add the profile to the run (same as PIPELINE_PROFILE=1)")
+    args = parser.parse_args()
+    
+    if args.profile:
+        profiling.PROFILE_ENABLED = True
+    
+    use_cache = PIPELINE_CACHE_ENABLED and not args.no_cache
+    if args.incremental:
+        train_incremental(
+            args.incremental, n_new_trees=args.new_trees, max_trees=args.max_trees, retire_policy=args.retire,
+            parent_version=args.parent_version, register=not args.no_register, use_cache=use_cache,
+        )
+    elif args.search:
+        search(mode=args.search, n_iter=args.n_iter, n_folds=args.folds, workers=args.workers, use_cache=use_cache)
+    else:
+        train(use_cache=use_cache)
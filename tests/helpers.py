@@ -0,0 +1,52 @@
+"""Shared fixtures for the test suite."""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "heart-disease-mlops")
+
+# Make `api.app` and the `src/` scripts importable from the tests
+for path in (PROJECT_DIR, os.path.join(PROJECT_DIR, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+FEATURE_NAMES = [
+    "age", "sex", "cp", "trestbps", "chol", "fbs", "restecg",
+    "thalach", "exang", "oldpeak", "slope", "ca", "thal",
+]
+
+def make_patients(n_rows=200, seed=0):
+    """Synthetic raw patient features in realistic UCI ranges"""
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        "age": rng.randint(29, 78, n_rows),
+        "sex": rng.randint(0, 2, n_rows),
+        "cp": rng.randint(0, 4, n_rows),
+        "trestbps": rng.randint(94, 200, n_rows),
+        "chol": rng.randint(126, 564, n_rows),
+        "fbs": rng.randint(0, 2, n_rows),
+        "restecg": rng.randint(0, 3, n_rows),
+        "thalach": rng.randint(71, 202, n_rows),
+        "exang": rng.randint(0, 2, n_rows),
+        "oldpeak": np.round(rng.uniform(0, 6.2, n_rows), 1),
+        "slope": rng.randint(0, 3, n_rows),
+        "ca": rng.randint(0, 4, n_rows),
+        "thal": rng.randint(1, 4, n_rows),
+    }, columns=FEATURE_NAMES)
+
+def make_fitted_model(n_rows=200, n_estimators=10, seed=0):
+    """Fit a small scaler + forest the same way the pipeline does"""
+    X = make_patients(n_rows, seed)
+    y = ((X["age"] > 55) & (X["thalach"] < 150) | (X["cp"] == 0)).astype(int)
+    
+    scaler = StandardScaler()
+    X_scaled = pd.DataFrame(scaler.fit_transform(X), columns=FEATURE_NAMES)
+    
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=5, random_state=seed)
+    model.fit(X_scaled, y)
+    return model, scaler, X
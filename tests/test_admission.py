@@ -0,0 +1,118 @@
+import asyncio
+import time
+import unittest
+
+from helpers import make_fitted_model
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.admission import AdmissionController, Overloaded
+
+class TestAdmissionController(unittest.TestCase):
+    def test_caps_in_flight_and_admits_in_order(self):
+        async def scenario():
+            controller = AdmissionController(max_in_flight=2, max_queue=10)
+            running, peak, order = 0, 0, []
+            
+            async def request(i):
+                nonlocal running, peak
+                async with controller.slot(time.perf_counter() + 5):
+                    order.append(i)
+                    running += 1
+                    peak = max(peak, running)
+                    await asyncio.sleep(0.01)
+                    running -= 1
+            
+            await asyncio.gather(*(request(i) for i in range(8)))
+            return controller.stats(), peak, order
+        
+        stats, peak, order = asyncio.run(scenario())
+        self.assertEqual(peak, 2)
+        self.assertEqual(order, list(range(8)))
+        self.assertEqual((stats["admitted"], stats["in_flight"], stats["queued"]), (8, 0, 0))
+        self.assertGreater(stats["max_queue_time_ms"], 0)
+    
+    def test_sheds_when_queue_is_full_and_drops_expired_waiters(self):
+        async def scenario():
+            controller = AdmissionController(max_in_flight=1, max_queue=1)
+            await controller.acquire(time.perf_counter() + 5)
+            
+            # One waiter fits in the queue; the next is rejected at once
+            waiter = asyncio.ensure_future(controller.acquire(time.perf_counter() + 0.05))
+            await asyncio.sleep(0)
+            with self.assertRaises(Overloaded) as full:
+                await controller.acquire(time.perf_counter() + 5)
+            
+            # The queued request's deadline passes before the slot frees up
+            with self.assertRaises(Overloaded) as expired:
+                await waiter
+            
+            # A request that arrives past its deadline is never queued
+            with self.assertRaises(Overloaded):
+                await controller.acquire(time.perf_counter() - 1)
+            
+            controller.release(0.2)
+            await controller.acquire(time.perf_counter() + 5)
+            return controller.stats(), full.exception, expired.exception
+        
+        stats, full, expired = asyncio.run(scenario())
+        self.assertEqual((full.reason, expired.reason), ("queue_full", "deadline"))
+        self.assertGreaterEqual(full.retry_after_s, 1)
+        self.assertEqual(stats["shed"], {"queue_full": 1, "deadline": 2})
+        self.assertEqual((stats["admitted"], stats["in_flight"], stats["queued"]), (2, 1, 0))
+    
+    def test_cancelled_waiter_does_not_leak_a_slot(self):
+        async def scenario():
+            controller = AdmissionController(max_in_flight=1, max_queue=5)
+            await controller.acquire(time.perf_counter() + 5)
+            waiter = asyncio.ensure_future(controller.acquire(time.perf_counter() + 5))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            controller.release()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            return controller.stats()
+        
+        stats = asyncio.run(scenario())
+        self.assertEqual((stats["in_flight"], stats["queued"]), (0, 0))
+
+class TestAdmissionAPI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        model, scaler, cls.patients = make_fitted_model()
+        app_module.install_model(model, scaler, version="test")
+        cls.addClassCleanup(setattr, app_module, "PREDICTION_CACHE", app_module.PREDICTION_CACHE)
+        app_module.PREDICTION_CACHE = None
+        cls.client = TestClient(app_module.app)
+    
+    def setUp(self):
+        previous = app_module.ADMISSION
+        self.addCleanup(setattr, app_module, "ADMISSION", previous)
+        app_module.ADMISSION = AdmissionController(max_in_flight=1, max_queue=0)
+    
+    def test_overload_is_rejected_with_retry_after(self):
+        row = self.patients.iloc[0].to_dict()
+        self.assertEqual(self.client.post("/predict", json=row).status_code, 200)
+        
+        # Another request holds the only slot and there is no queue
+        app_module.ADMISSION.in_flight = 1
+        response = self.client.post("/predict", json=row)
+        self.assertEqual(response.status_code, 503)
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+        response = self.client.post("/predict/batch", json={"patients": [row]})
+        self.assertEqual(response.status_code, 503)
+        app_module.ADMISSION.in_flight = 0
+        
+        # A deadline that has already passed is dropped before inference
+        response = self.client.post("/predict", json=row, headers={"X-Request-Deadline-Ms": "0"})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("deadline", response.json()["detail"])
+        
+        admission = self.client.get("/health").json()["admission"]
+        self.assertEqual(admission["shed"], {"queue_full": 2, "deadline": 1})
+        self.assertEqual(admission["admitted"], 1)
+        self.assertIn('heart_api_shed_total{reason="queue_full"} 2', self.client.get("/metrics").text)
+
+if __name__ == '__main__':
+    unittest.main()
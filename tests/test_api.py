@@ -0,0 +1,90 @@
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from helpers import FEATURE_NAMES, make_fitted_model
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+
+class TestBatchPredict(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model, cls.scaler, cls.patients = make_fitted_model()
+        app_module.install_model(cls.model, cls.scaler, version="test")
+        cls.addClassCleanup(setattr, app_module, "PREDICTION_CACHE", app_module.PREDICTION_CACHE)
+        app_module.PREDICTION_CACHE = None
+        cls.client = TestClient(app_module.app)
+    
+    def patient_rows(self, n):
+        return self.patients.head(n).to_dict(orient="records")
+    
+    def test_single_predict_matches_sklearn(self):
+        rows = self.patient_rows(20)
+        scaled = pd.DataFrame(self.scaler.transform(pd.DataFrame(rows)), columns=FEATURE_NAMES)
+        expected_labels = self.model.predict(scaled)
+        expected_confidence = self.model.predict_proba(scaled).max(axis=1)
+        
+        for row, label, confidence in zip(rows, expected_labels, expected_confidence):
+            body = self.client.post("/predict", json=row).json()
+            self.assertEqual(body["prediction"], label)
+            self.assertEqual(body["confidence"], confidence)
+    
+    def test_feature_name_warning_is_only_silenced_around_scoring(self):
+        snapshot = app_module.ModelSnapshot(self.model, self.scaler, None, "sklearn", "test")
+        features = self.patients.head(5).to_numpy(dtype=np.float64)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            snapshot.score(features)
+        self.assertEqual(caught, [])
+        
+        # Importing the API doesn't install a process-wide filter
+        patterns = [message.pattern for _, message, _, _, _ in warnings.filters if message is not None]
+        self.assertFalse(any("valid feature names" in pattern for pattern in patterns))
+    
+    def test_compiled_engine_in_use(self):
+        self.assertIsNotNone(app_module.SNAPSHOT.engine)
+        self.assertEqual(self.client.get("/model-info").json()["engine"], "compiled")
+    
+    def test_batch_matches_single_predictions(self):
+        rows = self.patient_rows(5)
+        response = self.client.post("/predict/batch", json={"patients": rows})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["n_scored"], 5)
+        
+        for row, result in zip(rows, body["results"]):
+            single = self.client.post("/predict", json=row).json()
+            self.assertEqual(result["prediction"], single["prediction"])
+            self.assertAlmostEqual(result["confidence"], single["confidence"])
+            self.assertEqual(result["risk_level"], single["risk_level"])
+    
+    def test_columnar_form(self):
+        rows = self.patient_rows(4)
+        columns = {name: [row[name] for row in rows] for name in rows[0]}
+        by_rows = self.client.post("/predict/batch", json={"patients": rows}).json()
+        by_columns = self.client.post("/predict/batch", json={"columns": columns}).json()
+        self.assertEqual(by_rows["results"], by_columns["results"])
+    
+    def test_invalid_rows_do_not_fail_batch(self):
+        rows = self.patient_rows(3)
+        rows[1] = dict(rows[1], age="not-a-number")
+        del rows[2]["chol"]
+        body = self.client.post("/predict/batch", json={"patients": rows}).json()
+        
+        self.assertEqual(body["n_scored"], 1)
+        self.assertEqual(body["n_failed"], 2)
+        self.assertIsNone(body["results"][0]["error"])
+        self.assertIn("age", body["results"][1]["error"])
+        self.assertIn("chol", body["results"][2]["error"])
+        self.assertIsNone(body["results"][2]["prediction"])
+    
+    def test_ragged_columns_rejected(self):
+        response = self.client.post("/predict/batch", json={"columns": {"age": [50, 60], "sex": [1]}})
+        self.assertEqual(response.status_code, 422)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+import pyarrow as pa
+
+from helpers import FEATURE_NAMES, PROJECT_DIR, make_fitted_model
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.arrow_io import ARROW_STREAM_MEDIA_TYPE, ArrowSchemaError, decode_table, encode_frame, read_features
+
+class TestArrowPredict(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        model, scaler, cls.patients = make_fitted_model()
+        app_module.install_model(model, scaler, version="test")
+        cls.addClassCleanup(setattr, app_module, "PREDICTION_CACHE", app_module.PREDICTION_CACHE)
+        app_module.PREDICTION_CACHE = None
+        cls.client = TestClient(app_module.app)
+    
+    def post(self, body, content_type=ARROW_STREAM_MEDIA_TYPE):
+        return self.client.post("/predict/arrow", content=body, headers={"Content-Type": content_type})
+    
+    def test_matches_json_batch(self):
+        patients = self.patients.head(50)
+        response = self.post(encode_frame(patients))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], ARROW_STREAM_MEDIA_TYPE)
+        self.assertEqual(response.headers["x-model-version"], "test")
+        table = decode_table(response.content)
+        self.assertEqual(table.schema.metadata[b"model_version"], b"test")
+        
+        expected = self.client.post("/predict/batch", json={"patients": patients.to_dict(orient="records")}).json()
+        self.assertEqual(table.column("prediction").to_pylist(), [r["prediction"] for r in expected["results"]])
+        np.testing.assert_allclose(table.column("confidence").to_numpy(), [r["confidence"] for r in expected["results"]])
+        probability = table.column("probability").to_numpy()
+        prediction = table.column("prediction").to_numpy()
+        np.testing.assert_array_equal(probability > 0.5, prediction == 1)
+        self.assertEqual(table.column("error").null_count, 50)
+    
+    def test_invalid_rows_are_skipped_with_an_error(self):
+        patients = self.patients.head(5).astype({"chol": "float64", "ca": "float64"})
+        patients.loc[1, "chol"] = np.nan
+        patients.loc[2, "age"] = 300
+        patients.loc[3, "ca"] = 1.5
+        table = decode_table(self.post(encode_frame(patients)).content)
+        
+        self.assertEqual(table.column("error").to_pylist(), [
+            None, "chol: missing value", "age: must be between 1 and 120", "ca: must be a whole number", None,
+        ])
+        predictions = table.column("prediction").to_pylist()
+        self.assertEqual([p is None for p in predictions], [False, True, True, True, False])
+    
+    def test_schema_and_media_type_are_checked(self):
+        response = self.post(encode_frame(self.patients.head(3).drop(columns=["thal"])))
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("thal", response.json()["detail"])
+        
+        patients = self.patients.head(3).astype({"sex": "str"})
+        self.assertEqual(self.post(encode_frame(patients)).status_code, 422)
+        self.assertEqual(self.post(b"not arrow").status_code, 422)
+        self.assertEqual(self.post(encode_frame(self.patients.head(3)), "application/json").status_code, 415)
+    
+    def chunked_body(self, n_rows, max_chunksize):
+        table = pa.Table.from_pandas(self.patients.head(n_rows), preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=max_chunksize):
+                writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+    
+    def test_chunked_stream(self):
+        chunked = decode_table(self.post(self.chunked_body(30, 7)).content)
+        whole = decode_table(self.post(encode_frame(self.patients.head(30))).content)
+        self.assertTrue(chunked.equals(whole))
+    
+    def test_row_limit_is_checked_batch_by_batch(self):
+        body = self.chunked_body(21, 7)
+        # Cut into the third batch: reading the whole stream would fail on it
+        truncated = body[:-200]
+        with self.assertRaises(ArrowSchemaError):
+            read_features(truncated, FEATURE_NAMES)
+        with self.assertRaises(OverflowError):
+            read_features(truncated, FEATURE_NAMES, max_rows=10)
+        
+        self.addCleanup(setattr, app_module, "MAX_BATCH_SIZE", app_module.MAX_BATCH_SIZE)
+        app_module.MAX_BATCH_SIZE = 10
+        self.assertEqual(self.post(body).status_code, 413)
+    
+    def test_body_size_limit(self):
+        body = encode_frame(self.patients.head(30))
+        self.addCleanup(setattr, app_module, "MAX_ARROW_BODY_BYTES", app_module.MAX_ARROW_BODY_BYTES)
+        app_module.MAX_ARROW_BODY_BYTES = len(body) - 1
+        
+        # Rejected on the declared Content-Length, and on the bytes received when the body is chunked
+        self.assertEqual(self.post(body).status_code, 413)
+        chunked = self.client.post(
+            "/predict/arrow", content=iter([body[:1000], body[1000:]]),
+            headers={"Content-Type": ARROW_STREAM_MEDIA_TYPE}
+        )
+        self.assertEqual(chunked.status_code, 413)
+        
+        app_module.MAX_ARROW_BODY_BYTES = len(body)
+        self.assertEqual(self.post(body).status_code, 200)
+    
+    def test_importing_the_api_does_not_import_pyarrow(self):
+        code = "import sys, api.app; print('pyarrow' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "False")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from helpers import FEATURE_NAMES, PROJECT_DIR, make_fitted_model, make_patients
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.arrow_io import ARROW_STREAM_MEDIA_TYPE, encode_frame
+from api.audit import AuditLog, audit_files, read_audit_log
+
+sys.path.insert(0, os.path.join(PROJECT_DIR, "benchmarks"))
+
+import load_test
+
+class TestAuditLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.features = make_patients(30, seed=0).to_numpy(dtype=np.float64)
+    
+    def record_rows(self, audit, start, stop):
+        for i in range(start, stop):
+            audit.record("/predict/arrow", "v1", 0.001, self.features[i:i + 1], np.array([i % 2]), np.array([0.5]))
+    
+    def test_full_buffer_drops_by_policy(self):
+        oldest = AuditLog(self.directory, FEATURE_NAMES, max_rows=10)
+        self.record_rows(oldest, 0, 15)
+        self.assertEqual((oldest.stats()["buffered"], oldest.dropped, oldest.logged), (10, 5, 15))
+        oldest.stop()
+        kept = [record["inputs"]["age"] for record in read_audit_log(self.directory)]
+        self.assertEqual(kept, self.features[5:15, 0].tolist())
+        
+        newest = AuditLog(tempfile.mkdtemp(), FEATURE_NAMES, max_rows=10, drop_policy="newest")
+        self.record_rows(newest, 0, 15)
+        newest.stop()
+        kept = [record["inputs"]["age"] for record in read_audit_log(newest.directory)]
+        self.assertEqual(kept, self.features[:10, 0].tolist())
+        
+        with self.assertRaises(ValueError):
+            AuditLog(self.directory, FEATURE_NAMES, drop_policy="random")
+    
+    def test_rotates_by_size_and_reads_back_in_order(self):
+        audit = AuditLog(self.directory, FEATURE_NAMES, rotate_bytes=1000)
+        audit.start()
+        for start in range(0, 30, 5):
+            self.record_rows(audit, start, start + 5)
+            audit.flush()
+        audit.stop()
+        
+        self.assertGreater(len(audit_files(self.directory)), 1)
+        self.assertEqual(audit.stats()["written"], 30)
+        records = list(read_audit_log(self.directory))
+        self.assertEqual([record["inputs"]["chol"] for record in records], self.features[:, 4].tolist())
+        self.assertEqual(records[0]["endpoint"], "/predict/arrow")
+        self.assertEqual(records[0]["latency_ms"], 1.0)
+    
+    def test_arrow_format_round_trip(self):
+        audit = AuditLog(self.directory, FEATURE_NAMES, file_format="arrow")
+        self.record_rows(audit, 0, 10)
+        audit.flush()
+        self.record_rows(audit, 10, 20)
+        audit.stop()
+        
+        (path,) = audit_files(self.directory)
+        self.assertTrue(path.endswith(".arrow"))
+        records = list(read_audit_log(path))
+        self.assertEqual(len(records), 20)
+        np.testing.assert_array_equal(
+            [[record["inputs"][name] for name in FEATURE_NAMES] for record in records], self.features[:20]
+        )
+        self.assertEqual([record["prediction"] for record in records], [i % 2 for i in range(20)])
+    
+    def test_unclosed_arrow_file_is_readable(self):
+        audit = AuditLog(self.directory, FEATURE_NAMES, file_format="arrow")
+        self.record_rows(audit, 0, 10)
+        audit.flush()
+        self.record_rows(audit, 10, 20)
+        audit.flush()
+        
+        # As if the process died before rotating: no close(), then a half-written batch
+        (path,) = audit_files(self.directory)
+        self.assertEqual(len(list(read_audit_log(path))), 20)
+        self.record_rows(audit, 20, 30)
+        audit.flush()
+        os.truncate(path, os.path.getsize(path) - 100)
+        records = list(read_audit_log(self.directory))
+        self.assertEqual([record["inputs"]["age"] for record in records], self.features[:20, 0].tolist())
+        self.assertEqual(len(load_test.load_replay_file(path)), 20)
+        audit.stop()
+
+class TestAuditAPI(unittest.TestCase):
+    def test_predictions_are_logged_and_replayable(self):
+        model, scaler, patients = make_fitted_model()
+        app_module.install_model(model, scaler, version="test")
+        self.addCleanup(setattr, app_module, "PREDICTION_CACHE", app_module.PREDICTION_CACHE)
+        app_module.PREDICTION_CACHE = None
+        previous = app_module.AUDIT_LOG
+        self.addCleanup(setattr, app_module, "AUDIT_LOG", previous)
+        directory = tempfile.mkdtemp()
+        app_module.AUDIT_LOG = AuditLog(directory, FEATURE_NAMES)
+        client = TestClient(app_module.app)
+        
+        rows = patients.head(9).to_dict(orient="records")
+        for row in rows[:3]:
+            self.assertEqual(client.post("/predict", json=row).status_code, 200)
+        batch = client.post("/predict/batch", json={"patients": rows[3:6]}).json()
+        response = client.post(
+            "/predict/arrow", content=encode_frame(patients.iloc[6:9]),
+            headers={"Content-Type": ARROW_STREAM_MEDIA_TYPE}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get("/health").json()["audit_log"]["logged"], 9)
+        app_module.AUDIT_LOG.stop()
+        
+        records = list(read_audit_log(directory))
+        self.assertEqual([record["endpoint"] for record in records], ["/predict"] * 3 + ["/predict/batch"] * 3 + ["/predict/arrow"] * 3)
+        self.assertEqual([record["inputs"]["age"] for record in records], [row["age"] for row in rows])
+        self.assertEqual([record["prediction"] for record in records[3:6]], [r["prediction"] for r in batch["results"]])
+        self.assertTrue(all(record["model_version"] == "test" for record in records))
+        
+        requests = load_test.load_replay_file(directory)
+        self.assertEqual(len(requests), 9)
+        self.assertEqual(requests[0], ("/predict", records[0]["inputs"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+import helpers  # noqa: F401  (puts the project on sys.path)
+
+from api.batching import MicroBatcher
+
+def echo_score(context, features):
+    """Prediction = first feature, confidence = row sum"""
+    return features[:, 0].copy(), features.sum(axis=1)
+
+class TestMicroBatcher(unittest.TestCase):
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+    
+    def test_concurrent_requests_are_coalesced(self):
+        batch_sizes = []
+        
+        def score(context, features):
+            batch_sizes.append(len(features))
+            return echo_score(context, features)
+        
+        async def scenario():
+            batcher = MicroBatcher(score, max_batch_size=16, max_wait_us=20000)
+            await batcher.start()
+            rows = [np.array([float(i), 1.0, 2.0]) for i in range(50)]
+            results = await asyncio.gather(*(batcher.submit(row) for row in rows))
+            stats = batcher.stats()
+            await batcher.stop()
+            return results, stats
+        
+        results, stats = self.run_async(scenario())
+        
+        for i, (prediction, confidence) in enumerate(results):
+            self.assertEqual(prediction, i)
+            self.assertEqual(confidence, i + 3.0)
+        self.assertLessEqual(max(batch_sizes), 16)
+        self.assertLess(len(batch_sizes), 50)
+        self.assertEqual(stats["requests"], 50)
+        self.assertEqual(stats["batches"], len(batch_sizes))
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(sum(stats["batch_size_histogram"].values()), len(batch_sizes))
+    
+    def test_single_request_waits_at_most_max_wait(self):
+        async def scenario():
+            batcher = MicroBatcher(echo_score, max_batch_size=64, max_wait_us=1000)
+            await batcher.start()
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            result = await batcher.submit(np.array([1.0, 2.0]))
+            elapsed = loop.time() - started
+            await batcher.stop()
+            return result, elapsed
+        
+        (prediction, confidence), elapsed = self.run_async(scenario())
+        self.assertEqual((prediction, confidence), (1.0, 3.0))
+        self.assertLess(elapsed, 0.5)
+    
+    def test_scoring_errors_reach_every_caller(self):
+        def broken(context, features):
+            raise ValueError("model exploded")
+        
+        async def scenario():
+            batcher = MicroBatcher(broken, max_batch_size=4, max_wait_us=1000)
+            await batcher.start()
+            results = await asyncio.gather(
+                *(batcher.submit(np.zeros(2)) for _ in range(3)), return_exceptions=True
+            )
+            await batcher.stop()
+            return results
+        
+        for result in self.run_async(scenario()):
+            self.assertIsInstance(result, ValueError)
+    
+    def test_rows_are_only_batched_within_their_context(self):
+        calls = []
+        
+        def score(context, features):
+            calls.append((context, len(features)))
+            return features[:, 0] + context, features.sum(axis=1)
+        
+        async def scenario():
+            batcher = MicroBatcher(score, max_batch_size=64, max_wait_us=20000)
+            await batcher.start()
+            contexts = [100.0 if i % 2 else 200.0 for i in range(10)]
+            results = await asyncio.gather(
+                *(batcher.submit(np.array([float(i)]), context) for i, context in enumerate(contexts))
+            )
+            await batcher.stop()
+            return contexts, results
+        
+        contexts, results = self.run_async(scenario())
+        for i, (context, (prediction, _)) in enumerate(zip(contexts, results)):
+            self.assertEqual(prediction, i + context)
+        self.assertEqual(sorted(calls), [(100.0, 5), (200.0, 5)])
+    
+    def test_submit_requires_running_batcher(self):
+        batcher = MicroBatcher(echo_score)
+        with self.assertRaises(RuntimeError):
+            self.run_async(batcher.submit(np.zeros(2)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from helpers import make_fitted_model
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.cache import PredictionCache
+
+class TestPredictionCache(unittest.TestCase):
+    def test_lru_eviction_order(self):
+        cache = PredictionCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["size"], 2)
+    
+    def test_key_normalizes_ints_and_floats(self):
+        self.assertEqual(
+            PredictionCache.make_key("v1", [63, 1, 2.3]),
+            PredictionCache.make_key("v1", [63.0, 1.0, 2.3])
+        )
+        self.assertNotEqual(
+            PredictionCache.make_key("v1", [63, 1, 2.3]),
+            PredictionCache.make_key("v2", [63, 1, 2.3])
+        )
+
+class TestPredictCaching(unittest.TestCase):
+    def setUp(self):
+        self.model, self.scaler, self.patients = make_fitted_model()
+        app_module.install_model(self.model, self.scaler, version="cache-test")
+        self.addCleanup(setattr, app_module, "PREDICTION_CACHE", app_module.PREDICTION_CACHE)
+        app_module.PREDICTION_CACHE = PredictionCache(100)
+        self.client = TestClient(app_module.app)
+    
+    def cache_stats(self):
+        return self.client.get("/model-info").json()["prediction_cache"]
+    
+    def test_repeat_request_hits_cache(self):
+        row = self.patients.iloc[0].to_dict()
+        first = self.client.post("/predict", json=row).json()
+        second = self.client.post("/predict", json=row).json()
+        
+        self.assertEqual(first, second)
+        stats = self.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        text = self.client.get("/metrics").text
+        self.assertIn("# TYPE heart_api_prediction_cache_lookups_total counter", text)
+        self.assertIn('heart_api_prediction_cache_lookups_total{result="hit"} 1', text)
+        self.assertIn('heart_api_prediction_cache_lookups_total{result="miss"} 1', text)
+    
+    def test_model_version_change_misses(self):
+        row = self.patients.iloc[0].to_dict()
+        self.client.post("/predict", json=row)
+        app_module.install_model(self.model, self.scaler, version="cache-test-2")
+        body = self.client.post("/predict", json=row).json()
+        
+        self.assertEqual(body["model_version"], "cache-test-2")
+        self.assertEqual(self.cache_stats()["misses"], 2)
+    
+    def test_models_sharing_a_version_do_not_share_entries(self):
+        rows = self.patients.head(20).to_dict(orient="records")
+        app_module.install_model(self.model, self.scaler)
+        for row in rows:
+            self.client.post("/predict", json=row)
+        
+        # A different model served under the same "manual" version
+        other_model, other_scaler, _ = make_fitted_model(n_estimators=3, seed=1)
+        snapshot = app_module.install_model(other_model, other_scaler)
+        features = self.patients.head(20).to_numpy(dtype=float)
+        predictions, confidences = snapshot.score(features)
+        
+        for row, prediction, confidence in zip(rows, predictions, confidences):
+            body = self.client.post("/predict", json=row).json()
+            self.assertEqual(body["model_version"], "manual")
+            self.assertEqual(body["prediction"], int(prediction))
+            self.assertAlmostEqual(body["confidence"], float(confidence))
+        self.assertEqual(self.cache_stats()["hits"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
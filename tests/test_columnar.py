@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from helpers import make_patients
+
+import preprocess
+from columnar import is_scaled, iter_batches, read_columnar, read_table, write_columnar
+
+class TestColumnarFormat(unittest.TestCase):
+    def test_round_trip_with_explicit_dtypes(self):
+        df = make_patients(300, seed=3)
+        df["target"] = np.random.RandomState(3).randint(0, 2, size=len(df))
+        df["thal"] = df["thal"].astype(float)
+        df.loc[5, "ca"] = np.nan
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "heart.arrow")
+            schema = write_columnar(df, path, float_columns=["age"])
+            loaded = read_columnar(path)
+            batches = list(iter_batches(path, 128, columns=["sex", "chol"]))
+        
+        self.assertEqual(schema.field("sex").type, pa.int8())
+        self.assertEqual(schema.field("thal").type, pa.int8())
+        self.assertEqual(schema.field("target").type, pa.int8())
+        self.assertEqual(schema.field("chol").type, pa.float32())
+        # Missing values and explicitly float columns stay float32
+        self.assertEqual(schema.field("ca").type, pa.float32())
+        self.assertEqual(schema.field("age").type, pa.float32())
+        
+        self.assertEqual(list(loaded.columns), list(df.columns))
+        self.assertEqual(loaded["cp"].dtype, np.int8)
+        self.assertEqual(loaded["oldpeak"].dtype, np.float32)
+        np.testing.assert_array_equal(loaded["cp"], df["cp"])
+        np.testing.assert_allclose(loaded["oldpeak"], df["oldpeak"], rtol=1e-6)
+        self.assertTrue(np.isnan(loaded.loc[5, "ca"]))
+        
+        self.assertEqual([len(b) for b in batches], [128, 128, 44])
+        self.assertEqual(list(batches[0].columns), ["sex", "chol"])
+        np.testing.assert_array_equal(pd.concat(batches)["chol"], df["chol"])
+    
+    def test_reads_are_memory_mapped(self):
+        df = make_patients(1000, seed=4)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "heart.arrow")
+            write_columnar(df, path)
+            allocated = pa.total_allocated_bytes()
+            table = read_table(path)
+            
+            # The column buffers point into the mapped file instead of being read into memory
+            self.assertEqual(table.num_rows, 1000)
+            self.assertLess(pa.total_allocated_bytes() - allocated, table.nbytes // 10)
+            del table
+
+class TestPreprocessColumnarOutput(unittest.TestCase):
+    def test_streaming_and_batch_write_the_same_columnar_data(self):
+        df = make_patients(400, seed=5)
+        df["target"] = np.random.RandomState(5).randint(0, 5, size=len(df))
+        df.loc[::13, "chol"] = np.nan
+        df.loc[::19, "ca"] = np.nan
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                os.makedirs("data")
+                df.to_csv("data/heart.csv", index=False)
+                preprocess.preprocess_pipeline()
+                batch_clean = read_columnar(preprocess.CLEAN_COLUMNAR_PATH)
+                batch_processed = read_columnar(preprocess.PROCESSED_COLUMNAR_PATH)
+                
+                preprocess.preprocess_streaming(
+                    "data/heart.csv", "streamed.csv", chunk_size=64,
+                    columnar_path="streamed.arrow", clean_columnar_path="streamed_clean.arrow"
+                )
+                streamed_clean = read_columnar("streamed_clean.arrow")
+                streamed_processed = read_columnar("streamed.arrow")
+                scaled_flags = [is_scaled(path) for path in (
+                    preprocess.CLEAN_COLUMNAR_PATH, preprocess.PROCESSED_COLUMNAR_PATH,
+                    "streamed_clean.arrow", "streamed.arrow",
+                )]
+            finally:
+                os.chdir(cwd)
+        
+        self.assertEqual(dict(batch_clean.dtypes), dict(streamed_clean.dtypes))
+        self.assertEqual(batch_clean["sex"].dtype, np.int8)
+        self.assertEqual(batch_clean["target"].dtype, np.int8)
+        self.assertEqual(batch_clean["chol"].dtype, np.float32)
+        pd.testing.assert_frame_equal(batch_clean, streamed_clean)
+        
+        self.assertEqual(batch_processed["target"].dtype, np.int8)
+        self.assertTrue((batch_processed.drop(columns="target").dtypes == np.float32).all())
+        pd.testing.assert_frame_equal(batch_processed, streamed_processed, rtol=1e-6)
+        # Only the scaled outputs are flagged, so incremental training won't scale them again
+        self.assertEqual(scaled_flags, [False, True, False, True])
+
+if __name__ == '__main__':
+    unittest.main()
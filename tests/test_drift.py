@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+
+from helpers import FEATURE_NAMES, make_fitted_model, make_patients
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.drift_monitor import DriftMonitor
+from drift import feature_reference, ks_statistic, psi, psi_groups, reference_profile
+
+def live_counts(reference, values):
+    edges = np.asarray(reference["edges"])
+    return np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+
+class TestReference(unittest.TestCase):
+    def test_categorical_feature_gets_a_bin_per_value(self):
+        reference = feature_reference([0, 1, 1, 2, 1, 0, np.nan])
+        self.assertEqual(reference["n"], 6)
+        self.assertEqual(reference["counts"], [0, 2, 3, 1, 0])
+        self.assertEqual((reference["quantiles"][0], reference["quantiles"][50], reference["quantiles"][-1]), (0, 1, 2))
+        # Same as listing each distinct value with its count
+        self.assertEqual(feature_reference([2, 0, 1], [1, 2, 3]), reference)
+    
+    def test_psi_and_ks_separate_shifted_traffic(self):
+        rng = np.random.RandomState(0)
+        reference = feature_reference(rng.normal(size=5000))
+        groups = psi_groups(reference["counts"])
+        self.assertEqual(groups.max(), 11)
+        
+        same = live_counts(reference, rng.normal(size=2000))
+        shifted = live_counts(reference, rng.normal(0.5, 1.0, size=2000))
+        self.assertLess(psi(reference["counts"], same, groups), 0.02)
+        self.assertGreater(psi(reference["counts"], shifted, groups), 0.2)
+        self.assertLess(ks_statistic(reference["counts"], same), 0.05)
+        self.assertGreater(ks_statistic(reference["counts"], shifted), 0.15)
+
+class TestDriftMonitor(unittest.TestCase):
+    def setUp(self):
+        self.reference = reference_profile(make_patients(2000, seed=0))
+    
+    def test_single_rows_and_batches_count_alike(self):
+        patients = make_patients(300, seed=1).to_numpy(dtype=np.float64)
+        one_by_one = DriftMonitor(self.reference, FEATURE_NAMES)
+        for row in patients:
+            one_by_one.observe(row)
+        batched = DriftMonitor(self.reference, FEATURE_NAMES)
+        batched.observe_many(patients)
+        np.testing.assert_array_equal(one_by_one.totals(), batched.totals())
+        self.assertEqual(one_by_one.totals().sum(), 300 * len(FEATURE_NAMES))
+    
+    def test_report_flags_drifted_features_within_the_window(self):
+        monitor = DriftMonitor(self.reference, FEATURE_NAMES, window=2, min_samples=100)
+        self.assertEqual(monitor.compute()["status"], "insufficient_data")
+        
+        monitor.observe_many(make_patients(1000, seed=1).to_numpy(dtype=np.float64))
+        report = monitor.compute()
+        self.assertEqual(report["status"], "stable")
+        self.assertEqual(report["features"]["age"]["n"], 1000)
+        
+        # Older patients only: age drifts, and ages past the training range are counted
+        drifted = make_patients(1000, seed=2)
+        drifted["age"] += 15
+        monitor.observe_many(drifted.to_numpy(dtype=np.float64))
+        report = monitor.compute()
+        self.assertEqual(report["drifted_features"], ["age"])
+        self.assertGreater(report["features"]["age"]["out_of_range"], 0)
+        self.assertEqual(report["features"]["age"]["n"], 2000)
+        
+        # Two intervals later the stable traffic has left the window
+        monitor.compute()
+        self.assertEqual(monitor.compute()["features"]["age"]["n"], 0)
+
+class TestDriftAPI(unittest.TestCase):
+    def test_drift_endpoint(self):
+        model, scaler, patients = make_fitted_model()
+        app_module.install_model(model, scaler, version="test")
+        previous = app_module.DRIFT_MONITOR
+        self.addCleanup(setattr, app_module, "DRIFT_MONITOR", previous)
+        app_module.DRIFT_MONITOR = DriftMonitor(reference_profile(patients), FEATURE_NAMES, min_samples=5)
+        client = TestClient(app_module.app)
+        
+        self.assertEqual(client.get("/drift").json()["status"], "pending")
+        rows = patients.head(10).to_dict(orient="records")
+        for row in rows[:5]:
+            self.assertEqual(client.post("/predict", json=row).status_code, 200)
+        self.assertEqual(client.post("/predict/batch", json={"patients": rows[5:]}).status_code, 200)
+        
+        app_module.DRIFT_MONITOR.compute()
+        body = client.get("/drift").json()
+        self.assertTrue(body["enabled"])
+        self.assertEqual(body["features"]["chol"]["n"], 10)
+        self.assertIn(body["status"], ("stable", "warning", "drift"))
+        
+        app_module.DRIFT_MONITOR = None
+        self.assertEqual(client.get("/drift").json(), {"enabled": False})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from helpers import make_fitted_model
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.experiments import ShadowScorer, TrafficSplit, VersionStats, parse_candidates
+
+class Arm:
+    def __init__(self, version):
+        self.version = version
+
+class TestTrafficSplit(unittest.TestCase):
+    def test_hash_routing_is_stable_and_weighted(self):
+        served, candidate = Arm("served"), Arm("candidate")
+        split = TrafficSplit([(candidate, 0.2)], routing="hash")
+        keys = [f"client-{i}".encode() for i in range(5000)]
+        
+        arms = [split.choose(served, key).version for key in keys]
+        self.assertEqual(arms, [split.choose(served, key).version for key in keys])
+        self.assertAlmostEqual(arms.count("candidate") / len(keys), 0.2, delta=0.03)
+        
+        # Weight routing ignores the key
+        split = TrafficSplit([(candidate, 0.2)], routing="weight")
+        self.assertGreater(len({split.choose(served, b"same").version for _ in range(200)}), 1)
+    
+    def test_invalid_settings(self):
+        self.assertEqual(parse_candidates("7:0.1, 8:0.05"), [("7", 0.1), ("8", 0.05)])
+        with self.assertRaises(ValueError):
+            parse_candidates("7")
+        with self.assertRaises(ValueError):
+            TrafficSplit([(Arm("a"), 0.6), (Arm("b"), 0.6)])
+        with self.assertRaises(ValueError):
+            TrafficSplit([(Arm("a"), 0.1)], routing="sticky")
+
+class TestShadowScorer(unittest.TestCase):
+    def test_counts_agreement_and_drops_past_the_limit(self):
+        model, scaler, patients = make_fitted_model()
+        snapshot = app_module.build_snapshot(model, scaler, "shadow")
+        features = patients.to_numpy(dtype=np.float64)
+        served_predictions, served_confidences = snapshot.score(features.copy())
+        flipped = 1 - served_predictions
+        
+        shadow = ShadowScorer(snapshot, max_rows=150)
+        shadow.submit("same", features[:100], served_predictions[:100], served_confidences[:100])
+        shadow.submit("flipped", features[100:150], flipped[100:150], served_confidences[100:150])
+        shadow.submit("late", features[150:], served_predictions[150:], served_confidences[150:])
+        self.assertEqual(shadow.flush(), 150)
+        
+        stats = shadow.stats()
+        self.assertEqual((stats["scored"], stats["dropped"], stats["batches"]), (150, 50, 1))
+        self.assertEqual(stats["agreement"]["same"]["agreement_rate"], 1.0)
+        self.assertEqual(stats["agreement"]["same"]["mean_confidence_difference"], 0.0)
+        self.assertEqual(stats["agreement"]["flipped"]["agreement_rate"], 0.0)
+        self.assertNotIn("late", stats["agreement"])
+    
+    def test_version_stats(self):
+        stats = VersionStats()
+        stats.observe("v1", 1000, 1, 1, 0.9)
+        stats.observe("v1", 3000, 3, 1, 2.1)
+        summary = stats.summary()["v1"]
+        self.assertEqual((summary["requests"], summary["rows"]), (2, 4))
+        self.assertEqual((summary["positive_rate"], summary["mean_confidence"]), (0.5, 0.75))
+
+class TestExperimentAPI(unittest.TestCase):
+    def setUp(self):
+        model, scaler, self.patients = make_fitted_model()
+        app_module.install_model(model, scaler, version="test")
+        self.addCleanup(setattr, app_module, "PREDICTION_CACHE", app_module.PREDICTION_CACHE)
+        app_module.PREDICTION_CACHE = None
+        candidate_model, candidate_scaler, _ = make_fitted_model(n_estimators=3, seed=1)
+        self.candidate = app_module.build_snapshot(candidate_model, candidate_scaler, "candidate")
+        self.addCleanup(app_module.install_experiment)
+        self.client = TestClient(app_module.app)
+    
+    def test_split_and_shadow(self):
+        app_module.install_experiment([(self.candidate, 0.5)], shadow=self.candidate, routing="hash")
+        rows = self.patients.head(40).to_dict(orient="records")
+        
+        versions = []
+        for i, row in enumerate(rows):
+            headers = {"X-Routing-Key": f"user-{i}"}
+            response = self.client.post("/predict", json=row, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            versions.append(response.json()["model_version"])
+            # The same key stays on its arm
+            self.assertEqual(self.client.post("/predict", json=row, headers=headers).json()["model_version"], versions[-1])
+        self.assertEqual(set(versions), {"test", "candidate"})
+        batch = self.client.post("/predict/batch", json={"patients": rows[:10]}, headers={"X-Routing-Key": "user-0"})
+        self.assertEqual(batch.json()["model_version"], versions[0])
+        
+        app_module.SHADOW.flush()
+        body = self.client.get("/experiment").json()
+        self.assertTrue(body["enabled"])
+        self.assertEqual(body["split"]["served_weight"], 0.5)
+        agreement = body["shadow"]["agreement"]
+        self.assertEqual(sum(version["rows"] for version in agreement.values()), 90)
+        # The shadow is the candidate itself, so it agrees with every candidate-served row
+        self.assertEqual(agreement["candidate"]["agreement_rate"], 1.0)
+        self.assertGreaterEqual(body["versions"]["candidate"]["requests"], 2 * versions.count("candidate"))
+        text = self.client.get("/metrics").text
+        self.assertIn("heart_api_shadow_agreements_total", text)
+        self.assertIn("# TYPE heart_api_shadow_dropped_total counter", text)
+        self.assertIn('heart_api_shadow_dropped_total{shadow_version="candidate"} 0', text)
+        
+        with mock.patch.object(app_module, "ADMIN_TOKEN", "test-token"):
+            stopped = self.client.delete("/admin/experiment", headers={"X-Admin-Token": "test-token"})
+        self.assertEqual(stopped.json()["status"], "stopped")
+        self.assertIsNone(app_module.SHADOW)
+        self.assertEqual(self.client.post("/predict", json=rows[0]).json()["model_version"], "test")
+
+if __name__ == '__main__':
+    unittest.main()
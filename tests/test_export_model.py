@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from helpers import FEATURE_NAMES, make_fitted_model, make_patients
+
+from fastapi.testclient import TestClient
+
+from forest_compiler import CompiledForest, compile_forest
+from export_model import export_compact_model, export_folded_model, fold_scaler, raw_probe_matrix, verify_folded
+
+import api.app as app_module
+
+class TestScalerFolding(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model, cls.scaler, cls.patients = make_fitted_model(n_estimators=25)
+        cls.folded = fold_scaler(compile_forest(cls.model), cls.scaler)
+    
+    def scaled_predict_proba(self, raw):
+        scaled = pd.DataFrame(self.scaler.transform(pd.DataFrame(raw, columns=FEATURE_NAMES)), columns=FEATURE_NAMES)
+        return self.model.predict_proba(scaled)
+    
+    def test_no_train_serve_skew_on_patients(self):
+        raw = make_patients(500, seed=7).values
+        np.testing.assert_array_equal(self.folded.predict_proba(raw), self.scaled_predict_proba(raw))
+    
+    def test_no_skew_on_threshold_boundaries(self):
+        raw = raw_probe_matrix(self.folded, self.scaler, seed=2)
+        np.testing.assert_array_equal(self.folded.predict_proba(raw), self.scaled_predict_proba(raw))
+        self.assertTrue(verify_folded(self.model, self.scaler, self.folded, raw))
+    
+    def test_export_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = export_folded_model(self.model, self.scaler, os.path.join(tmp, "model_folded.npz"))
+            loaded = CompiledForest.load(path)
+        
+        raw = self.patients.values
+        np.testing.assert_array_equal(loaded.predict_proba(raw), self.folded.predict_proba(raw))
+        self.assertEqual(loaded.threshold.dtype, np.float64)
+    
+    def test_api_serves_folded_model_without_scaler(self):
+        client = TestClient(app_module.app)
+        rows = self.patients.head(10).to_dict(orient="records")
+        
+        app_module.install_model(self.model, self.scaler, version="scaled-test")
+        scaled = client.post("/predict/batch", json={"patients": rows}).json()
+        
+        app_module.install_model(self.folded, version="folded-test", folded=True)
+        self.assertIsNone(app_module.SNAPSHOT.scaler)
+        self.assertEqual(client.get("/model-info").json()["engine"], "folded")
+        folded = client.post("/predict/batch", json={"patients": rows}).json()
+        
+        self.assertEqual(scaled["results"], folded["results"])
+    
+    def test_api_serves_compact_model_from_local_file(self):
+        client = TestClient(app_module.app)
+        rows = self.patients.head(10).to_dict(orient="records")
+        app_module.install_model(self.model, self.scaler, version="scaled-test")
+        scaled = client.post("/predict/batch", json={"patients": rows}).json()
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            self.addCleanup(os.chdir, cwd)
+            export_compact_model(self.model)
+            with mock.patch.object(app_module, "MODEL_ENGINE", "compact"), \
+                    mock.patch.object(app_module, "_load_compact_artifact", side_effect=LookupError("no runs")), \
+                    mock.patch.object(app_module, "_latest_registry_version", return_value=None), \
+                    mock.patch.object(app_module, "load_scaler_from_file", return_value=self.scaler):
+                snapshot = app_module.load_current_model()
+        app_module.install_snapshot(snapshot)
+        
+        self.assertEqual(snapshot.version, "compact-local")
+        self.assertIsNotNone(snapshot.model.mapped_path)
+        self.assertEqual(client.get("/model-info").json()["engine"], "compact")
+        compact = client.post("/predict/batch", json={"patients": rows}).json()
+        self.assertEqual(scaled["results"], compact["results"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from helpers import make_fitted_model
+
+from src.forest_compiler import CompiledForest, compile_forest, float32_floor, probe_matrix, verify_compiled
+
+class TestForestCompiler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model, cls.scaler, cls.patients = make_fitted_model(n_estimators=25)
+        cls.compiled = compile_forest(cls.model)
+    
+    def test_matches_sklearn_exactly(self):
+        X = self.scaler.transform(self.patients.values)
+        np.testing.assert_array_equal(self.compiled.predict_proba(X), self.model.predict_proba(X))
+        np.testing.assert_array_equal(self.compiled.predict(X), self.model.predict(X))
+    
+    def test_matches_on_threshold_boundaries(self):
+        self.assertTrue(verify_compiled(self.model, self.compiled, probe_matrix(self.compiled, seed=1)))
+    
+    def test_large_batch_spans_blocks(self):
+        X = np.random.RandomState(3).normal(size=(1000, self.compiled.n_features_in_))
+        self.assertTrue(verify_compiled(self.model, self.compiled, X))
+    
+    def test_float32_floor_keeps_comparisons(self):
+        thresholds = np.array([0.1, -2.5, 1e-8, 3.0000001])
+        floored = float32_floor(thresholds)
+        self.assertTrue(np.all(floored.astype(np.float64) <= thresholds))
+        candidates = np.nextafter(floored, np.float32(np.inf))
+        self.assertTrue(np.all((candidates <= thresholds) == (candidates <= floored)))
+    
+    def test_rejects_non_forest_models(self):
+        X = self.scaler.transform(self.patients.values)
+        model = LogisticRegression().fit(X, self.model.predict(X))
+        with self.assertRaises(TypeError):
+            compile_forest(model)
+    
+    def test_binary_round_trip_is_compact_and_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.forest")
+            self.compiled.save_binary(path)
+            self.compiled.save(os.path.join(tmp, "model.npz"))
+            self.assertLess(os.path.getsize(path), os.path.getsize(os.path.join(tmp, "model.npz")))
+            
+            loaded = CompiledForest.load(path)
+            self.assertEqual(loaded.mapped_path, os.path.abspath(path))
+            self.assertEqual(loaded.feature.dtype, np.uint8)
+            self.assertEqual(loaded.left.dtype, np.uint16)
+            self.assertEqual(loaded.threshold.dtype, np.float32)
+            self.assertFalse(loaded.value.flags.writeable)
+            self.assertTrue(verify_compiled(self.model, loaded))
+            np.testing.assert_array_equal(loaded.classes_, self.compiled.classes_)
+            
+            # Pickling sends the path, and the copy maps the same file
+            copy = pickle.loads(pickle.dumps(loaded))
+            self.assertEqual(copy.mapped_path, loaded.mapped_path)
+            self.assertTrue(verify_compiled(self.model, copy))
+            
+            in_memory = CompiledForest.load_binary(path, mmap=False)
+            self.assertIsNone(in_memory.mapped_path)
+            self.assertTrue(verify_compiled(self.model, in_memory))
+    
+    def test_load_binary_rejects_other_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.npz")
+            self.compiled.save(path)
+            with self.assertRaises(ValueError):
+                CompiledForest.load_binary(path)
+    
+    def test_rejects_wrong_width(self):
+        with self.assertRaises(ValueError):
+            self.compiled.predict_proba(np.zeros((2, 3)))
+
+if __name__ == '__main__':
+    unittest.main()
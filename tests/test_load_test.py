@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import httpx
+
+from helpers import PROJECT_DIR, make_fitted_model
+
+import api.app as app_module
+
+sys.path.insert(0, os.path.join(PROJECT_DIR, "benchmarks"))
+
+import load_test
+
+class TestLoadTestHarness(unittest.TestCase):
+    def setUp(self):
+        model, scaler, _ = make_fitted_model()
+        app_module.install_model(model, scaler, version="load-test")
+        self.addCleanup(setattr, app_module, "PREDICTION_CACHE", app_module.PREDICTION_CACHE)
+        app_module.PREDICTION_CACHE = None
+    
+    def run_requests(self, requests, concurrency=4):
+        async def scenario():
+            transport = httpx.ASGITransport(app=app_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await load_test.run_load(client, requests, concurrency)
+        return asyncio.run(scenario())
+    
+    def test_synthetic_mix_is_reproducible_and_served(self):
+        requests = load_test.synthesize_requests(40, batch_fraction=0.25, batch_size=4, seed=3)
+        self.assertEqual(requests, load_test.synthesize_requests(40, batch_fraction=0.25, batch_size=4, seed=3))
+        
+        samples, wall_s = self.run_requests(requests)
+        results = load_test.summarize(samples, wall_s)
+        
+        self.assertEqual(results["overall"]["requests"], 40)
+        self.assertEqual(results["overall"]["errors"], 0)
+        self.assertEqual(set(results["endpoints"]), {"/predict", "/predict/batch"})
+        self.assertIn("p99", results["overall"]["latency_ms"])
+    
+    def test_replay_file_formats(self):
+        patient = load_test.synthesize_requests(1)[0][1]
+        lines = [patient, {"patients": [patient]}, {"path": "/predict", "body": patient}]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write("\n".join(json.dumps(line) for line in lines) + "\n")
+        try:
+            requests = load_test.load_replay_file(f.name)
+        finally:
+            os.unlink(f.name)
+        
+        self.assertEqual([path for path, _ in requests], ["/predict", "/predict/batch", "/predict"])
+    
+    def test_compare_reports_ratios(self):
+        def fake(rps, p50):
+            latency = {f"p{p}": p50 * (1 + p / 100) for p in load_test.PERCENTILES}
+            stats = {"throughput_rps": rps, "latency_ms": latency}
+            return {"overall": stats, "endpoints": {"/predict": stats}}
+        
+        changes = load_test.compare_results(fake(100.0, 10.0), fake(200.0, 5.0))
+        self.assertEqual(changes["overall throughput_rps"], (100.0, 200.0, 2.0))
+        self.assertEqual(changes["/predict p50_ms"][2], 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import threading
+import unittest
+
+from helpers import make_fitted_model
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.metrics import ErrorCounter, LatencyHistogram
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_quantiles_fall_in_the_right_bucket(self):
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.observe_ns(1_500)
+        for _ in range(10):
+            histogram.observe_ns(3_000_000)
+        
+        counts, sum_ns = histogram.totals()
+        self.assertEqual(sum(counts), 100)
+        self.assertEqual(sum_ns, 90 * 1_500 + 10 * 3_000_000)
+        self.assertTrue(1_024e-9 <= LatencyHistogram.quantile(counts, 0.5) <= 2_048e-9)
+        self.assertTrue(2_097_152e-9 <= LatencyHistogram.quantile(counts, 0.99) <= 4_194_304e-9)
+        self.assertIsNone(LatencyHistogram.quantile([0] * len(counts), 0.5))
+    
+    def test_threads_record_into_separate_shards(self):
+        histogram = LatencyHistogram()
+        errors = ErrorCounter()
+        
+        def work():
+            for _ in range(1000):
+                histogram.observe_ns(100)
+                errors.inc("/predict", "ValueError")
+        
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(sum(histogram.totals()[0]), 4000)
+        self.assertEqual(errors.totals(), {("/predict", "ValueError"): 4000})
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        model, scaler, self.patients = make_fitted_model()
+        app_module.install_model(model, scaler, version="metrics-test")
+        self.addCleanup(setattr, app_module, "PREDICTION_CACHE", app_module.PREDICTION_CACHE)
+        app_module.PREDICTION_CACHE = None
+        self.client = TestClient(app_module.app)
+    
+    def test_exposes_stage_latencies_and_errors(self):
+        self.client.post("/predict", json=self.patients.iloc[0].to_dict())
+        self.client.post("/predict/batch", json={"patients": [self.patients.iloc[1].to_dict(), {"age": "x"}]})
+        self.assertEqual(self.client.post("/predict", json={"age": 1}).status_code, 422)
+        
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        
+        text = response.text
+        for stage in app_module.STAGES:
+            self.assertIn(f'heart_api_stage_latency_seconds_count{{endpoint="/predict",stage="{stage}"}}', text)
+            self.assertIn(f'endpoint="/predict/batch",stage="{stage}",quantile="0.99"', text)
+        self.assertIn('heart_api_errors_total{endpoint="/predict",type="RequestValidationError"}', text)
+        self.assertIn('heart_api_errors_total{endpoint="/predict/batch",type="ValidationError"}', text)
+        self.assertIn('heart_api_model_info{version="metrics-test",engine="compiled"} 1', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from helpers import PROJECT_DIR, make_fitted_model
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.model_cache import ResolvedModelCache
+from src.forest_compiler import compile_forest
+
+class TestResolvedModelCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResolvedModelCache(self.tmp.name)
+        self.model, self.scaler, self.patients = make_fitted_model()
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_round_trip(self):
+        self.cache.store(self.model, "sklearn", "registry-v3", "models:/heart-disease-model/3", 3)
+        model, manifest = self.cache.load("sklearn")
+        
+        X = self.scaler.transform(self.patients)
+        np.testing.assert_array_equal(model.predict_proba(X), self.model.predict_proba(X))
+        self.assertEqual((manifest["version"], manifest["registry_version"]), ("registry-v3", 3))
+    
+    def test_folded_round_trip(self):
+        compiled = compile_forest(self.model)
+        self.cache.store(compiled, "folded", "folded-local", "models/model_folded.npz")
+        model, _ = self.cache.load("folded")
+        self.assertIsNone(self.cache.load("sklearn"))
+        
+        X = np.asarray(self.scaler.transform(self.patients))
+        np.testing.assert_array_equal(model.predict_proba(X), compiled.predict_proba(X))
+    
+    def test_compact_round_trip(self):
+        compiled = compile_forest(self.model)
+        self.cache.store(compiled, "compact", "compact-local", "models/model.forest")
+        model, _ = self.cache.load("compact")
+        
+        self.assertEqual(model.mapped_path, os.path.join(os.path.abspath(self.tmp.name), "model.forest"))
+        X = np.asarray(self.scaler.transform(self.patients))
+        np.testing.assert_array_equal(model.predict_proba(X), compiled.predict_proba(X))
+    
+    def test_hash_mismatch_is_a_miss(self):
+        self.cache.store(self.model, "sklearn", "local-pickle", "models/model.pkl")
+        with open(os.path.join(self.tmp.name, "model.pkl"), "ab") as f:
+            f.write(b"tampered")
+        self.assertIsNone(self.cache.load("sklearn"))
+    
+    def test_missing_manifest_is_a_miss(self):
+        self.assertIsNone(self.cache.load("sklearn"))
+
+class TestFastStart(unittest.TestCase):
+    def test_startup_serves_cached_model_and_reports_phases(self):
+        model, scaler, patients = make_fitted_model()
+        with tempfile.TemporaryDirectory() as tmp:
+            ResolvedModelCache(tmp).store(model, "sklearn", "registry-v7", "models:/heart-disease-model/7", 7)
+            with mock.patch.multiple(app_module, FAST_START=True, MODEL_CACHE_DIR=tmp, STARTUP_PHASES={}), \
+                    mock.patch.object(app_module, "load_scaler_from_file", return_value=scaler), \
+                    mock.patch.object(app_module, "_refresh_from_registry"), \
+                    mock.patch.object(app_module, "load_current_model") as resolve:
+                with TestClient(app_module.app) as client:
+                    health = client.get("/health").json()
+                    body = client.post("/predict", json=patients.iloc[0].to_dict()).json()
+        
+        resolve.assert_not_called()
+        self.assertEqual(health["model_version"], "registry-v7")
+        self.assertEqual(health["startup_mode"], "fast")
+        self.assertIn("model_cache", health["startup_phases_s"])
+        self.assertIn("total", health["startup_phases_s"])
+        self.assertEqual(body["model_version"], "registry-v7")
+    
+    def test_importing_the_api_does_not_import_mlflow(self):
+        code = "import sys, api.app; print('mlflow' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "False")
+
+if __name__ == '__main__':
+    unittest.main()
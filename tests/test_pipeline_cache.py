@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from helpers import make_patients
+
+import preprocess
+import pipeline_cache
+from pipeline_cache import StageCache, find_cached_run, record_cache_hit, stage_key
+
+class InTempDir(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+    
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+class TestStageKey(InTempDir):
+    def test_key_changes_with_data_code_and_params(self):
+        with open("data.csv", "w") as f:
+            f.write("a,b\n1,2\n")
+        key = stage_key("train", inputs=["data.csv"], code=["preprocess.py"], params={"n": 1})
+        
+        self.assertEqual(key, stage_key("train", inputs=["data.csv"], code=["preprocess.py"], params={"n": 1}))
+        self.assertNotEqual(key, stage_key("train", inputs=["data.csv"], code=["preprocess.py"], params={"n": 2}))
+        self.assertNotEqual(key, stage_key("train", inputs=["data.csv"], code=["columnar.py"], params={"n": 1}))
+        
+        with open("data.csv", "a") as f:
+            f.write("3,4\n")
+        self.assertNotEqual(key, stage_key("train", inputs=["data.csv"], code=["preprocess.py"], params={"n": 1}))
+    
+    def test_missing_input_is_reported(self):
+        with self.assertRaises(FileNotFoundError):
+            stage_key("preprocess", inputs=["data/heart.csv"])
+
+class TestStageCache(InTempDir):
+    def test_store_and_restore(self):
+        os.makedirs("out")
+        with open("out/result.txt", "w") as f:
+            f.write("processed")
+        cache = StageCache("cache")
+        
+        self.assertIsNone(cache.restore("stage", "k1"))
+        cache.store("stage", "k1", ["out/result.txt"], info={"rows": 1})
+        os.remove("out/result.txt")
+        
+        manifest = cache.restore("stage", "k1")
+        self.assertEqual(manifest["info"], {"rows": 1})
+        with open("out/result.txt") as f:
+            self.assertEqual(f.read(), "processed")
+    
+    def test_damaged_entry_is_a_miss(self):
+        with open("result.txt", "w") as f:
+            f.write("processed")
+        cache = StageCache("cache")
+        manifest = cache.store("stage", "k1", ["result.txt"])
+        
+        with open(os.path.join(cache.entry_dir("stage", "k1"), manifest["outputs"][0]["file"]), "w") as f:
+            f.write("truncated")
+        self.assertIsNone(cache.restore("stage", "k1"))
+
+class TestCachedPreprocess(InTempDir):
+    def test_second_run_restores_outputs_without_reprocessing(self):
+        os.makedirs("data")
+        df = make_patients(120, seed=6)
+        df["target"] = np.random.RandomState(6).randint(0, 2, size=len(df))
+        df.to_csv("data/heart.csv", index=False)
+        cache = StageCache("cache")
+        
+        self.assertFalse(preprocess.cached_preprocess(cache=cache))
+        with open("models/scaler.pkl", "rb") as f:
+            scaler_bytes = f.read()
+        for path in preprocess.PREPROCESS_OUTPUTS:
+            os.remove(path)
+        
+        with mock.patch.object(preprocess, "preprocess_pipeline") as pipeline:
+            self.assertTrue(preprocess.cached_preprocess(cache=cache))
+        pipeline.assert_not_called()
+        with open("models/scaler.pkl", "rb") as f:
+            self.assertEqual(f.read(), scaler_bytes)
+        self.assertTrue(all(os.path.exists(path) for path in preprocess.PREPROCESS_OUTPUTS))
+        
+        # Changed data reruns the stage
+        df.iloc[:60].to_csv("data/heart.csv", index=False)
+        with mock.patch.object(preprocess, "preprocess_pipeline") as pipeline, \
+                mock.patch.object(StageCache, "store"):
+            self.assertFalse(preprocess.cached_preprocess(cache=cache))
+        pipeline.assert_called_once()
+
+class TestCachedTrainingRun(InTempDir):
+    def test_finds_tagged_run_and_records_hits(self):
+        import mlflow
+        
+        mlflow.set_tracking_uri(f"sqlite:///{os.path.join(self._tmp.name, 'mlflow.db')}")
+        self.addCleanup(mlflow.set_tracking_uri, None)
+        mlflow.set_experiment("cache-test")
+        
+        with open("model.txt", "w") as f:
+            f.write("model")
+        with mlflow.start_run() as run:
+            mlflow.set_tag(pipeline_cache.KEY_TAG, "abc")
+            mlflow.log_artifact("model.txt", artifact_path="model")
+        with mlflow.start_run():
+            mlflow.set_tag(pipeline_cache.KEY_TAG, "no-model")
+        
+        self.assertEqual(find_cached_run("abc", "cache-test", "model"), run.info.run_id)
+        self.assertIsNone(find_cached_run("other", "cache-test", "model"))
+        self.assertIsNone(find_cached_run("no-model", "cache-test", "model"))
+        
+        self.assertEqual(record_cache_hit(run.info.run_id), 1)
+        self.assertEqual(record_cache_hit(run.info.run_id), 2)
+        tags = mlflow.get_run(run.info.run_id).data.tags
+        self.assertEqual(tags[pipeline_cache.HITS_TAG], "2")
+        self.assertIn(pipeline_cache.LAST_HIT_TAG, tags)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import urllib.request
+
+import joblib
+
+from helpers import PROJECT_DIR, make_fitted_model
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return {int(child) for child in f.read().split()}
+
+@unittest.skipUnless(os.path.exists(f"/proc/{os.getpid()}/task/{os.getpid()}/children"), "needs Linux /proc")
+class TestPreforkServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        os.makedirs(os.path.join(self.tmp.name, "models"))
+        model, scaler, self.patients = make_fitted_model()
+        joblib.dump(model, os.path.join(self.tmp.name, "models", "model.pkl"))
+        joblib.dump(scaler, os.path.join(self.tmp.name, "models", "scaler.pkl"))
+        
+        self.port = _free_port()
+        env = dict(
+            os.environ,
+            PYTHONPATH=PROJECT_DIR,
+            MLFLOW_TRACKING_URI=f"sqlite:///{os.path.join(self.tmp.name, 'mlflow.db')}",
+            GRACEFUL_TIMEOUT_S="5",
+            ADMIN_TOKEN="test-token",
+        )
+        self.log = open(os.path.join(self.tmp.name, "server.log"), "w")
+        self.addCleanup(self.log.close)
+        self.server = subprocess.Popen(
+            [sys.executable, "-m", "api.prefork", "--workers", "2", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"],
+            cwd=self.tmp.name, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        self.addCleanup(self._stop)
+    
+    def _stop(self):
+        if self.server.poll() is None:
+            self.server.kill()
+            self.server.wait()
+    
+    def call(self, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}{path}", data=data, headers={"Content-Type": "application/json", "X-Admin-Token": "test-token"}
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    
+    def wait_for(self, condition, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                result = condition()
+                if result:
+                    return result
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.fail(f"Timed out; server log:\n{open(self.log.name).read()}")
+    
+    def test_workers_share_the_model_reload_and_restart(self):
+        workers = self.wait_for(lambda: len(_children(self.server.pid)) == 2 and _children(self.server.pid))
+        status, health = self.wait_for(lambda: self.call("/health"))
+        info = health["prefork_worker"]
+        self.assertIn(info["pid"], workers)
+        self.assertEqual((info["supervisor_pid"], info["generation"]), (self.server.pid, 1))
+        self.assertEqual(health["model_version"], "local-pickle")
+        
+        status, body = self.call("/predict", self.patients.iloc[0].to_dict())
+        self.assertEqual((status, body["model_version"]), (200, "local-pickle"))
+        
+        # Per-worker stats say which worker they cover
+        with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/metrics", timeout=10) as response:
+            metrics = response.read().decode()
+        self.assertRegex(metrics, r'heart_api_stage_latency_seconds_count\{[^}]*worker="\d+"[^}]*\}')
+        self.assertIn(self.call("/experiment")[1]["prefork_worker"], workers)
+        
+        # A reload asked of one worker replaces every worker with a new generation
+        status, body = self.call("/admin/reload", {})
+        self.assertEqual((status, body["status"]), (202, "reload requested"))
+        self.wait_for(lambda: self.call("/health")[1]["prefork_worker"]["generation"] == 2)
+        generation_2 = self.wait_for(lambda: len(_children(self.server.pid)) == 2 and _children(self.server.pid))
+        self.assertFalse(generation_2 & workers)
+        
+        # A crashed worker is replaced
+        crashed = min(generation_2)
+        os.kill(crashed, signal.SIGKILL)
+        replaced = self.wait_for(
+            lambda: len(_children(self.server.pid)) == 2 and crashed not in _children(self.server.pid)
+            and _children(self.server.pid)
+        )
+        self.assertEqual(len(replaced - generation_2), 1)
+        self.assertEqual(self.call("/health")[0], 200)
+        
+        self.server.send_signal(signal.SIGTERM)
+        self.assertEqual(self.server.wait(timeout=30), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from helpers import make_patients
+
+import preprocess
+from drift import load_reference
+from preprocess import StreamingColumnStats, preprocess_streaming
+
+class TestStreamingColumnStats(unittest.TestCase):
+    def test_exact_median_and_moments_match_pandas(self):
+        rng = np.random.RandomState(0)
+        values = pd.Series(rng.randint(0, 50, size=1001).astype(float))
+        values[::7] = np.nan
+        
+        stats = StreamingColumnStats()
+        for start in range(0, len(values), 128):
+            stats.update(values[start:start + 128].to_numpy())
+        
+        self.assertTrue(stats.exact)
+        self.assertEqual(stats.median(), values.median())
+        self.assertEqual(stats.n_missing, int(values.isna().sum()))
+        
+        filled = values.fillna(values.median())
+        count, mean, var = stats.imputed_moments(values.median())
+        self.assertEqual(count, len(filled))
+        self.assertAlmostEqual(mean, filled.mean(), places=10)
+        self.assertAlmostEqual(var, filled.var(ddof=0), places=8)
+    
+    def test_falls_back_to_sampled_median(self):
+        values = np.random.RandomState(1).normal(size=20000)
+        with mock.patch.multiple(preprocess, MAX_EXACT_DISTINCT=100, MEDIAN_SAMPLE_SIZE=5000):
+            stats = StreamingColumnStats()
+            for chunk in np.array_split(values, 13):
+                stats.update(chunk)
+            
+            self.assertFalse(stats.exact)
+            self.assertAlmostEqual(stats.median(), np.median(values), delta=0.05)
+
+class TestStreamingPreprocess(unittest.TestCase):
+    def test_matches_in_memory_pipeline(self):
+        df = make_patients(500, seed=2)
+        df["target"] = np.random.RandomState(2).randint(0, 5, size=len(df))
+        df.loc[::11, "chol"] = np.nan
+        df.loc[::17, "thalach"] = np.nan
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                df.to_csv("heart.csv", index=False)
+                streamed_scaler = preprocess_streaming("heart.csv", "streamed.csv", chunk_size=64)
+                streamed = pd.read_csv("streamed.csv")
+                streamed_reference = load_reference()
+                
+                batch = preprocess.handle_missing_values(pd.read_csv("heart.csv"))
+                batch = preprocess.encode_features(batch)
+                batch, batch_scaler = preprocess.scale_features(batch)
+                batch_reference = load_reference()
+            finally:
+                os.chdir(cwd)
+        
+        np.testing.assert_allclose(streamed_scaler.mean_, batch_scaler.mean_, rtol=1e-12)
+        np.testing.assert_allclose(streamed_scaler.scale_, batch_scaler.scale_, rtol=1e-10)
+        self.assertEqual(list(streamed_scaler.feature_names_in_), list(batch_scaler.feature_names_in_))
+        self.assertEqual(list(streamed.columns), list(batch.columns))
+        np.testing.assert_allclose(streamed.to_numpy(), batch.to_numpy(dtype=float), rtol=1e-9, atol=1e-12)
+        # Both drift references describe the imputed, unscaled features
+        self.assertEqual(streamed_reference, batch_reference)
+        self.assertEqual(list(batch_reference["features"]), list(batch_scaler.feature_names_in_))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from helpers import PROJECT_DIR  # noqa: F401  (puts src/ on sys.path)
+
+import profiling
+from profiling import StageProfiler, active_profiler, profiled, stage
+
+class TestStageProfiler(unittest.TestCase):
+    def test_nested_stages_are_recorded_by_path(self):
+        with StageProfiler("train") as profiler:
+            with stage("load"):
+                pass
+            for _ in range(3):
+                with stage("fit"), stage("tree"):
+                    sum(range(10000))
+        
+        summary = profiler.summary()
+        self.assertEqual(list(summary), ["load", "fit", "fit/tree"])
+        self.assertEqual(summary["fit"]["calls"], 3)
+        self.assertGreaterEqual(summary["fit"]["wall_s"], summary["fit/tree"]["wall_s"])
+        self.assertGreater(summary["fit"]["peak_rss_mb"], 0)
+        self.assertIsNone(summary["fit"]["py_peak_mb"])
+        
+        metrics = profiler.metrics()
+        self.assertIn("profile/fit/tree/cpu_s", metrics)
+        self.assertNotIn("profile/fit/py_peak_mb", metrics)
+    
+    def test_stages_outside_a_profiler_are_not_recorded(self):
+        with stage("load"):
+            self.assertIsNone(active_profiler())
+        with StageProfiler("outer") as profiler:
+            self.assertIs(active_profiler(), profiler)
+        self.assertIsNone(active_profiler())
+        self.assertEqual(profiler.records, [])
+    
+    def test_tracemalloc_peaks_propagate_to_the_parent(self):
+        with StageProfiler("preprocess", trace_memory=True) as profiler:
+            with stage("encode"):
+                with stage("allocate"):
+                    block = bytearray(8 << 20)
+                del block
+                with stage("small"):
+                    pass
+        
+        summary = profiler.summary()
+        self.assertGreaterEqual(summary["encode/allocate"]["py_peak_mb"], 8)
+        self.assertLess(summary["encode/small"]["py_peak_mb"], 1)
+        self.assertGreaterEqual(summary["encode"]["py_peak_mb"], 8)
+    
+    def test_trace_and_folded_stacks(self):
+        with StageProfiler("train") as profiler:
+            with stage("fit"):
+                with stage("tree"):
+                    pass
+            worker = threading.Thread(target=self._plot_stage)
+            worker.start()
+            worker.join()
+        
+        trace = json.loads(json.dumps(profiler.chrome_trace()))
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(sorted(e["name"] for e in events), ["fit", "plot", "tree"])
+        self.assertEqual(len({e["tid"] for e in events}), 2)
+        self.assertTrue(all(e["dur"] >= 0 and e["ts"] >= 0 for e in events))
+        
+        folded = dict(line.rsplit(" ", 1) for line in profiler.folded_stacks().splitlines())
+        self.assertEqual(set(folded), {"fit", "fit;tree", "plot"})
+        self.assertTrue(all(int(us) >= 0 for us in folded.values()))
+    
+    def _plot_stage(self):
+        with stage("plot"):
+            pass
+    
+    def test_profiled_starts_a_profiler_only_at_the_top(self):
+        self.addCleanup(setattr, profiling, "PROFILE_ENABLED", profiling.PROFILE_ENABLED)
+        profiling.PROFILE_ENABLED = True
+        seen = []
+        
+        @profiled("inner")
+        def inner():
+            seen.append(active_profiler())
+        
+        @profiled("outer")
+        def outer():
+            inner()
+            return active_profiler()
+        
+        profiler = outer()
+        self.assertIs(seen[0], profiler)
+        self.assertEqual([r["path"] for r in profiler.records], ["outer/inner", "outer"])
+        self.assertIsNone(active_profiler())
+    
+    def test_profiled_is_off_by_default(self):
+        self.assertFalse(profiling.PROFILE_ENABLED)
+        
+        @profiled("train")
+        def train():
+            return active_profiler()
+        
+        self.assertIsNone(train())
+
+class TestProfileLogging(unittest.TestCase):
+    def test_metrics_and_trace_are_logged_to_the_run(self):
+        import mlflow
+        from mlflow.tracking import MlflowClient
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            self.addCleanup(os.chdir, cwd)
+            mlflow.set_tracking_uri(f"sqlite:///{os.path.join(tmp, 'mlflow.db')}")
+            self.addCleanup(mlflow.set_tracking_uri, None)
+            mlflow.set_experiment("profiling-test")
+            
+            with StageProfiler("train") as profiler, stage("fit"):
+                pass
+            with mlflow.start_run() as run:
+                pass
+            profiler.log_to_mlflow(run.info.run_id)
+            
+            client = MlflowClient()
+            metrics = client.get_run(run.info.run_id).data.metrics
+            artifacts = {f.path for f in client.list_artifacts(run.info.run_id, "profile")}
+            trace = mlflow.artifacts.load_dict(f"{run.info.artifact_uri}/{profiling.TRACE_ARTIFACT}")
+        
+        self.assertEqual(set(metrics), {"profile/fit/wall_s", "profile/fit/cpu_s", "profile/fit/peak_rss_mb"})
+        self.assertEqual(artifacts, {profiling.TRACE_ARTIFACT, profiling.FOLDED_ARTIFACT})
+        self.assertEqual(trace["traceEvents"][0]["name"], "fit")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import joblib
+
+import numpy as np
+
+from helpers import make_fitted_model
+
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.reloader import RegistryWatcher
+
+class TestHotReload(unittest.TestCase):
+    def setUp(self):
+        self.model, self.scaler, self.patients = make_fitted_model()
+        self.other_model, _, _ = make_fitted_model(n_estimators=5, seed=1)
+        app_module.PREVIOUS_SNAPSHOT = None
+        app_module.install_model(self.model, self.scaler, version="registry-v1")
+        app_module.PREVIOUS_SNAPSHOT = None
+        self.addCleanup(setattr, app_module, "PREDICTION_CACHE", app_module.PREDICTION_CACHE)
+        app_module.PREDICTION_CACHE = None
+        patcher = mock.patch.object(app_module, "ADMIN_TOKEN", "test-token")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(app_module.app, headers={"X-Admin-Token": "test-token"})
+        self.row = self.patients.iloc[0].to_dict()
+    
+    def new_snapshot(self, registry_version="latest"):
+        return app_module.build_snapshot(
+            self.other_model, self.scaler, "registry-v2", "models:/heart-disease-model/2", 2
+        )
+    
+    def test_reload_swaps_snapshot_and_rollback_restores_it(self):
+        with mock.patch.object(app_module, "load_current_model", self.new_snapshot):
+            response = self.client.post("/admin/reload", json={"version": "2"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post("/predict", json=self.row).json()["model_version"], "registry-v2")
+        self.assertEqual(self.client.get("/model-info").json()["previous_model"]["version"], "registry-v1")
+        
+        response = self.client.post("/admin/rollback")
+        self.assertEqual(response.json()["model"]["version"], "registry-v1")
+        self.assertEqual(self.client.post("/predict", json=self.row).json()["model_version"], "registry-v1")
+    
+    def test_failed_reload_keeps_serving_current_model(self):
+        with mock.patch.object(app_module, "load_current_model", return_value=None):
+            response = self.client.post("/admin/reload", json={"version": "99"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/health").json()["model_version"], "registry-v1")
+    
+    def test_rollback_without_previous_model(self):
+        self.assertEqual(self.client.post("/admin/rollback").status_code, 409)
+    
+    def test_admin_token_is_enforced(self):
+        anonymous = TestClient(app_module.app)
+        with mock.patch.object(app_module, "ADMIN_TOKEN", "secret"):
+            self.assertEqual(anonymous.post("/admin/rollback").status_code, 403)
+            self.assertEqual(self.client.post("/admin/rollback").status_code, 403)
+            response = self.client.post("/admin/rollback", headers={"X-Admin-Token": "secret"})
+        self.assertEqual(response.status_code, 409)
+    
+    def test_admin_endpoints_are_disabled_without_a_token(self):
+        with mock.patch.object(app_module, "ADMIN_TOKEN", None):
+            for method, path in (("post", "/admin/reload"), ("post", "/admin/rollback"), ("delete", "/admin/experiment")):
+                response = getattr(self.client, method)(path)
+                self.assertEqual(response.status_code, 403)
+                self.assertIn("ADMIN_TOKEN", response.json()["detail"])
+        self.assertEqual(self.client.get("/health").json()["model_version"], "registry-v1")
+    
+    def test_in_flight_snapshot_is_unaffected_by_swap(self):
+        snapshot = app_module.SNAPSHOT
+        features = app_module._patient_row(app_module.PatientData(**self.row))
+        expected = snapshot.score(features.copy())
+        
+        app_module.install_snapshot(self.new_snapshot())
+        np.testing.assert_array_equal(snapshot.score(features.copy()), expected)
+        self.assertEqual(app_module.SNAPSHOT.version, "registry-v2")
+
+class TestModelResolution(unittest.TestCase):
+    def test_broken_latest_version_falls_back_but_a_requested_one_does_not(self):
+        model, _, _ = make_fitted_model()
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            self.addCleanup(os.chdir, cwd)
+            os.makedirs("models")
+            joblib.dump(model, "models/model.pkl")
+            with mock.patch.object(app_module, "_latest_registry_version", return_value=3), \
+                    mock.patch("mlflow.sklearn.load_model", side_effect=OSError("corrupt artifact")), \
+                    mock.patch("mlflow.set_experiment"), \
+                    mock.patch("mlflow.search_runs", side_effect=LookupError("no runs")):
+                latest = app_module.load_model_from_mlflow("latest")
+                requested = app_module.load_model_from_mlflow("3")
+        
+        self.assertEqual(latest[1:], ("local-pickle", "models/model.pkl", None))
+        self.assertIsNone(requested)
+
+class TestRegistryWatcher(unittest.TestCase):
+    def test_reloads_only_when_version_changes(self):
+        served = {"version": 1}
+        latest = {"version": 1}
+        
+        def reload(version):
+            served["version"] = version
+            return version
+        
+        watcher = RegistryWatcher(lambda: latest["version"], lambda: served["version"], reload)
+        self.assertFalse(watcher.poll_once())
+        
+        latest["version"] = 2
+        self.assertTrue(watcher.poll_once())
+        self.assertEqual(served["version"], 2)
+        self.assertFalse(watcher.poll_once())
+        self.assertEqual((watcher.stats()["polls"], watcher.stats()["reloads"]), (3, 1))
+    
+    def test_failed_reload_is_not_counted(self):
+        watcher = RegistryWatcher(lambda: 2, lambda: 1, lambda version: None)
+        self.assertFalse(watcher.poll_once())
+        self.assertEqual((watcher.stats()["reloads"], watcher.stats()["failed_reloads"]), (0, 1))
+    
+    def test_rollback_is_not_undone_by_the_next_poll(self):
+        model, scaler, _ = make_fitted_model()
+        
+        def snapshot(registry_version):
+            return app_module.build_snapshot(
+                model, scaler, f"registry-v{registry_version}", "test", int(registry_version)
+            )
+        
+        app_module.install_snapshot(snapshot(2))
+        latest = {"version": 3}
+        
+        def reload(version):
+            with mock.patch.object(app_module, "load_current_model", snapshot):
+                return app_module.reload_model(version)
+        
+        watcher = RegistryWatcher(lambda: latest["version"], app_module._served_registry_version, reload)
+        self.assertTrue(watcher.poll_once())
+        self.assertEqual(app_module.SNAPSHOT.version, "registry-v3")
+        
+        app_module.rollback_model()
+        self.assertEqual(app_module.SNAPSHOT.version, "registry-v2")
+        self.assertFalse(watcher.poll_once())
+        self.assertEqual(app_module.SNAPSHOT.version, "registry-v2")
+        
+        # A newly registered version is still picked up
+        latest["version"] = 4
+        self.assertTrue(watcher.poll_once())
+        self.assertEqual(app_module.SNAPSHOT.version, "registry-v4")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from helpers import PROJECT_DIR  # noqa: F401  (puts src/ on sys.path)
+
+import mlflow
+from mlflow.tracking import MlflowClient
+
+from run_logger import RunLogger
+from train_model import confusion_matrix_figure
+
+class TestRunLogger(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        mlflow.set_tracking_uri(f"sqlite:///{os.path.join(self._tmp.name, 'mlflow.db')}")
+        mlflow.set_experiment("run-logger-test")
+        self.client = MlflowClient()
+    
+    def tearDown(self):
+        mlflow.set_tracking_uri(None)
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+    
+    def test_buffers_values_into_batches(self):
+        with mlflow.start_run() as run, RunLogger(run.info.run_id) as logger:
+            logger.log_params({f"p{i}": i for i in range(150)})
+            logger.log_param("n_estimators", 100)
+            logger.set_tag("stage", "train")
+            for step in range(5):
+                logger.log_metric("loss", 1.0 / (step + 1), step=step)
+            
+            # Nothing has been sent yet
+            self.assertEqual(self.client.get_run(run.info.run_id).data.params, {})
+        
+        data = self.client.get_run(run.info.run_id).data
+        self.assertEqual(len(data.params), 151)
+        self.assertEqual(data.params["n_estimators"], "100")
+        self.assertEqual(data.tags["stage"], "train")
+        self.assertEqual(len(self.client.get_metric_history(run.info.run_id, "loss")), 5)
+        # Everything, timings included, goes out at the end: 151 params need two batches
+        self.assertEqual(logger.round_trips, 2)
+        self.assertEqual(data.metrics["logging_round_trips"], 2)
+        for name in ("tracking", "plotting", "model_save", "upload", "wait"):
+            self.assertIn(f"logging_{name}_s", data.metrics)
+    
+    def test_artifacts_and_models_are_logged_in_the_background(self):
+        main_thread = threading.current_thread()
+        save_threads = []
+        
+        def save_model(path):
+            save_threads.append(threading.current_thread())
+            os.makedirs(path)
+            with open(os.path.join(path, "MLmodel"), "w") as f:
+                f.write("flavors: {}\n")
+        
+        with mlflow.start_run() as run, RunLogger(run.info.run_id) as logger:
+            logger.log_figure(lambda: confusion_matrix_figure([[5, 1], [2, 7]]), "plots/confusion_matrix.png")
+            logger.log_model(save_model, "random_forest_model")
+        
+        self.assertTrue(os.path.exists("plots/confusion_matrix.png"))
+        artifacts = {f.path for f in self.client.list_artifacts(run.info.run_id)}
+        self.assertEqual(artifacts, {"confusion_matrix.png", "random_forest_model"})
+        self.assertEqual(
+            [f.path for f in self.client.list_artifacts(run.info.run_id, "random_forest_model")],
+            ["random_forest_model/MLmodel"],
+        )
+        self.assertNotEqual(save_threads, [main_thread])
+        self.assertGreater(logger.timings["plotting"], 0)
+        self.assertGreater(logger.timings["upload"], 0)
+    
+    def test_child_runs_are_nested_and_finished(self):
+        with mlflow.start_run() as run, RunLogger(run.info.run_id) as logger:
+            future = logger.log_child_run("candidate-000", {"max_depth": 5}, {"cv_accuracy_mean": 0.8})
+        child = self.client.get_run(future.result())
+        
+        self.assertEqual(child.data.tags["mlflow.parentRunId"], run.info.run_id)
+        self.assertEqual(child.info.run_name, "candidate-000")
+        self.assertEqual(child.info.status, "FINISHED")
+        self.assertEqual(child.data.params, {"max_depth": "5"})
+        self.assertEqual(child.data.metrics, {"cv_accuracy_mean": 0.8})
+    
+    def test_background_errors_fail_the_run_after_flushing(self):
+        def broken_save(path):
+            raise RuntimeError("disk full")
+        
+        with self.assertRaises(RuntimeError):
+            with mlflow.start_run() as run, RunLogger(run.info.run_id) as logger:
+                logger.log_param("n_estimators", 100)
+                logger.log_model(broken_save, "random_forest_model")
+        
+        finished = self.client.get_run(run.info.run_id)
+        self.assertEqual(finished.info.status, "FAILED")
+        self.assertEqual(finished.data.params, {"n_estimators": "100"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from pyarrow import feather
+
+from helpers import FEATURE_NAMES, make_fitted_model
+
+import api.app as app_module
+from score_offline import score_file
+
+class TestOfflineScoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        model, scaler, patients = make_fitted_model()
+        cls.snapshot = app_module.build_snapshot(model, scaler, "offline-test")
+        cls.patients = patients.copy()
+        cls.patients.insert(0, "patient_id", np.arange(len(patients)) + 1000)
+        cls.patients.loc[3, "chol"] = np.nan
+        
+        scored = patients.drop(index=3)
+        scaled = pd.DataFrame(scaler.transform(scored), columns=FEATURE_NAMES)
+        cls.expected_labels = model.predict(scaled)
+        cls.expected_confidence = model.predict_proba(scaled).max(axis=1)
+    
+    def score(self, extension, workers):
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, f"in{extension}")
+            output_path = os.path.join(tmp, f"out{extension}")
+            if extension == ".csv":
+                self.patients.to_csv(input_path, index=False)
+            elif extension == ".arrow":
+                feather.write_feather(self.patients, input_path, compression="uncompressed")
+            else:
+                self.patients.to_parquet(input_path, index=False)
+            
+            counts = score_file(
+                self.snapshot, input_path, output_path,
+                chunk_size=37, workers=workers, id_columns=["patient_id"]
+            )
+            if extension == ".csv":
+                result = pd.read_csv(output_path, float_precision="round_trip")
+            elif extension == ".arrow":
+                result = feather.read_feather(output_path)
+            else:
+                result = pd.read_parquet(output_path)
+        return counts, result
+    
+    def check(self, counts, result):
+        self.assertEqual(counts, (len(self.patients) - 1, 1))
+        self.assertEqual(result["patient_id"].tolist(), self.patients["patient_id"].tolist())
+        self.assertTrue(pd.isna(result.loc[3, "prediction"]))
+        
+        scored = result.drop(index=3)
+        np.testing.assert_array_equal(scored["prediction"].astype(int), self.expected_labels)
+        np.testing.assert_array_equal(scored["confidence"], self.expected_confidence)
+    
+    def test_csv_inline(self):
+        self.check(*self.score(".csv", workers=1))
+    
+    def test_parquet_process_pool_keeps_input_order(self):
+        self.check(*self.score(".parquet", workers=2))
+    
+    def test_arrow_memory_mapped_input(self):
+        self.check(*self.score(".arrow", workers=1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+
+from helpers import FEATURE_NAMES, make_fitted_model, make_patients
+
+import train_model
+from train_model import add_trees, candidate_params, evaluate_candidates
+
+class TestHyperparameterSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        X = make_patients(240, seed=8)
+        cls.y = ((X["age"] > 55) | (X["cp"] == 0)).astype(int).to_numpy()
+        cls.X = X.to_numpy(dtype=float)
+        cls.folds = list(StratifiedKFold(n_splits=3, shuffle=True, random_state=0).split(cls.X, cls.y))
+        cls.candidates = [
+            {"n_estimators": 10, "max_depth": 2},
+            {"n_estimators": 20, "max_depth": None, "min_samples_leaf": 2},
+        ]
+    
+    def test_candidate_params(self):
+        grid = candidate_params("grid")
+        self.assertEqual(len(grid), int(np.prod([len(v) for v in train_model.SEARCH_SPACE.values()])))
+        self.assertEqual(len(candidate_params("random", n_iter=7)), 7)
+        self.assertEqual(candidate_params("random", n_iter=7), candidate_params("random", n_iter=7))
+        with self.assertRaises(ValueError):
+            candidate_params("bayes")
+    
+    def test_matches_cross_validation_on_the_shared_folds(self):
+        results = evaluate_candidates(self.candidates, self.X, self.y, self.folds, workers=1)
+        
+        for candidate, result in zip(self.candidates, results):
+            clf = RandomForestClassifier(random_state=42, **candidate)
+            expected = cross_val_score(clf, self.X, self.y, cv=self.folds, scoring="accuracy")
+            self.assertEqual(result["params"], candidate)
+            self.assertAlmostEqual(result["cv_accuracy_mean"], expected.mean(), places=12)
+            self.assertAlmostEqual(result["cv_accuracy_std"], expected.std(), places=12)
+    
+    def test_process_pool_gives_the_same_results(self):
+        inline = evaluate_candidates(self.candidates, self.X, self.y, self.folds, workers=1)
+        pooled = evaluate_candidates(self.candidates, self.X, self.y, self.folds, workers=2)
+        for a, b in zip(inline, pooled):
+            self.assertEqual(a["cv_accuracy_mean"], b["cv_accuracy_mean"])
+            self.assertEqual(a["cv_accuracy_std"], b["cv_accuracy_std"])
+    
+    def test_search_logs_nested_runs_and_promotes_the_best(self):
+        import mlflow
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            self.addCleanup(os.chdir, cwd)
+            mlflow.set_tracking_uri(f"sqlite:///{os.path.join(tmp, 'mlflow.db')}")
+            self.addCleanup(mlflow.set_tracking_uri, None)
+            
+            df = make_patients(150, seed=9)
+            df["target"] = ((df["age"] > 55) | (df["cp"] == 0)).astype(int)
+            os.makedirs("data")
+            df.to_csv("data/heart.csv", index=False)
+            
+            with mock.patch.object(train_model, "candidate_params", return_value=self.candidates), \
+                    mock.patch.object(train_model.profiling, "PROFILE_ENABLED", True), \
+                    mock.patch.object(train_model, "log_trained_model") as log_model:
+                run_id = train_model.search(mode="random", n_iter=2, n_folds=3, workers=1, use_cache=False)
+            
+            clf = log_model.call_args[0][0]
+            runs = mlflow.search_runs(experiment_names=[train_model.EXPERIMENT_NAME])
+            parent = mlflow.get_run(run_id)
+            top_level = mlflow.search_runs(
+                experiment_names=[train_model.EXPERIMENT_NAME],
+                filter_string="tags.mlflow.parentRunId IS NULL",
+            )
+        
+        children = runs[runs["tags.mlflow.parentRunId"] == run_id]
+        self.assertEqual(len(children), len(self.candidates))
+        self.assertEqual(top_level["run_id"].tolist(), [run_id])
+        
+        best = children.loc[children["metrics.cv_accuracy_mean"].idxmax()]
+        self.assertEqual(parent.data.metrics["cv_accuracy"], best["metrics.cv_accuracy_mean"])
+        self.assertEqual(parent.data.params["n_estimators"], best["params.n_estimators"])
+        self.assertEqual(clf.n_estimators, int(best["params.n_estimators"]))
+        self.assertIsNone(clf.n_jobs)
+        self.assertIn("profile/search/cross_validate/wall_s", parent.data.metrics)
+        self.assertIn("profile/search/fit/cpu_s", parent.data.metrics)
+
+class TestIncrementalTraining(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.parent, cls.scaler, _ = make_fitted_model(n_estimators=10)
+        new_rows = make_patients(120, seed=10)
+        cls.y_new = ((new_rows["age"] > 50) & (new_rows["thalach"] < 160)).astype(int)
+        cls.X_new = pd.DataFrame(cls.scaler.transform(new_rows), columns=FEATURE_NAMES)
+    
+    def thresholds(self, trees):
+        return [tree.tree_.threshold.tolist() for tree in trees]
+    
+    def test_adds_trees_fit_on_new_rows_and_keeps_the_parent(self):
+        parent_trees = self.thresholds(self.parent.estimators_)
+        model, n_retired = add_trees(self.parent, self.X_new, self.y_new, n_new_trees=5)
+        
+        self.assertEqual(n_retired, 0)
+        self.assertEqual(model.n_estimators, 15)
+        self.assertEqual(self.thresholds(model.estimators_[:10]), parent_trees)
+        self.assertEqual(self.thresholds(self.parent.estimators_), parent_trees)
+        self.assertEqual(len(self.parent.estimators_), 10)
+        self.assertFalse(model.warm_start)
+        self.assertIsNone(model.n_jobs)
+        self.assertEqual(model.predict_proba(self.X_new).shape, (len(self.X_new), 2))
+    
+    def test_retire_oldest_keeps_a_sliding_window(self):
+        model, n_retired = add_trees(self.parent, self.X_new, self.y_new, n_new_trees=5, max_trees=10)
+        
+        self.assertEqual(n_retired, 5)
+        self.assertEqual(model.n_estimators, 10)
+        self.assertEqual(self.thresholds(model.estimators_[:5]), self.thresholds(self.parent.estimators_[5:]))
+    
+    def test_retire_worst_only_drops_old_trees(self):
+        grown, _ = add_trees(self.parent, self.X_new, self.y_new, n_new_trees=5)
+        model, n_retired = add_trees(self.parent, self.X_new, self.y_new, n_new_trees=5,
+                                     max_trees=12, retire_policy="worst")
+        
+        self.assertEqual(n_retired, 3)
+        self.assertEqual(self.thresholds(model.estimators_[-5:]), self.thresholds(grown.estimators_[-5:]))
+        old_kept = self.thresholds(model.estimators_[:7])
+        self.assertTrue(all(tree in self.thresholds(self.parent.estimators_) for tree in old_kept))
+    
+    def test_new_rows_must_cover_every_class(self):
+        with self.assertRaises(ValueError):
+            add_trees(self.parent, self.X_new, pd.Series(np.zeros(len(self.X_new), dtype=int)), n_new_trees=5)
+    
+    def test_processed_rows_are_not_scaled_again(self):
+        from columnar import write_columnar
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            self.addCleanup(os.chdir, cwd)
+            os.makedirs("models")
+            train_model.joblib.dump(self.scaler, "models/scaler.pkl")
+            
+            raw = make_patients(120, seed=10)
+            raw["target"] = self.y_new
+            raw.to_csv("new_rows.csv", index=False)
+            processed = self.X_new.assign(target=self.y_new)
+            write_columnar(processed, "processed.arrow", float_columns=FEATURE_NAMES, scaled=True)
+            write_columnar(raw, "raw.arrow")
+            
+            X_csv, y_csv = train_model.load_new_rows("new_rows.csv")
+            X_processed, y_processed = train_model.load_new_rows("processed.arrow")
+            X_raw, _ = train_model.load_new_rows("raw.arrow")
+        
+        np.testing.assert_allclose(X_csv.to_numpy(), self.X_new.to_numpy())
+        np.testing.assert_allclose(X_processed.to_numpy(), self.X_new.to_numpy(), rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(X_raw.to_numpy(), self.X_new.to_numpy(), rtol=1e-5, atol=1e-5)
+        self.assertEqual(y_processed.tolist(), y_csv.tolist())
+    
+    def test_logs_lineage_to_the_parent_run(self):
+        import mlflow
+        
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            self.addCleanup(os.chdir, cwd)
+            mlflow.set_tracking_uri(f"sqlite:///{os.path.join(tmp, 'mlflow.db')}")
+            self.addCleanup(mlflow.set_tracking_uri, None)
+            
+            rows = make_patients(120, seed=10)
+            rows["target"] = self.y_new * 2
+            rows.to_csv("new_rows.csv", index=False)
+            parent_version = SimpleNamespace(version="3", run_id="parent-run")
+            
+            with mock.patch.object(train_model, "load_registered_model", return_value=(self.parent, parent_version)), \
+                    mock.patch.object(train_model, "log_trained_model") as log_model, \
+                    mock.patch.object(train_model, "register_model") as register:
+                run_id = train_model.train_incremental("new_rows.csv", n_new_trees=4, max_trees=12, use_cache=False)
+            run = mlflow.get_run(run_id)
+            artifacts = [artifact.path for artifact in mlflow.tracking.MlflowClient().list_artifacts(run_id)]
+        
+        self.assertEqual(register.call_args_list, [
+            mock.call(run_id, train_model.REGISTERED_MODEL_NAME, train_model.MODEL_ARTIFACT_PATH),
+            mock.call(run_id, "heart-disease-model-folded", train_model.FOLDED_ARTIFACT_PATH),
+        ])
+        self.assertEqual(log_model.call_args[0][0].n_estimators, 12)
+        self.assertEqual(run.data.tags["lineage.parent_run_id"], "parent-run")
+        self.assertEqual(run.data.tags["lineage.parent_model"], "heart-disease-model/3")
+        self.assertEqual(run.data.tags["training_mode"], "incremental")
+        self.assertEqual(run.data.metrics["trees_retired"], 2)
+        self.assertEqual(run.data.params["n_new_rows"], "120")
+        # The stage profiler is off unless asked for
+        self.assertFalse(any(name.startswith("profile/") for name in run.data.metrics))
+        self.assertNotIn("profile", artifacts)
+
+if __name__ == '__main__':
+    unittest.main()